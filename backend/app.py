@@ -16,7 +16,7 @@ app = FastAPI(title=Config.APP_NAME)
 
 @app.exception_handler(404)
 async def not_found_exception_handler(request: Request, exc: HTTPException):
-    logging.error(f"404 Error: {request.url} not found")
+    logging.error("404 Error: %s not found", request.url)
     return {"detail": "Not found"}, 404
 
 # Add CORS middleware
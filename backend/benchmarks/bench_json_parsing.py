@@ -0,0 +1,94 @@
+"""
+Microbenchmark: streaming JSON parser vs. extract_json_from_text/attempt_json_repair.
+
+Run from the backend directory:
+    python -m benchmarks.bench_json_parsing [--fields 40] [--number 200]
+"""
+import argparse
+import json
+import timeit
+
+from services.pdf_processor_alt import extract_json_from_text, attempt_json_repair
+from llm.json_stream import StreamingJSONParser, parse_json_object
+
+def build_response(fields: int, malformed: bool = False, trailing_words: int = 200) -> str:
+    """Build an LLM-style response: preamble, fenced JSON, trailing prose."""
+    specs = {
+        category: {f"{category}_field_{i}": f"{i}.5 V typ, -40 to 125 °C ({i})" for i in range(fields)}
+        for category in ["performance", "electrical", "mechanical", "environmental"]
+    }
+    body = json.dumps({
+        "sensor_type": "Temperature Sensor",
+        "manufacturer": "ACME",
+        "model": "TMP117",
+        "specifications": specs,
+        "extra_fields": {"notes": "Escaped \"quotes\" and {braces} inside strings"}
+    }, indent=2)
+    if malformed:
+        body = body.replace('"model": "TMP117"', "model: 'TMP117'").replace("\n  }", ",\n  }")
+    trailing = " ".join(["This JSON captures the datasheet values."] * (trailing_words // 6))
+    return f"Here is the extracted data:\n```json\n{body}\n```\n{trailing}"
+
+def old_pipeline(text: str):
+    """Current approach: char-by-char extraction, then regex repair on failure."""
+    content = extract_json_from_text(text)
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        return json.loads(attempt_json_repair(content))
+
+def old_stream_pipeline(tokens):
+    """Current approach on a streamed response: collect every token, then extract and repair."""
+    chunks = []
+    for token in tokens:
+        chunks.append(token)
+    return old_pipeline("".join(chunks))
+
+def stream_pipeline(tokens):
+    """New approach fed token by token, stopping at the end of the top-level object."""
+    parser = StreamingJSONParser()
+    for token in tokens:
+        if parser.feed(token):
+            break
+    return parser.result()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fields", type=int, default=40, help="Spec fields per category")
+    parser.add_argument("--number", type=int, default=200, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    for label, malformed in [("valid", False), ("malformed", True)]:
+        text = build_response(args.fields, malformed=malformed)
+        tokens = [text[i:i + 4] for i in range(0, len(text), 4)]  # ~4 chars per streamed token
+
+        # Both pipelines must agree before timing them
+        try:
+            expected = old_pipeline(text)
+        except json.JSONDecodeError:
+            expected = None
+        actual = parse_json_object(text)
+        agree = expected == actual
+
+        old = timeit.timeit(lambda: old_pipeline(text) if expected is not None else extract_json_from_text(text), number=args.number)
+        new = timeit.timeit(lambda: parse_json_object(text), number=args.number)
+        old_streamed = timeit.timeit(
+            lambda: old_stream_pipeline(tokens) if expected is not None else extract_json_from_text("".join(tokens)),
+            number=args.number
+        )
+        streamed = timeit.timeit(lambda: stream_pipeline(tokens), number=args.number)
+
+        stream_parser = StreamingJSONParser()
+        for token in tokens:
+            if stream_parser.feed(token):
+                break
+
+        print(f"[{label}] {len(text)} chars, results agree: {agree}, old pipeline parsed: {expected is not None}")
+        print(f"  extract_json_from_text+repair : {old / args.number * 1e6:9.1f} us/call")
+        print(f"  parse_json_object (full text) : {new / args.number * 1e6:9.1f} us/call")
+        print(f"  old pipeline (tokens)         : {old_streamed / args.number * 1e6:9.1f} us/call")
+        print(f"  StreamingJSONParser (tokens)  : {streamed / args.number * 1e6:9.1f} us/call")
+        print(f"  trailing chars not generated  : {len(text) - len(stream_parser.json_text) - stream_parser.preamble_chars}")
+
+if __name__ == "__main__":
+    main()
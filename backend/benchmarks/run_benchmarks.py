@@ -0,0 +1,253 @@
+"""
+Microbenchmark suite for the backend hot paths.
+
+Benchmarks extract_json_from_text, attempt_json_repair, merge_extracted_data,
+detect_intent, get_history_text, guess_sensor_type_from_filename and PDF page
+parsing on synthetic inputs (see benchmarks/synthetic.py). Results are written to
+benchmarks/results/<commit>.json so runs can be compared between commits.
+
+Run from the backend directory:
+    python -m benchmarks.run_benchmarks                       # run everything, save results
+    python -m benchmarks.run_benchmarks --only json,merge     # run benchmarks whose name contains a filter
+    python -m benchmarks.run_benchmarks --compare main        # compare against results saved for another commit
+    python -m benchmarks.run_benchmarks --fields 80 --pages 20
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from benchmarks import synthetic
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def git_commit(ref: str = "HEAD") -> Optional[str]:
+    """Short commit hash for ref, or None outside a git checkout."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", ref], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def git_dirty() -> bool:
+    """Whether the working tree has uncommitted changes to tracked files."""
+    try:
+        return bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], stderr=subprocess.DEVNULL, text=True).strip())
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+def build_benchmarks(args) -> List[Tuple[str, Callable[[], Callable[[], Any]]]]:
+    """
+    Build the benchmark list. Each entry is (name, setup); setup imports the code
+    under test and prepares inputs, returning the zero-argument function to time.
+    Imports happen in setup so a missing optional dependency skips only its benchmarks.
+    """
+    def json_extract(malformed):
+        def setup():
+            from services.pdf_processor_alt import extract_json_from_text
+            text = synthetic.llm_response(args.fields, malformed=malformed, seed=args.seed)
+            return lambda: extract_json_from_text(text)
+        return setup
+
+    def json_repair():
+        from services.pdf_processor_alt import extract_json_from_text, attempt_json_repair
+        content = extract_json_from_text(synthetic.llm_response(args.fields, malformed=True, seed=args.seed))
+        return lambda: attempt_json_repair(content)
+
+    def merge():
+        from services.pdf_processor_alt import merge_extracted_data
+        # Overlapping keys across pages, as in a real multi-page upload
+        pages = [synthetic.extraction_data(args.fields, seed=args.seed + page % 3) for page in range(args.pages)]
+        return lambda: merge_extracted_data(pages)
+
+    def merge_provenance():
+        from services.merge_engine import merge_with_provenance
+        # A large batch: many chunk results, each reporting overlapping fields
+        results = [([page + 1], synthetic.extraction_data(args.fields, seed=args.seed + page % 7), "llm") for page in range(200)]
+        return lambda: merge_with_provenance(results)
+
+    def intent(confirmation):
+        def setup():
+            from services.intent_detection import detect_intent
+            reply = synthetic.assistant_reply(confirmation=confirmation, seed=args.seed)
+            return lambda: detect_intent(reply, 1)
+        return setup
+
+    def history_text():
+        from services.conversation import get_conversation_state, get_history_text
+        history = synthetic.chat_history(args.turns, seed=args.seed)
+        def run():
+            get_conversation_state()["chat_history"] = history
+            return get_history_text()
+        return run
+
+    def sensor_type_guess():
+        from services.pdf_processor_alt import guess_sensor_type_from_filename
+        names = synthetic.filenames(100, seed=args.seed)
+        return lambda: [guess_sensor_type_from_filename(name) for name in names]
+
+    def pdf_parsing():
+        from langchain_community.document_loaders import PyPDFLoader
+        pdf = synthetic.datasheet_pdf(args.pages, seed=args.seed)
+        handle = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+        handle.write(pdf)
+        handle.close()
+        # Same loader the upload pipeline uses; the temp file is left for the OS to clean up
+        return lambda: PyPDFLoader(handle.name).load()
+
+    def table_parsing():
+        from services.table_extraction import extract_page_tables
+        pdf = synthetic.datasheet_table_pdf(args.pages, seed=args.seed)
+        handle = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+        handle.write(pdf)
+        handle.close()
+        return lambda: extract_page_tables(handle.name)
+
+    def rule_fields():
+        from services.rule_extraction import extract_rule_fields
+        text = "\n".join(synthetic.datasheet_pages(args.pages, seed=args.seed))
+        return lambda: extract_rule_fields(text)
+
+    def sensor_list():
+        from bson import ObjectId
+        from models.sensor import SensorRecord, encode_sensor_list
+        # What GET /sensors does per request: decode the stored documents and encode the response
+        documents = [{"_id": ObjectId(), **synthetic.extraction_data(args.fields, seed=args.seed + i),
+                      "source": {"filename": f"sensor_{i}.pdf", "page_count": 12}} for i in range(100)]
+        return lambda: encode_sensor_list([SensorRecord.from_mongo(d) for d in documents])
+
+    return [
+        ("extract_json_from_text[valid]", json_extract(False)),
+        ("extract_json_from_text[malformed]", json_extract(True)),
+        ("attempt_json_repair", json_repair),
+        ("merge_extracted_data", merge),
+        ("merge_with_provenance[200 results]", merge_provenance),
+        ("detect_intent[confirmation]", intent(True)),
+        ("detect_intent[plain]", intent(False)),
+        ("get_history_text", history_text),
+        ("guess_sensor_type_from_filename[x100]", sensor_type_guess),
+        ("pdf_page_parsing", pdf_parsing),
+        ("table_extraction", table_parsing),
+        ("extract_rule_fields", rule_fields),
+        ("sensor_list_response[100 records]", sensor_list),
+    ]
+
+def measure(func: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, Any]:
+    """
+    Time func: calibrate the loop count so one repetition takes at least min_time,
+    then take `repeat` repetitions. Reports per-call times in microseconds.
+    """
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time or number >= 1_000_000:
+            break
+        number *= 2
+    samples = [t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "min_us": round(min(samples), 3),
+        "median_us": round(statistics.median(samples), 3),
+        "stdev_us": round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+        "loops": number,
+        "repeat": repeat
+    }
+
+def load_results(ref: str) -> Optional[Dict[str, Any]]:
+    """Load saved results from a file path, or for a commit/branch/tag name."""
+    if os.path.isfile(ref):
+        path = ref
+    else:
+        path = os.path.join(RESULTS_DIR, f"{git_commit(ref) or ref}.json")
+        if not os.path.isfile(path):
+            return None
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> int:
+    """
+    Print a comparison of median times and return the number of regressions
+    (benchmarks slower than baseline by more than threshold, e.g. 0.1 = 10%).
+    """
+    if baseline.get("params") != current.get("params"):
+        print(f"warning: parameters differ from baseline ({baseline.get('params')} vs {current.get('params')})")
+    print(f"\nComparison against {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    regressions = 0
+    for name, result in current["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if not base or "median_us" not in base or "median_us" not in result:
+            print(f"  {name:40s} {'n/a':>12s}")
+            continue
+        ratio = result["median_us"] / base["median_us"] if base["median_us"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            flag = "  improved"
+        print(f"  {name:40s} {base['median_us']:12.1f} -> {result['median_us']:12.1f} us  x{ratio:5.2f}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help="Comma-separated substrings; run only matching benchmarks")
+    parser.add_argument("--fields", type=int, default=20, help="Spec fields per category in synthetic LLM responses")
+    parser.add_argument("--pages", type=int, default=8, help="Pages in the synthetic PDF / results to merge")
+    parser.add_argument("--turns", type=int, default=20, help="Chat history length")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic inputs")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per repetition")
+    parser.add_argument("--compare", metavar="REF", help="Commit, branch or results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown reported as a regression")
+    parser.add_argument("--no-save", action="store_true", help="Do not write results to benchmarks/results/")
+    args = parser.parse_args()
+
+    filters = [f.strip() for f in args.only.split(",")] if args.only else None
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "dirty": git_dirty(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"fields": args.fields, "pages": args.pages, "turns": args.turns, "seed": args.seed},
+        "benchmarks": {}
+    }
+
+    for name, setup in build_benchmarks(args):
+        if filters and not any(f in name for f in filters):
+            continue
+        try:
+            func = setup()
+            func()  # Warm up (lazy imports, regex compilation, caches)
+        except Exception as e:
+            results["benchmarks"][name] = {"skipped": f"{type(e).__name__}: {e}"}
+            print(f"{name:40s} skipped ({type(e).__name__}: {e})")
+            continue
+        result = measure(func, args.repeat, args.min_time)
+        results["benchmarks"][name] = result
+        print(f"{name:40s} {result['median_us']:12.1f} us/call  (min {result['min_us']:.1f}, stdev {result['stdev_us']:.1f}, {result['loops']} loops)")
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        name = f"{commit or 'local'}{'-dirty' if results['dirty'] else ''}.json"
+        path = os.path.join(RESULTS_DIR, name)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nSaved results to {path}")
+
+    if args.compare:
+        baseline = load_results(args.compare)
+        if baseline is None:
+            print(f"No saved results for {args.compare}; run the suite on that commit first")
+            sys.exit(2)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
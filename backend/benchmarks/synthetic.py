@@ -0,0 +1,218 @@
+"""
+Synthetic inputs for the benchmarks: datasheet-like PDFs and LLM extraction responses.
+
+Everything is generated deterministically from a seed so results are comparable
+between runs and commits.
+"""
+import json
+import random
+from typing import List, Dict, Any, Union
+
+SENSOR_TYPES = ["Temperature Sensor", "Pressure Sensor", "Humidity Sensor", "Accelerometer", "Proximity Sensor"]
+MANUFACTURERS = ["ACME Sensors", "Bosch Sensortec", "Texas Instruments", "STMicroelectronics", "Honeywell"]
+UNITS = ["V", "mA", "uA", "°C", "%RH", "kPa", "Hz", "ms", "mm", "g"]
+PARAMETERS = [
+    "Supply Voltage", "Supply Current", "Standby Current", "Operating Temperature", "Accuracy",
+    "Resolution", "Response Time", "Output Data Rate", "Measurement Range", "Hysteresis",
+    "Long-term Drift", "Startup Time", "Input Capacitance", "Package Height", "Weight"
+]
+BOILERPLATE = [
+    "IMPORTANT NOTICE AND DISCLAIMER",
+    "Information in this document is provided solely in connection with the products.",
+    "All trademarks are the property of their respective owners. Copyright 2024.",
+    "Revision history: Rev A initial release; Rev B updated ordering information."
+]
+
+def datasheet_pages(pages: int = 8, rows_per_page: int = 30, seed: int = 0) -> List[str]:
+    """
+    Generate datasheet-like page texts: a title page, specification tables,
+    prose sections and a boilerplate page at the end.
+
+    Args:
+        pages: Number of pages
+        rows_per_page: Table rows (or prose lines) per page
+        seed: Random seed
+
+    Returns:
+        List of page texts
+    """
+    rng = random.Random(seed)
+    sensor_type = rng.choice(SENSOR_TYPES)
+    manufacturer = rng.choice(MANUFACTURERS)
+    model = f"SX{rng.randint(100, 999)}"
+    texts = []
+    for page in range(1, pages + 1):
+        if page == 1:
+            lines = [f"{model} {sensor_type}", f"{manufacturer}", "1 Features"]
+            lines += [f"- {rng.choice(PARAMETERS)} {rng.uniform(0.1, 100):.1f} {rng.choice(UNITS)}" for _ in range(rows_per_page // 2)]
+        elif page == pages and pages > 2:
+            lines = [rng.choice(BOILERPLATE) for _ in range(rows_per_page)]
+        elif page % 3 == 0:
+            lines = [f"{page}. Application Information"]
+            lines += [
+                f"The {model} can be used in {rng.choice(['HVAC', 'industrial', 'wearable', 'automotive'])} systems "
+                f"with a typical {rng.choice(PARAMETERS).lower()} of {rng.uniform(1, 50):.1f} {rng.choice(UNITS)}."
+                for _ in range(rows_per_page)
+            ]
+        else:
+            lines = [f"{page}. Electrical Characteristics", f"Table {page} Parameter Min Typ Max Unit"]
+            for _ in range(rows_per_page):
+                low = rng.uniform(0, 10)
+                lines.append(f"{rng.choice(PARAMETERS)} {low:.1f} {low * 1.5:.1f} {low * 2:.1f} {rng.choice(UNITS)}")
+        texts.append("\n".join(lines))
+    return texts
+
+TABLE_COLUMNS_X = [40, 230, 330, 380, 430, 480]  # Parameter, conditions, min, typ, max, unit
+
+def datasheet_table_pages(pages: int = 4, rows_per_page: int = 20, seed: int = 0) -> List[List[List[str]]]:
+    """
+    Generate electrical-characteristics tables as rows of cells (for build_pdf),
+    laid out in columns the way real datasheets are.
+
+    Args:
+        pages: Number of table pages
+        rows_per_page: Data rows per page
+        seed: Random seed
+
+    Returns:
+        Per page, a list of rows; each row is a list of cell texts
+    """
+    rng = random.Random(seed)
+    tables = []
+    for page in range(1, pages + 1):
+        rows = [[f"{page}. Electrical Characteristics"], ["Parameter", "Conditions", "Min", "Typ", "Max", "Unit"]]
+        for _ in range(rows_per_page):
+            low = rng.uniform(0, 10)
+            rows.append([
+                rng.choice(PARAMETERS), rng.choice(["", "TA = 25 °C", "VDD = 3.3 V"]),
+                f"{low:.1f}", f"{low * 1.5:.1f}", f"{low * 2:.1f}", rng.choice(UNITS)
+            ])
+        tables.append(rows)
+    return tables
+
+def _pdf_string(text: str) -> str:
+    """Escape text for a PDF literal string (Latin-1 only, as the standard fonts are)."""
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+def build_pdf(page_texts: List[Union[str, List[List[str]]]]) -> bytes:
+    """
+    Build a minimal valid PDF with one text page per entry, using the built-in
+    Helvetica font so no external PDF library is needed.
+
+    Args:
+        page_texts: Text of each page, lines separated by newlines; or a list of
+            table rows whose cells are placed at TABLE_COLUMNS_X
+
+    Returns:
+        bytes: PDF file content
+    """
+    objects = []  # Object bodies; object number is index + 1
+
+    def add(body: str) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add("")  # Filled in once the pages object exists
+    pages_obj = add("")
+    font = add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+    for text in page_texts:
+        if isinstance(text, str):
+            commands = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+            for line in text.split("\n"):
+                commands.append(f"{_pdf_string(line)} Tj T*")
+            commands.append("ET")
+        else:
+            commands = ["BT", "/F1 9 Tf"]
+            for row_index, row in enumerate(text):
+                for x, cell in zip(TABLE_COLUMNS_X, row):
+                    if cell:
+                        commands.append(f"1 0 0 1 {x} {800 - 14 * row_index} Tm {_pdf_string(cell)} Tj")
+            commands.append("ET")
+        stream = "\n".join(commands)
+        content = add(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        page_ids.append(add(
+            f"<< /Type /Page /Parent {pages_obj} 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> /Contents {content} 0 R >>"
+        ))
+    objects[catalog - 1] = f"<< /Type /Catalog /Pages {pages_obj} 0 R >>"
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[pages_obj - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref_at = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode("latin-1")
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode("latin-1")
+    return bytes(output)
+
+def datasheet_pdf(pages: int = 8, rows_per_page: int = 30, seed: int = 0) -> bytes:
+    """Generate a synthetic datasheet PDF (see datasheet_pages)."""
+    return build_pdf(datasheet_pages(pages, rows_per_page, seed))
+
+def datasheet_table_pdf(pages: int = 4, rows_per_page: int = 20, seed: int = 0) -> bytes:
+    """Generate a synthetic PDF of column-laid-out specification tables (see datasheet_table_pages)."""
+    return build_pdf(datasheet_table_pages(pages, rows_per_page, seed))
+
+def extraction_data(fields: int = 20, seed: int = 0) -> Dict[str, Any]:
+    """Generate an extraction result with `fields` entries per specification category."""
+    rng = random.Random(seed)
+    return {
+        "sensor_type": rng.choice(SENSOR_TYPES),
+        "manufacturer": rng.choice(MANUFACTURERS),
+        "model": f"SX{rng.randint(100, 999)}",
+        "specifications": {
+            category: {
+                f"{category}_{i}": f"{rng.uniform(0, 100):.1f} {rng.choice(UNITS)}" for i in range(fields)
+            }
+            for category in ["performance", "electrical", "mechanical", "environmental"]
+        },
+        "extra_fields": {"notes": f"Values \"typ\" at 25 °C {{seed {seed}}}"}
+    }
+
+def llm_response(fields: int = 20, malformed: bool = False, trailing_words: int = 100, seed: int = 0) -> str:
+    """
+    Generate an LLM-style extraction response: a preamble, fenced JSON and trailing prose.
+
+    Args:
+        fields: Spec fields per category (controls response size)
+        malformed: Introduce the defects models typically produce (unquoted key, trailing comma)
+        trailing_words: Approximate words of prose after the JSON
+        seed: Random seed
+    """
+    body = json.dumps(extraction_data(fields, seed), indent=2, ensure_ascii=False)
+    if malformed:
+        body = body.replace('"model":', "model:", 1).replace("\n  }", ",\n  }")
+    trailing = " ".join(["These values were taken from the datasheet."] * max(1, trailing_words // 7))
+    return f"Here is the extracted data:\n```json\n{body}\n```\n{trailing}"
+
+def chat_history(turns: int = 20, words_per_message: int = 60, seed: int = 0) -> List[Dict[str, str]]:
+    """Generate alternating user/assistant messages in the conversation_state format."""
+    rng = random.Random(seed)
+    vocabulary = ["sensor", "range", "accuracy", "voltage", "temperature", "setup", "mounting", "output", "digital", "analog"]
+    return [
+        {"role": "user" if turn % 2 == 0 else "assistant",
+         "content": " ".join(rng.choice(vocabulary) for _ in range(words_per_message))}
+        for turn in range(turns)
+    ]
+
+def assistant_reply(words: int = 120, confirmation: bool = True, seed: int = 0) -> str:
+    """Generate an assistant reply, optionally ending with a step-1 confirmation question."""
+    rng = random.Random(seed)
+    vocabulary = ["The", "sensor", "supports", "a", "range", "of", "-40", "to", "125", "°C", "with", "I2C", "output."]
+    text = " ".join(rng.choice(vocabulary) for _ in range(words))
+    if confirmation:
+        text += " Does this sensor match your needs? Please respond with 'yes' or 'no'."
+    return text
+
+def filenames(count: int = 100, seed: int = 0) -> List[str]:
+    """Generate datasheet-style file names."""
+    rng = random.Random(seed)
+    stems = ["temp", "pressure", "humidity", "accel", "gyro", "proximity", "light", "gas", "datasheet", "ds"]
+    return [f"{rng.choice(stems)}_{rng.choice(stems)}_sx{rng.randint(100, 999)}_rev{rng.choice('ABC')}.pdf" for _ in range(count)]
@@ -1,5 +1,13 @@
 import os
+import copy
+import json
+import queue
+import atexit
+import random
 import logging
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -36,19 +44,135 @@ if CLOUD_WORKSTATION_LOG_URL not in ALLOWED_ORIGINS:
 # --- End Environment specific settings ---
 
 # Set up logging
+# Request / background job the current code runs for; stamped on every log record
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+job_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("job_id", default=None)
+
+# Argument types that cannot change between the log call and formatting on the listener thread
+_IMMUTABLE_ARGS = (str, int, float, bool, type(None), bytes)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request/job ids and any exception."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "message": record.getMessage(),
+        }
+        for field in ("request_id", "job_id"):
+            value = getattr(record, field, None)
+            if value:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class ContextFilter(logging.Filter):
+    """Copies the request and job ids from the caller's context onto the record."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        record.job_id = job_id_var.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a fraction of DEBUG records from noisy sources. Rates are matched
+    against the record's module or logger name, e.g. LOG_SAMPLING="pdf_processor_alt=0.05,client=0.1".
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or not self.rates:
+            return True
+        rate = self.rates.get(record.module, self.rates.get(record.name))
+        return rate is None or random.random() < rate
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves message formatting to the listener thread when the
+    arguments are immutable, so the event loop only pays for enqueueing the record.
+    """
+
+    def prepare(self, record):
+        if record.args and not all(isinstance(arg, _IMMUTABLE_ARGS) for arg in
+                                   (record.args if isinstance(record.args, tuple) else (record.args,))):
+            # Mutable arguments could change before the listener formats them; freeze the message now
+            record = copy.copy(record)
+            record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            # Tracebacks cannot cross threads safely once the frame is gone; render them here
+            record = copy.copy(record)
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def parse_log_sampling(value: str) -> Dict[str, float]:
+    """Parse "name=rate,name=rate" into a dict, ignoring malformed entries."""
+    rates = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        try:
+            rates[name.strip()] = float(rate)
+        except ValueError:
+            continue
+    return rates
+
+_log_listener: Optional[QueueListener] = None
+
 def setup_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    """
+    Route all logging through a queue to a background listener thread that formats
+    and writes records, so logging never blocks the event loop on I/O.
+    LOG_LEVEL sets the level, LOG_FORMAT is "json" (default) or "text", and LOG_SAMPLING
+    keeps a fraction of DEBUG records per module or logger.
+    """
+    global _log_listener
+    level = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+    stream_handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json").lower() == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s %(job_id)s] %(message)s'
+        ))
+    queue_handler = LazyQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(SamplingFilter(parse_log_sampling(os.getenv("LOG_SAMPLING", ""))))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    if _log_listener is None:
+        _log_listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+        _log_listener.start()
+        atexit.register(stop_logging)
     return logging.getLogger(__name__)
 
+def stop_logging():
+    """Flush queued records and stop the listener thread (called on shutdown and at exit)."""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
 logger = setup_logging()
 
 # Log the determined frontend URL and allowed origins
-logger.info(f"Default Frontend URL: {DEFAULT_FRONTEND_URL}")
-logger.info(f"Configured Frontend URL (from env or default): {FRONTEND_URL}")
-logger.info(f"Final Allowed CORS Origins: {ALLOWED_ORIGINS}")
+logger.info("Default Frontend URL: %s", DEFAULT_FRONTEND_URL)
+logger.info("Configured Frontend URL (from env or default): %s", FRONTEND_URL)
+logger.info("Final Allowed CORS Origins: %s", ALLOWED_ORIGINS)
 
 # Get API key or raise error
 def get_api_key():
@@ -56,7 +180,7 @@ def get_api_key():
     if not api_key:
         logger.error("OPENROUTER_API_KEY is not set in environment variables.")
         raise RuntimeError("OPENROUTER_API_KEY is not set in environment variables.")
-    logger.debug(f"Loaded API key: {api_key[:5]}... (redacted for security)")
+    logger.debug("Loaded API key: %s... (redacted for security)", api_key[:5])
     return api_key
 
 # Create and configure FastAPI app
@@ -113,9 +237,92 @@ class Settings(BaseSettings):
 
     # API keys
     openrouter_api_key: str = os.getenv("OPENROUTER_API_KEY", "")
+    # Point at a local stand-in (e.g. loadtest/fake_openrouter.py) for offline load testing
+    openrouter_base_url: str = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 
     # PDF settings
     pdf_directory: str = os.getenv("PDF_DIRECTORY", os.path.join(os.path.dirname(__file__), "pdfs"))
+    pdf_max_pages: int = int(os.getenv("PDF_MAX_PAGES", "5"))  # Max pages sent to the LLM per datasheet
+    pdf_page_token_budget: int = int(os.getenv("PDF_PAGE_TOKEN_BUDGET", "12000"))  # Token budget across selected pages
+    pdf_max_upload_bytes: int = int(os.getenv("PDF_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))  # Larger uploads get 413
+    upload_max_inflight_bytes: int = int(os.getenv("UPLOAD_MAX_INFLIGHT_BYTES", str(200 * 1024 * 1024)))  # Across concurrent uploads; 0 = no cap
+    upload_chunk_bytes: int = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))  # Write buffer size when spooling uploads to disk
+    upload_retry_after_seconds: int = int(os.getenv("UPLOAD_RETRY_AFTER_SECONDS", "5"))  # Retry-After when the cap is reached
+    pdf_chunk_concurrency: int = int(os.getenv("PDF_CHUNK_CONCURRENCY", "3"))  # Concurrent chunk extractions per upload
+    batch_max_files: int = int(os.getenv("BATCH_MAX_FILES", "50"))
+    batch_file_concurrency: int = int(os.getenv("BATCH_FILE_CONCURRENCY", "4"))  # Files processed at once per batch
+    batch_chunk_concurrency: int = int(os.getenv("BATCH_CHUNK_CONCURRENCY", "8"))  # Chunk extractions at once across a batch
+    pdf_chunk_max_tokens: int = int(os.getenv("PDF_CHUNK_MAX_TOKENS", "6000"))  # Page-text tokens per extraction request
+    pdf_table_min_fields: int = int(os.getenv("PDF_TABLE_MIN_FIELDS", "3"))  # Spec fields parsed from a page's tables to skip its LLM call
+    rule_min_confidence: float = float(os.getenv("RULE_MIN_CONFIDENCE", "0.8"))  # Pattern matches trusted without asking the LLM
+
+    # Structured output: comma-separated model prefixes supporting JSON schema / JSON object response formats
+    llm_json_schema_models: str = os.getenv("LLM_JSON_SCHEMA_MODELS", "openai/,google/gemini")
+    llm_json_mode_models: str = os.getenv("LLM_JSON_MODE_MODELS", "mistralai/,deepseek/")
+
+    # Cheap-first extraction cascade: escalate a chunk to the large model only when the small one falls short
+    pdf_cascade_enabled: bool = os.getenv("PDF_CASCADE_ENABLED", "False").lower() in ("true", "1", "t")
+    cascade_small_model: str = os.getenv("CASCADE_SMALL_MODEL", DEFAULT_MODEL)
+    cascade_large_model: str = os.getenv("CASCADE_LARGE_MODEL", "meta-llama/llama-3.3-70b-instruct")
+    cascade_min_spec_fields: int = int(os.getenv("CASCADE_MIN_SPEC_FIELDS", "3"))
+
+    # Extraction strategies (see services/extraction_pipeline.py): primary, and a candidate run in shadow on a sample of uploads
+    extraction_strategy: str = os.getenv("EXTRACTION_STRATEGY", "default")
+    shadow_strategy: str = os.getenv("SHADOW_STRATEGY", "")  # Empty = shadow mode off
+    shadow_sample_rate: float = float(os.getenv("SHADOW_SAMPLE_RATE", "0.1"))  # Fraction of uploads also run with the shadow strategy
+
+    # Chat sessions: kept in memory (least recently used evicted) and their transcripts written behind to MongoDB
+    chat_max_sessions: int = int(os.getenv("CHAT_MAX_SESSIONS", "1000"))
+    transcript_persistence: bool = os.getenv("TRANSCRIPT_PERSISTENCE", "True").lower() in ("true", "1", "t")
+    transcript_flush_interval_seconds: float = float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL_SECONDS", "2"))
+    transcript_flush_max_messages: int = int(os.getenv("TRANSCRIPT_FLUSH_MAX_MESSAGES", "200"))  # Flush early at this many pending messages
+    transcript_max_pending: int = int(os.getenv("TRANSCRIPT_MAX_PENDING", "20000"))  # Oldest dropped beyond this while MongoDB is unreachable
+
+    # Cache of first-turn chat responses, keyed by model, prompt version and the normalized request
+    chat_cache_enabled: bool = os.getenv("CHAT_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    chat_cache_ttl_seconds: float = float(os.getenv("CHAT_CACHE_TTL_SECONDS", "3600"))
+    chat_cache_max_entries: int = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "1000"))
+    chat_cache_similarity: float = float(os.getenv("CHAT_CACHE_SIMILARITY", "0"))  # Jaccard threshold for near matches; 0 = exact only
+
+    # Per-client rate limits (token buckets) for chat, upload and read endpoints; over-limit requests get 429
+    rate_limit_enabled: bool = os.getenv("RATE_LIMIT_ENABLED", "True").lower() in ("true", "1", "t")
+    rate_limit_backend: str = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "memory" (per worker) or "mongodb" (shared)
+    rate_limit_trust_forwarded_for: bool = os.getenv("RATE_LIMIT_TRUST_FORWARDED_FOR", "False").lower() in ("true", "1", "t")
+    rate_limit_chat_per_second: float = float(os.getenv("RATE_LIMIT_CHAT_PER_SECOND", "0.5"))
+    rate_limit_chat_burst: float = float(os.getenv("RATE_LIMIT_CHAT_BURST", "10"))
+    rate_limit_upload_per_second: float = float(os.getenv("RATE_LIMIT_UPLOAD_PER_SECOND", "0.2"))
+    rate_limit_upload_burst: float = float(os.getenv("RATE_LIMIT_UPLOAD_BURST", "5"))
+    rate_limit_read_per_second: float = float(os.getenv("RATE_LIMIT_READ_PER_SECOND", "5"))
+    rate_limit_read_burst: float = float(os.getenv("RATE_LIMIT_READ_BURST", "60"))
+    # Batch uploads are charged one token per file; the default burst fits one full batch
+    rate_limit_batch_files_per_second: float = float(os.getenv("RATE_LIMIT_BATCH_FILES_PER_SECOND", "0.2"))
+    rate_limit_batch_files_burst: float = float(os.getenv("RATE_LIMIT_BATCH_FILES_BURST", os.getenv("BATCH_MAX_FILES", "50")))
+
+    # Sensor catalog snapshot served by GET /sensors: rebuilt when the shared catalog version changes
+    # (checked at most this often), and after CATALOG_SNAPSHOT_MAX_AGE seconds in any case
+    catalog_version_check_seconds: float = float(os.getenv("CATALOG_VERSION_CHECK_SECONDS", "1"))
+    catalog_snapshot_max_age: float = float(os.getenv("CATALOG_SNAPSHOT_MAX_AGE", "30"))
+
+    # OpenRouter call policy: process-wide rate limit, retries with backoff, circuit breaker
+    llm_rate_limit_per_second: float = float(os.getenv("LLM_RATE_LIMIT_PER_SECOND", "5"))
+    llm_rate_limit_burst: int = int(os.getenv("LLM_RATE_LIMIT_BURST", "10"))
+    llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    llm_backoff_base_seconds: float = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+    llm_backoff_max_seconds: float = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+    llm_breaker_failure_threshold: int = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+    llm_http_max_connections: int = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))  # Shared connection pool to the provider
+    llm_breaker_reset_seconds: float = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+    # Token budgets per chat session / PDF upload (0 = unlimited)
+    session_token_budget: int = int(os.getenv("SESSION_TOKEN_BUDGET", "0"))
+    upload_token_budget: int = int(os.getenv("UPLOAD_TOKEN_BUDGET", "0"))
+    budget_cache_seconds: float = float(os.getenv("BUDGET_CACHE_SECONDS", "5"))  # How long a stored usage total is reused
+
+    # Admin endpoints and on-demand profiling (admin features are disabled while ADMIN_TOKEN is empty)
+    admin_token: str = os.getenv("ADMIN_TOKEN", "")
+    profile_directory: str = os.getenv("PROFILE_DIRECTORY", os.path.join(os.path.dirname(__file__), "profiles"))
+    profile_retention: int = int(os.getenv("PROFILE_RETENTION", "20"))  # Profiles kept on disk
+    profile_sample_interval_ms: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
 
     class Config:
         env_file = ".env"
@@ -1,5 +1,6 @@
 import motor.motor_asyncio
 from config import settings, logger
+from services.metrics import MongoCommandMetrics
 
 _client = None
 _db = None
@@ -13,19 +14,35 @@ async def get_database():
     if _db is None:
         # Create a new client and connect to the server
         try:
-            logger.info(f"Connecting to MongoDB at {settings.mongodb_uri.split('@')[-1]}")
-            _client = motor.motor_asyncio.AsyncIOMotorClient(settings.mongodb_uri)
+            logger.info("Connecting to MongoDB at %s", settings.mongodb_uri.split('@')[-1])
+            _client = motor.motor_asyncio.AsyncIOMotorClient(settings.mongodb_uri, event_listeners=[MongoCommandMetrics()])
             _db = _client[settings.mongodb_database]
             
             # Create indexes
             await _db.sensor_specifications.create_index("model")
             await _db.sensor_specifications.create_index("sensor_type")
+            # One document per datasheet; lets concurrent upserts of the same upload resolve safely
+            await _db.sensor_specifications.create_index(
+                "source.content_hash",
+                unique=True,
+                partialFilterExpression={"source.content_hash": {"$exists": True}}
+            )
+            
+            # Chat transcripts: one document per conversation; a session's latest is rehydrated after a restart
+            await _db.chat_transcripts.create_index("conversation_id", unique=True)
+            await _db.chat_transcripts.create_index([("session_id", 1), ("created_at", -1)])
+            
+            # Shared rate limit buckets (RATE_LIMIT_BACKEND=mongodb); idle ones expire
+            await _db.rate_limits.create_index("expires_at", expireAfterSeconds=0)
+            
+            # One aggregate per (scope, key, model) for token accounting
+            await _db.llm_usage.create_index([("scope", 1), ("key", 1), ("model", 1)], unique=True)
             
             # Verify connection
             await _client.admin.command('ping')
             logger.info("Connected to MongoDB successfully")
         except Exception as e:
-            logger.error(f"Failed to connect to MongoDB: {str(e)}")
+            logger.error("Failed to connect to MongoDB: %s", e)
             raise
     
     return _db
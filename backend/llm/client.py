@@ -1,62 +1,381 @@
 from langchain_openai import ChatOpenAI
 from langchain.chains import LLMChain
-from langchain_core.prompts import PromptTemplate
+from langchain_core.prompts import PromptTemplate, ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import SystemMessage
+from functools import lru_cache
+import copy
 import os
-from config import logger, get_api_key, DEFAULT_MODEL
+import time
+import random
+import asyncio
+import httpx
+import openai
+from config import logger, get_api_key, DEFAULT_MODEL, settings
+from models.sensor import PageExtraction
+from llm.json_stream import StreamingJSONParser
+from services.token_bucket import TokenBucket
+from services.single_flight import SingleFlight, hash_key
+from services.chunking import count_tokens
+from services.usage import UsageCallbackHandler, record_usage, check_budget, collect_usage, bill_shared_usage
 
-def load_prompt_template():
-    """Load the prompt template from file."""
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and provider errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """Raised when the LLM provider circuit breaker is open and calls fail fast."""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"LLM provider circuit breaker is open; retry in {retry_after:.1f}s")
+
+class CircuitBreaker:
+    """
+    Circuit breaker for the LLM provider.
+    
+    closed: calls pass through; consecutive retryable failures are counted.
+    open: calls fail fast with CircuitOpenError until reset_seconds have passed.
+    half_open: one probe call is let through; success closes the breaker, failure reopens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.total_failures = 0
+        self.total_rejections = 0
+
+    def before_call(self):
+        """Check whether a call may proceed; raises CircuitOpenError if not."""
+        if self.state == "open":
+            remaining = self.reset_seconds - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                self.total_rejections += 1
+                raise CircuitOpenError(remaining)
+            self.state = "half_open"
+            logger.info("LLM circuit breaker half-open, probing provider")
+        if self.state == "half_open":
+            if self.probe_in_flight:
+                self.total_rejections += 1
+                raise CircuitOpenError(1.0)
+            self.probe_in_flight = True
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info("LLM circuit breaker closed, provider recovered")
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning("LLM circuit breaker opened after %s consecutive failures", self.consecutive_failures)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Release a half-open probe slot when the call ended with a non-provider error or was cancelled."""
+        self.probe_in_flight = False
+
+    def snapshot(self):
+        """Current breaker state for status endpoints."""
+        retry_after = 0.0
+        if self.state == "open":
+            retry_after = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_seconds": self.reset_seconds,
+            "retry_after": round(retry_after, 2),
+            "total_failures": self.total_failures,
+            "total_rejections": self.total_rejections
+        }
+
+# Process-wide call policy shared by chat and extraction
+llm_rate_limiter = TokenBucket(settings.llm_rate_limit_per_second, settings.llm_rate_limit_burst)
+llm_circuit_breaker = CircuitBreaker(settings.llm_breaker_failure_threshold, settings.llm_breaker_reset_seconds)
+# Identical concurrent prompts share one in-flight call
+llm_single_flight = SingleFlight("LLM")
+
+# One connection pool to the provider shared by every model instance, see get_http_client()
+_http_client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared async HTTP client for all LLM calls, so connections are pooled and reused."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.llm_http_max_connections,
+                max_keepalive_connections=settings.llm_http_max_connections
+            ),
+            timeout=httpx.Timeout(120.0, connect=10.0)
+        )
+    return _http_client
+
+async def close_http_client():
+    """Close the shared HTTP client (on application shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+def is_retryable_error(error: Exception) -> bool:
+    """Check whether an LLM call error is transient (rate limit, timeout, provider fault)."""
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code in RETRYABLE_STATUS_CODES
+
+def get_retry_after(error: Exception):
+    """Read a Retry-After header (in seconds) from a provider error, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, retry_after: float = None) -> float:
+    """Full-jitter exponential backoff, never shorter than the provider's Retry-After."""
+    ceiling = min(settings.llm_backoff_max_seconds, settings.llm_backoff_base_seconds * (2 ** attempt))
+    delay = random.uniform(0, ceiling)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, settings.llm_backoff_max_seconds))
+    return delay
+
+async def call_llm(call, description: str = "LLM call"):
+    """
+    Run an LLM call under the shared rate limiter, retry policy and circuit breaker.
+    
+    Args:
+        call: Zero-argument function returning a fresh awaitable for each attempt
+        description: Label used in log messages
+        
+    Returns:
+        The awaited result of call()
+        
+    Raises:
+        CircuitOpenError: If the provider circuit breaker is open
+        BudgetExceededError: If the current session or upload has used up its token budget
+    """
+    for attempt in range(settings.llm_max_retries + 1):
+        await check_budget()
+        llm_circuit_breaker.before_call()
+        outcome_recorded = False
+        try:
+            await llm_rate_limiter.acquire()
+            result = await call()
+        except Exception as e:
+            if not is_retryable_error(e):
+                raise
+            llm_circuit_breaker.record_failure()
+            outcome_recorded = True
+            if attempt >= settings.llm_max_retries:
+                logger.error("%s failed after %s attempts: %s", description, attempt + 1, e)
+                raise
+            delay = backoff_delay(attempt, get_retry_after(e))
+            logger.warning("%s failed (%s: %s), retrying in %.2fs [%s/%s]", description, type(e).__name__, e, delay,
+                           attempt + 1, settings.llm_max_retries)
+            await asyncio.sleep(delay)
+        else:
+            llm_circuit_breaker.record_success()
+            outcome_recorded = True
+            return result
+        finally:
+            # Non-retryable errors and cancellation say nothing about the provider, but a
+            # half-open probe slot must be freed or no further probe is ever let through
+            if not outcome_recorded:
+                llm_circuit_breaker.release()
+
+async def call_llm_shared(key: str, call, description: str = "LLM call"):
+    """
+    call_llm for a call that concurrent identical requests share (llm_single_flight).
+
+    The caller that starts the call is billed as usual; the others are checked against
+    their own budget before joining and billed the same usage afterwards. Every caller
+    gets its own copy of the result, so none can change what another one sees.
+
+    Args:
+        key: Single-flight key identifying identical calls (e.g. hash_key of model and prompt)
+        call: Zero-argument function returning a fresh awaitable for each attempt
+        description: Label used in log messages
+
+    Returns:
+        A copy of the awaited result of call()
+    """
+    started = False
+
+    async def run():
+        with collect_usage() as collected:
+            result = await call_llm(call, description=description)
+        return result, collected
+
+    def start():
+        nonlocal started
+        started = True
+        return run()
+
+    await check_budget()
+    result, collected = await llm_single_flight.do(key, start)
+    if not started:
+        bill_shared_usage(collected)
+    return copy.deepcopy(result)
+
+def get_llm_status():
+    """Circuit breaker and rate limiter state for the status endpoint."""
+    return {
+        "circuit_breaker": llm_circuit_breaker.snapshot(),
+        "rate_limiter": llm_rate_limiter.snapshot(),
+        "max_retries": settings.llm_max_retries,
+        "single_flight": llm_single_flight.stats(),
+        "prompt_cache": get_prompt_cache_stats()
+    }
+
+# Providers that only cache prompt prefixes marked with an explicit cache_control breakpoint
+CACHE_CONTROL_MODEL_PREFIXES = ("anthropic/", "google/gemini")
+
+# Cached vs. uncached input tokens across chat turns, see record_prompt_cache_usage()
+prompt_cache_stats = {"turns": 0, "input_tokens": 0, "cached_input_tokens": 0}
+
+@lru_cache(maxsize=1)
+def read_iot_prompt() -> str:
+    """Read the static chat instructions from iot_prompt.txt (once per process)."""
+    with open('iot_prompt.txt', 'r', encoding='utf-8') as file:
+        return file.read()
+
+def load_prompt_template(model_name: str = None):
+    """
+    Load the chat prompt: the static instructions as a system message, followed by
+    the growing message history and the new user input. Keeping the unchanging
+    instructions first lets the provider reuse its cached prompt prefix every turn.
+    """
     try:
-        with open('iot_prompt.txt', 'r', encoding='utf-8') as file:
-            iot_prompt = file.read()
+        iot_prompt = read_iot_prompt()
         logger.info("Successfully loaded prompt from iot_prompt.txt")
-        logger.debug(f"Prompt content: {iot_prompt}")
+        logger.debug("Prompt content (%d chars): %.200s", len(iot_prompt), iot_prompt)
         
-        # Define LangChain PromptTemplate with explicit input variables
-        # Include chat history in the prompt
-        template = "Chat History:\n{history}\n\n" + iot_prompt + "\n\nUser input: {user_input}\n\nAssistant Response:\n"
-        return PromptTemplate(
-            template=template,
-            input_variables=["history", "user_input"]
-        )
+        if model_name and model_name.startswith(CACHE_CONTROL_MODEL_PREFIXES):
+            # Mark the end of the static prefix as a cache breakpoint
+            system_message = SystemMessage(content=[
+                {"type": "text", "text": iot_prompt, "cache_control": {"type": "ephemeral"}}
+            ])
+        else:
+            system_message = SystemMessage(content=iot_prompt)
+        
+        return ChatPromptTemplate.from_messages([
+            system_message,
+            MessagesPlaceholder("history"),
+            ("human", "{user_input}")
+        ])
     except FileNotFoundError as e:
         logger.error("iot_prompt.txt not found. Please ensure the file exists.")
         raise FileNotFoundError("iot_prompt.txt not found. Please ensure the file exists.") from e
     except Exception as e:
-        logger.error(f"Error loading iot_prompt.txt: {str(e)}")
+        logger.error("Error loading iot_prompt.txt: %s", e)
         raise
 
-def create_llm(model_name=DEFAULT_MODEL, temperature=0.7):
+def record_prompt_cache_usage(message, model_name: str):
+    """
+    Log and accumulate cached vs. uncached input tokens for a chat turn.
+    
+    Args:
+        message: AIMessage returned by the chat chain
+        model_name: Model used for the turn
+    """
+    usage = getattr(message, "usage_metadata", None) or {}
+    input_tokens = usage.get("input_tokens", 0)
+    cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+    prompt_cache_stats["turns"] += 1
+    prompt_cache_stats["input_tokens"] += input_tokens
+    prompt_cache_stats["cached_input_tokens"] += cached_tokens
+    ratio = cached_tokens / input_tokens if input_tokens else 0.0
+    logger.info("Prompt cache for %s: %s/%s input tokens cached (%.0f%%), %s uncached",
+                model_name, cached_tokens, input_tokens, ratio * 100, input_tokens - cached_tokens)
+
+def get_prompt_cache_stats():
+    """Cumulative prompt cache statistics with the overall cached ratio."""
+    total = prompt_cache_stats["input_tokens"]
+    return {
+        **prompt_cache_stats,
+        "uncached_input_tokens": total - prompt_cache_stats["cached_input_tokens"],
+        "cached_ratio": round(prompt_cache_stats["cached_input_tokens"] / total, 4) if total else 0.0
+    }
+
+def _matches_prefix(model_name: str, prefixes: str) -> bool:
+    """Check a model name against a comma-separated list of prefixes."""
+    return any(model_name.startswith(prefix.strip()) for prefix in prefixes.split(",") if prefix.strip())
+
+def get_response_format(model_name: str):
+    """
+    Get the most constrained response_format the model supports for extraction:
+    a JSON schema built from PageExtraction, plain JSON object mode, or None.
+    """
+    if _matches_prefix(model_name, settings.llm_json_schema_models):
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "sensor_page_extraction",
+                "schema": PageExtraction.model_json_schema(),
+                "strict": False  # Allow spec fields beyond the schema (e.g. current_consumption)
+            }
+        }
+    if _matches_prefix(model_name, settings.llm_json_mode_models):
+        return {"type": "json_object"}
+    return None
+
+def create_llm(model_name=DEFAULT_MODEL, temperature=0.7, response_format=None):
     """Create a new LLM instance with the specified model."""
     api_key = get_api_key()
+    model_kwargs = {"response_format": response_format} if response_format else {}
     llm = ChatOpenAI(
         openai_api_key=api_key,
-        openai_api_base="https://openrouter.ai/api/v1",
+        openai_api_base=settings.openrouter_base_url,
         model=model_name,
         temperature=temperature,
+        model_kwargs=model_kwargs,
+        max_retries=0,  # Retries are handled by call_llm
+        stream_usage=True,  # Report token usage at the end of streamed responses too
+        http_async_client=get_http_client(),
+        callbacks=[UsageCallbackHandler(model_name)],
         default_headers={
             "HTTP-Referer": "http://localhost:3000",
             "X-Title": "OpenRouter Chatbot"
         }
     )
-    logger.debug(f"Initialized ChatOpenAI with model: {model_name}, temperature: {temperature}")
+    logger.debug("Initialized ChatOpenAI with model: %s, temperature: %s, response_format: %s",
+                 model_name, temperature, response_format["type"] if response_format else None)
     return llm
 
 def create_chain(model_name=DEFAULT_MODEL, temperature=0.7):
-    """Create a new LLMChain with the specified model."""
-    prompt = load_prompt_template()
+    """
+    Create the chat chain for the specified model.
+    
+    Returns:
+        Runnable: prompt | llm; invoke with {"history": [(role, content), ...], "user_input": str}
+        and get an AIMessage back (with usage_metadata for cache accounting)
+    """
+    prompt = load_prompt_template(model_name)
     llm = create_llm(model_name, temperature)
-    chain = LLMChain(prompt=prompt, llm=llm)
-    logger.debug(f"Created LLMChain with model: {model_name}")
+    chain = prompt | llm
+    logger.debug("Created chat chain with model: %s", model_name)
     return chain
 
-def create_extraction_chain(model_name: str = None, temperature: float = 0.1):
+def create_extraction_chain(model_name: str = None, temperature: float = 0.1, structured: bool = True):
     """
     Create a specialized LLM chain for datasheet extraction that doesn't require chat history.
     
     Args:
         model_name: Name of the model to use (defaults to config)
         temperature: Sampling temperature (0.0-1.0)
+        structured: Request JSON schema / JSON object output when the model supports it
         
     Returns:
         LLMChain: A configured chain for extraction tasks
@@ -68,10 +387,11 @@ def create_extraction_chain(model_name: str = None, temperature: float = 0.1):
     if not model_name:
         model_name = os.getenv("LLM_MODEL", "meta-llama/llama-3.1-8b-instruct")
     
-    logger.debug(f"Created extraction LLMChain with model: {model_name}")
+    logger.debug("Created extraction LLMChain with model: %s", model_name)
     
     # Create LLM instance - use create_llm instead of get_llm
-    llm = create_llm(model_name, temperature)
+    response_format = get_response_format(model_name) if structured else None
+    llm = create_llm(model_name, temperature, response_format=response_format)
     
     # Create a prompt template specifically for extraction (only requires user_input)
     extraction_prompt = PromptTemplate(
@@ -81,3 +401,41 @@ def create_extraction_chain(model_name: str = None, temperature: float = 0.1):
     
     # Return a chain with the extraction prompt
     return LLMChain(llm=llm, prompt=extraction_prompt)
+
+async def astream_json(llm, prompt: str) -> StreamingJSONParser:
+    """
+    Stream a completion into a StreamingJSONParser and stop as soon as the
+    top-level JSON object is complete, so trailing prose is never generated.
+    
+    Args:
+        llm: Chat model to stream from (e.g. extraction_chain.llm)
+        prompt: Fully rendered prompt text
+        
+    Returns:
+        StreamingJSONParser: Parser holding the captured object; call result() to get the dict
+    """
+    async def stream_once():
+        parser = StreamingJSONParser()
+        usage = None
+        stream = llm.astream(prompt)
+        try:
+            async for chunk in stream:
+                usage = chunk.usage_metadata or usage
+                if parser.feed(chunk.content):
+                    break
+        finally:
+            # Closing the generator closes the HTTP stream, ending generation early
+            await stream.aclose()
+        if not usage:
+            # Usage arrives after the last content chunk, which an early stop never reads
+            # (a stream that ran to the end was already recorded by UsageCallbackHandler)
+            record_usage(llm.model_name, count_tokens(prompt, llm.model_name), count_tokens(parser.json_text, llm.model_name),
+                         estimated=True)
+        return parser
+
+    # Concurrent identical prompts (e.g. the same datasheet uploaded twice) share one stream
+    key = hash_key(llm.model_name, llm.model_kwargs.get("response_format"), prompt)
+    parser = await call_llm_shared(key, stream_once, description="Extraction stream")
+    logger.debug("JSON stream finished: complete=%s, preamble_chars=%d, trailing_chars=%d",
+                 parser.complete, parser.preamble_chars, parser.trailing_chars)
+    return parser
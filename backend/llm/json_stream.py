@@ -0,0 +1,338 @@
+import re
+import json
+from typing import Optional, Dict, Any
+from config import logger
+
+# Outside a string: everything up to the next bracket or lone quote, with complete string
+# literals (which may contain brackets) consumed whole
+_SKIP = re.compile(r'[^"{}\[\]]*(?:"[^"\\\n]*(?:\\.[^"\\\n]*)*"[^"{}\[\]]*)*')
+# Characters that matter inside a double-quoted string
+_STRING_SPECIAL = re.compile(r'["\\]')
+_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_\-\.]*')
+_NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_BARE_VALUE_END = re.compile(r'[,}\]\n]')
+_WHITESPACE = re.compile(r'\s*')
+_STRING = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+_STRING_LITERAL = re.compile(_STRING, re.DOTALL)
+# Runs of members that are already valid JSON, each followed by a comma, copied in one step by
+# repair_json. A "null" string value is left to the slow path, which turns it into null.
+_PLAIN_VALUE = rf'(?:(?!"null"){_STRING}|-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?|true|false|null)'
+_OBJECT_RUN = re.compile(rf'(?:\s*{_STRING}\s*:\s*{_PLAIN_VALUE}\s*,)+', re.DOTALL)
+_ARRAY_RUN = re.compile(rf'(?:\s*{_PLAIN_VALUE}\s*,)+', re.DOTALL)
+
+LITERALS = {
+    "null": "null", "None": "null", "undefined": "null", "NaN": "null",
+    "true": "true", "True": "true",
+    "false": "false", "False": "false"
+}
+
+class StreamingJSONParser:
+    """
+    Incremental parser for the first top-level JSON object in an LLM response.
+
+    Feed it text chunks as they arrive from the model. It skips any preamble
+    (prose, ```json fences) before the first '{', tracks nesting and string
+    state across chunk boundaries, and reports completion as soon as the
+    top-level object closes so the caller can stop the stream early.
+    Chunks are buffered until one contains a '}', the only character that can
+    close the object, and then scanned together, so most feeds cost an append.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._pending = []  # Chunks fed since the last scan
+        self._depth = 0
+        self._in_string = False
+        self._escape_pending = False  # A backslash ended the previous scan inside a string
+        self._preamble_chars = 0
+        self.started = False
+        self.complete = False
+        self.trailing_chars = 0
+        self.repaired = False
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Consume the next chunk of model output.
+
+        Returns:
+            bool: True once the top-level object is complete
+        """
+        if self.complete:
+            self.trailing_chars += len(chunk)
+            return True
+        self._pending.append(chunk)
+        if "}" in chunk:
+            self._scan()
+        return self.complete
+
+    def _scan(self):
+        """Scan the pending chunks, updating nesting and string state."""
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending = []
+        if not self.started:
+            start = text.find("{")
+            if start == -1:
+                self._preamble_chars += len(text)
+                return
+            self._preamble_chars += start
+            text = text[start:]
+            self.started = True
+
+        pos = 0
+        if self._escape_pending:
+            pos = 1
+            self._escape_pending = False
+        length = len(text)
+        while pos < length:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(text, pos)
+                if not match:
+                    break
+                if match.group() == "\\":
+                    pos = match.end() + 1
+                    if pos > length:
+                        self._escape_pending = True
+                    continue
+                self._in_string = False
+                pos = match.end()
+            else:
+                pos = _SKIP.match(text, pos).end()
+                if pos >= length:
+                    break
+                char = text[pos]
+                pos += 1
+                if char == '"':
+                    self._in_string = True  # String continues into the next chunk
+                elif char in "{[":
+                    self._depth += 1
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self.complete = True
+                        self.trailing_chars = length - pos
+                        text = text[:pos]
+                        break
+
+        self._chunks.append(text)
+
+    @property
+    def preamble_chars(self) -> int:
+        """Characters skipped before the first '{'."""
+        self._scan()
+        return self._preamble_chars
+
+    @property
+    def json_text(self) -> str:
+        """The captured JSON text (possibly incomplete if the stream ended early)."""
+        self._scan()
+        return "".join(self._chunks)
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        """
+        Parse the captured object, repairing common defects if strict parsing fails.
+
+        Returns:
+            dict or None if nothing usable was captured
+        """
+        text = self.json_text
+        if not text:
+            return None
+        try:
+            data = json.loads(text, strict=False)  # strict=False tolerates raw newlines inside strings
+        except json.JSONDecodeError:
+            self.repaired = True
+            try:
+                data = json.loads(repair_json(text), strict=False)
+            except json.JSONDecodeError as e:
+                logger.warning("JSON repair failed: %s", e)
+                return None
+        return data if isinstance(data, dict) else None
+
+_DECODER = json.JSONDecoder(strict=False)
+
+def parse_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse the first JSON object in a complete (non-streamed) response.
+    Valid JSON followed by prose is decoded directly; anything else is
+    repaired in a single pass, which also stops at the end of the object.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+    try:
+        data, _ = _DECODER.raw_decode(text, start)
+        if isinstance(data, dict):
+            return data
+    except json.JSONDecodeError:
+        pass
+    try:
+        data = json.loads(repair_json(text[start:]), strict=False)
+    except json.JSONDecodeError as e:
+        logger.warning("JSON repair failed: %s", e)
+        return None
+    return data if isinstance(data, dict) else None
+
+def repair_json(text: str) -> str:
+    """
+    Repair common LLM JSON defects in a single pass:
+    single-quoted strings, unquoted keys, trailing commas, Python literals
+    (None/True/False), "null" strings, unquoted values such as 3.3V,
+    comments, mismatched closers, and output truncated mid-object.
+
+    Args:
+        text: JSON-like text starting at the top-level '{'
+
+    Returns:
+        str: Text that json.loads is much more likely to accept
+    """
+    out = []
+    stack = []
+    last = ""  # Last significant character written to out
+    open_key_at = None  # Index in out of a key still waiting for its ':'
+    i = 0
+    n = len(text)
+
+    def drop_trailing_comma():
+        nonlocal last
+        if last == ",":
+            for index in range(len(out) - 1, -1, -1):
+                if out[index].strip():
+                    # The comma ends the last significant piece, on its own or after a run of members
+                    out[index] = out[index].rstrip()[:-1]
+                    break
+            last = next((piece.rstrip()[-1] for piece in reversed(out) if piece.strip()), "")
+
+    def emit(piece):
+        nonlocal last
+        out.append(piece)
+        if piece.strip():
+            last = piece.rstrip()[-1]
+
+    while i < n:
+        if stack and last in "{[,":
+            run = (_OBJECT_RUN if stack[-1] == "{" else _ARRAY_RUN).match(text, i)
+            if run:
+                out.append(run.group())
+                last = ","
+                i = run.end()
+                continue
+
+        char = text[i]
+
+        if char == '"':
+            match = _STRING_LITERAL.match(text, i)
+            if match:
+                end = match.end()
+                literal = match.group()
+            else:
+                end = n
+                literal = text[i:].rstrip("\\") + '"'  # Unterminated string at end of output
+            if literal == '"null"' and last == ":":
+                literal = "null"
+            if stack and stack[-1] == "{" and last in "{,":
+                open_key_at = len(out)
+            emit(literal)
+            i = end
+
+        elif char == "'":
+            end = i + 1
+            content = []
+            while end < n and text[end] != "'":
+                if text[end] == "\\" and end + 1 < n:
+                    content.append(text[end + 1] if text[end + 1] == "'" else text[end:end + 2])
+                    end += 2
+                    continue
+                content.append('\\"' if text[end] == '"' else text[end])
+                end += 1
+            if stack and stack[-1] == "{" and last in "{,":
+                open_key_at = len(out)
+            emit('"' + "".join(content) + '"')
+            i = end + 1
+
+        elif char in "{[":
+            stack.append(char)
+            emit(char)
+            i += 1
+
+        elif char in "}]":
+            drop_trailing_comma()
+            if not stack:
+                break  # Stray closer after the top-level object; ignore the rest
+            opener = stack.pop()
+            emit("}" if opener == "{" else "]")
+            i += 1
+            if not stack:
+                break
+
+        elif char == ",":
+            if last not in ",{[":
+                emit(",")
+            i += 1
+
+        elif char == "/" and text.startswith("//", i):
+            newline = text.find("\n", i)
+            i = n if newline == -1 else newline
+        elif char == "/" and text.startswith("/*", i):
+            close = text.find("*/", i + 2)
+            i = n if close == -1 else close + 2
+
+        elif char.isalpha() or char == "_":
+            match = _IDENTIFIER.match(text, i)
+            word = match.group()
+            after = _WHITESPACE.match(text, match.end()).end()
+            if stack and stack[-1] == "{" and last in "{," and after < n and text[after] == ":":
+                open_key_at = len(out)
+                emit(f'"{word}"')
+                i = match.end()
+            elif word in LITERALS:
+                emit(LITERALS[word])
+                i = match.end()
+            else:
+                # Bare text value, e.g. "range: 0 to 100 cm" without quotes
+                end_match = _BARE_VALUE_END.search(text, i)
+                end = end_match.start() if end_match else n
+                emit(json.dumps(text[i:end].strip()))
+                i = end
+
+        elif char.isdigit() or char in "-+.":
+            match = _NUMBER.match(text, i)
+            if not match:
+                i += 1
+                continue
+            end_match = _BARE_VALUE_END.search(text, match.end())
+            end = end_match.start() if end_match else n
+            if text[match.end():end].strip():
+                # Number followed by units or other text (e.g. 3.3V): keep it as a string
+                emit(json.dumps(text[i:end].strip()))
+                i = end
+            else:
+                emit(match.group().lstrip("+"))
+                i = match.end()
+
+        elif char == ":":
+            out.append(char)
+            last = ":"
+            open_key_at = None
+            i += 1
+
+        elif char.isspace():
+            end = _WHITESPACE.match(text, i).end()
+            out.append(text[i:end])
+            i = end
+
+        else:
+            i += 1  # Stray characters such as backticks
+
+    if open_key_at is not None:
+        # Output was cut off right after a key; drop the dangling key
+        del out[open_key_at:]
+        last = next((piece.rstrip()[-1] for piece in reversed(out) if piece.strip()), "")
+    drop_trailing_comma()
+    if last == ":":
+        emit("null")
+    while stack:
+        emit("}" if stack.pop() == "{" else "]")
+
+    return "".join(out)
@@ -0,0 +1,191 @@
+"""
+Local stand-in for OpenRouter speaking the OpenAI chat-completions protocol.
+
+Point the backend at it with OPENROUTER_BASE_URL=http://localhost:8100/api/v1
+(any non-empty OPENROUTER_API_KEY works) to load-test without API credits.
+Extraction prompts get a synthetic datasheet JSON object, chat prompts a short
+assistant reply. Latency, token rate, streaming and errors are configurable.
+
+Run from the backend directory:
+    python -m loadtest.fake_openrouter --port 8100 --latency-ms 400 --latency-sigma 0.5 \\
+        --tokens-per-second 80 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Dict, Any, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks import synthetic
+
+app = FastAPI(title="Fake OpenRouter")
+
+# Defaults; overridden from the command line in main()
+server_config: Dict[str, Any] = {
+    "latency_ms": 300.0,        # Median time to first token
+    "latency_sigma": 0.5,       # Log-normal spread of the latency (0 = fixed)
+    "tokens_per_second": 100.0, # Generation speed after the first token (0 = instant)
+    "error_rate": 0.0,          # Fraction of requests failing with an injected error
+    "error_statuses": [429, 500, 503],
+    "retry_after": 1,           # Retry-After seconds sent with 429/503
+    "spec_fields": 8,           # Spec fields per category in extraction responses
+    "chat_words": 80            # Words in chat replies
+}
+
+stats = {"requests": 0, "streamed": 0, "errors": 0, "completion_tokens": 0}
+
+def count_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), as used for usage reporting."""
+    return len(text) // 4 + 1
+
+def is_extraction(body: Dict[str, Any]) -> bool:
+    """Extraction requests ask for JSON (via response_format or the prompt); everything else is chat."""
+    if body.get("response_format"):
+        return True
+    messages = body.get("messages") or []
+    last = messages[-1].get("content", "") if messages else ""
+    if isinstance(last, list):
+        last = " ".join(part.get("text", "") for part in last if isinstance(part, dict))
+    return "JSON" in last
+
+def build_reply(body: Dict[str, Any]) -> str:
+    """Generate the completion text for a request."""
+    seed = random.randint(0, 1_000_000)
+    if is_extraction(body):
+        return json.dumps(synthetic.extraction_data(server_config["spec_fields"], seed=seed))
+    return synthetic.assistant_reply(server_config["chat_words"], confirmation=random.random() < 0.3, seed=seed)
+
+def prompt_tokens(body: Dict[str, Any]) -> int:
+    total = 0
+    for message in body.get("messages") or []:
+        content = message.get("content", "")
+        total += count_tokens(content if isinstance(content, str) else json.dumps(content))
+    return total
+
+def sample_latency() -> float:
+    """Seconds before the first token, log-normal around the configured median."""
+    median = server_config["latency_ms"] / 1000
+    sigma = server_config["latency_sigma"]
+    return median * random.lognormvariate(0, sigma) if sigma > 0 else median
+
+def split_tokens(text: str) -> List[str]:
+    """Split text into ~4-character pieces to stream as tokens."""
+    return [text[i:i + 4] for i in range(0, len(text), 4)] or [""]
+
+def injected_error():
+    """Return an error response for a configured fraction of requests, else None."""
+    if random.random() >= server_config["error_rate"]:
+        return None
+    status = random.choice(server_config["error_statuses"])
+    stats["errors"] += 1
+    headers = {"Retry-After": str(server_config["retry_after"])} if status in (429, 503) else {}
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": f"Injected error {status}", "type": "fake_openrouter", "code": status}},
+        headers=headers
+    )
+
+def usage_block(body: Dict[str, Any], completion: str) -> Dict[str, int]:
+    prompt = prompt_tokens(body)
+    completion_tokens = count_tokens(completion)
+    return {"prompt_tokens": prompt, "completion_tokens": completion_tokens, "total_tokens": prompt + completion_tokens}
+
+@app.post("/api/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    error = injected_error()
+    if error is not None:
+        await asyncio.sleep(sample_latency() / 4)
+        return error
+
+    reply = build_reply(body)
+    model = body.get("model", "fake/model")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+    tokens = split_tokens(reply)
+    rate = server_config["tokens_per_second"]
+    stats["completion_tokens"] += len(tokens)
+
+    if body.get("stream"):
+        stats["streamed"] += 1
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        async def event_stream():
+            await asyncio.sleep(sample_latency())
+            for index, token in enumerate(tokens):
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"role": "assistant", "content": token} if index == 0 else {"content": token}, "finish_reason": None}]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                if rate > 0:
+                    await asyncio.sleep(1 / rate)
+            final = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            if include_usage:
+                usage = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [], "usage": usage_block(body, reply)}
+                yield f"data: {json.dumps(usage)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    await asyncio.sleep(sample_latency() + (len(tokens) / rate if rate > 0 else 0))
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+        "usage": usage_block(body, reply)
+    }
+
+@app.get("/api/v1/models")
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": "fake/model", "object": "model", "owned_by": "fake_openrouter"}]}
+
+@app.get("/stats")
+async def get_stats():
+    """Request counters and the active configuration."""
+    return {**stats, "config": server_config}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=server_config["latency_ms"], help="Median time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=server_config["latency_sigma"], help="Log-normal latency spread (0 = fixed)")
+    parser.add_argument("--tokens-per-second", type=float, default=server_config["tokens_per_second"], help="Generation speed (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=server_config["error_rate"], help="Fraction of requests answered with an error")
+    parser.add_argument("--error-statuses", default="429,500,503", help="Comma-separated statuses to inject")
+    parser.add_argument("--retry-after", type=int, default=server_config["retry_after"], help="Retry-After seconds on 429/503")
+    parser.add_argument("--spec-fields", type=int, default=server_config["spec_fields"], help="Spec fields per category in extraction replies")
+    parser.add_argument("--chat-words", type=int, default=server_config["chat_words"], help="Words per chat reply")
+    args = parser.parse_args()
+
+    server_config.update({
+        "latency_ms": args.latency_ms,
+        "latency_sigma": args.latency_sigma,
+        "tokens_per_second": args.tokens_per_second,
+        "error_rate": args.error_rate,
+        "error_statuses": [int(status) for status in args.error_statuses.split(",") if status],
+        "retry_after": args.retry_after,
+        "spec_fields": args.spec_fields,
+        "chat_words": args.chat_words
+    })
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
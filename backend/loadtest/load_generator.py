@@ -0,0 +1,135 @@
+"""
+Load generator driving /chat and /pdf/upload concurrently.
+
+Start the fake OpenRouter server and the backend pointed at it, then run from the
+backend directory:
+    python -m loadtest.fake_openrouter --port 8100 &
+    OPENROUTER_BASE_URL=http://localhost:8100/api/v1 OPENROUTER_API_KEY=fake python main.py &
+    python -m loadtest.load_generator --url http://localhost:8000/api/v1 --concurrency 20 --duration 60 --upload-ratio 0.2
+
+Reports throughput and p50/p90/p99 latency per endpoint, plus status code counts.
+Uploads need a reachable MongoDB, as in normal operation.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+from benchmarks import synthetic
+
+CHAT_MESSAGES = [
+    "I need a temperature sensor for an outdoor weather station",
+    "What pressure sensor would work for a water tank level?",
+    "Recommend a low-power accelerometer for a wearable",
+    "yes",
+    "Which humidity sensor has an I2C interface?"
+]
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+class Recorder:
+    """Collects per-endpoint latencies and status codes."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Counter] = {}
+
+    def record(self, endpoint: str, seconds: float, status: str):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        self.statuses.setdefault(endpoint, Counter())[status] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        result = {}
+        for endpoint, values in self.latencies.items():
+            values = sorted(values)
+            ok = sum(count for status, count in self.statuses[endpoint].items() if status.startswith("2"))
+            result[endpoint] = {
+                "requests": len(values),
+                "ok": ok,
+                "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+                "p90_ms": round(percentile(values, 0.90) * 1000, 1),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1),
+                "statuses": dict(self.statuses[endpoint])
+            }
+        return result
+
+async def send_chat(client: httpx.AsyncClient, args) -> str:
+    response = await client.post("/chat", json={"message": random.choice(CHAT_MESSAGES), "model": args.model})
+    return str(response.status_code)
+
+async def send_upload(client: httpx.AsyncClient, args, pdfs: List[bytes]) -> str:
+    # Distinct PDFs per request unless --repeat-pdf, so content-hash coalescing does not hide the work
+    pdf = pdfs[0] if args.repeat_pdf else synthetic.datasheet_pdf(args.pages, seed=random.randint(0, 1_000_000))
+    files = {"file": (f"loadtest_sx{random.randint(100, 999)}.pdf", pdf, "application/pdf")}
+    response = await client.post("/pdf/upload", files=files, data={"model": args.model})
+    return str(response.status_code)
+
+async def worker(client: httpx.AsyncClient, args, recorder: Recorder, deadline: float, remaining: Optional[List[int]], pdfs: List[bytes]):
+    while time.monotonic() < deadline:
+        if remaining is not None:
+            if remaining[0] <= 0:
+                return
+            remaining[0] -= 1
+        endpoint = "/pdf/upload" if random.random() < args.upload_ratio else "/chat"
+        started = time.perf_counter()
+        try:
+            if endpoint == "/chat":
+                status = await send_chat(client, args)
+            else:
+                status = await send_upload(client, args, pdfs)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        recorder.record(endpoint, time.perf_counter() - started, status)
+
+async def run(args) -> Dict[str, Any]:
+    recorder = Recorder()
+    pdfs = [synthetic.datasheet_pdf(args.pages, seed=args.seed)]
+    remaining = [args.requests] if args.requests else None
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        started = time.monotonic()
+        deadline = started + args.duration
+        await asyncio.gather(*(worker(client, args, recorder, deadline, remaining, pdfs) for _ in range(args.concurrency)))
+        elapsed = time.monotonic() - started
+    return {"elapsed_s": round(elapsed, 2), "concurrency": args.concurrency, "endpoints": recorder.summary(elapsed)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/api/v1", help="Backend API base URL")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent virtual clients")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0 = run for --duration)")
+    parser.add_argument("--upload-ratio", type=float, default=0.1, help="Fraction of requests that are PDF uploads")
+    parser.add_argument("--pages", type=int, default=6, help="Pages per synthetic PDF")
+    parser.add_argument("--repeat-pdf", action="store_true", help="Upload the same PDF every time")
+    parser.add_argument("--model", default="meta-llama/llama-3.1-8b-instruct", help="Model name sent with requests")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"Ran {report['elapsed_s']}s with {report['concurrency']} concurrent clients")
+    for endpoint, result in report["endpoints"].items():
+        print(f"{endpoint:12s} {result['requests']:6d} req ({result['ok']} ok)  {result['throughput_rps']:7.2f} req/s  "
+              f"p50 {result['p50_ms']:8.1f} ms  p90 {result['p90_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms  "
+              f"max {result['max_ms']:8.1f} ms  {result['statuses']}")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,16 @@
 import sys
 import os
 import uvicorn
+from fastapi import Response
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
 from routes.api import router
+from services.metrics import render_metrics
+from services.profiler import profiling_middleware
+from services.request_context import request_id_middleware
+from services.rate_limit import rate_limit_middleware
+from llm.client import close_http_client
+from services.transcripts import transcript_writer
 from dotenv import load_dotenv
 
 # Add the parent directory to sys.path to make imports work
@@ -15,6 +24,14 @@ load_dotenv()
 # Create FastAPI app using the factory function from config
 app = create_app()
 
+# Per-client rate limits. Appended rather than added so it runs inside CORSMiddleware,
+# which then adds its headers to 429 responses and lets browsers read them
+app.user_middleware.append(Middleware(BaseHTTPMiddleware, dispatch=rate_limit_middleware))
+# Admin-requested per-request profiling (X-Admin-Token plus X-Profile: 1 or ?profile=1)
+app.middleware("http")(profiling_middleware)
+# Registered last so it runs first: every log record of a request carries its id
+app.middleware("http")(request_id_middleware)
+
 # Include API router with the v1 prefix to match Config.API_PREFIX from config.py
 app.include_router(router, prefix="/api/v1")
 
@@ -27,6 +44,12 @@ app.include_router(router, prefix="/api/v1")
 #     allow_headers=["*"],
 # )
 
+@app.on_event("shutdown")
+async def shutdown():
+    # Write buffered chat transcripts before the process exits
+    await transcript_writer.close()
+    await close_http_client()
+
 @app.get("/")
 async def root():
     """
@@ -34,8 +57,17 @@ async def root():
     """
     return {"message": "Unlearned Sensors Assistant API is running"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus scrape endpoint: pipeline stage timings, chat latencies,
+    token counts, MongoDB latencies and cache statistics.
+    """
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
 if __name__ == "__main__":
-    logger.info(f"Starting server on {settings.host}:{settings.port}")
+    logger.info("Starting server on %s:%s", settings.host, settings.port)
     uvicorn.run(
         "main:app", # Reference the app created in this file
         host=settings.host,
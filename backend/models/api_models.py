@@ -6,6 +6,7 @@ class ChatRequest(BaseModel):
     query: str = ""    # Support 'query' field as an alternative
     model: str = "meta-llama/llama-3.1-8b-instruct"
     auto_confirm: bool = False  # Flag to indicate if this is an auto-confirmed "yes" response
+    session_id: Optional[str] = None  # Client session, used for token accounting and budgets (default: per client)
 
 class ChatResponse(BaseModel):
     simplified_message: str  # Concise message for MultifunctionBox
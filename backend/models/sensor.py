@@ -1,24 +1,30 @@
-from pydantic import BaseModel, Field
-from typing import Dict, List, Optional, Any
+import orjson
+from dataclasses import dataclass, field
+from pydantic import BaseModel, Field, ConfigDict
+from typing import Dict, List, Optional, Any, Union
 
-class PerformanceSpecs(BaseModel):
+class SpecCategory(BaseModel):
+    # LLMs often return bare numbers (e.g. "weight": 5); accept them as strings
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+class PerformanceSpecs(SpecCategory):
     torque_range: Optional[str] = None
     speed: Optional[str] = None
     accuracy: Optional[str] = None
     precision: Optional[str] = None
     resolution: Optional[str] = None
 
-class ElectricalSpecs(BaseModel):
+class ElectricalSpecs(SpecCategory):
     power_supply: Optional[str] = None
     control_voltage: Optional[str] = None
     output_type: Optional[str] = None
 
-class MechanicalSpecs(BaseModel):
+class MechanicalSpecs(SpecCategory):
     dimensions: Optional[str] = None
     weight: Optional[str] = None
-    mounting_options: Optional[List[str]] = None
+    mounting_options: Optional[Union[str, List[str]]] = None
 
-class EnvironmentalSpecs(BaseModel):
+class EnvironmentalSpecs(SpecCategory):
     operating_temp: Optional[str] = None
     storage_temp: Optional[str] = None
     environmental_ratings: Optional[str] = None
@@ -35,9 +41,119 @@ class SourceInfo(BaseModel):
     page_count: Optional[int] = None
 
 class SensorSpecification(BaseModel):
+    """
+    A sensor as the LLM is asked to return it: the schema behind structured output
+    (PageExtraction, DataExtractor's output parser) and the validation of responses.
+    Stored and served sensors are SensorRecords, which are not validated on every read.
+    """
     sensor_type: str
     manufacturer: str
     model: str
     specifications: Specifications = Field(default_factory=Specifications)
     extra_fields: Dict[str, Any] = Field(default_factory=dict)
     source: Optional[SourceInfo] = None
+
+class PageExtraction(SensorSpecification):
+    """
+    Schema for data extracted from a single page or chunk of a datasheet.
+    Identity fields are optional because most pages don't repeat them.
+    """
+    sensor_type: Optional[str] = None
+    manufacturer: Optional[str] = None
+    model: Optional[str] = None
+
+IDENTITY_FIELDS = ("sensor_type", "manufacturer", "model")
+# Top-level document fields beyond identity with a dict or list value
+DICT_FIELDS = ("specifications", "extra_fields", "source", "extraction_stats")
+
+@dataclass(slots=True)
+class SensorRecord:
+    """
+    Stored sensor document (sensor_specifications) as a compact typed record.
+
+    Decoding from MongoDB only checks shapes (no pydantic validation) and keeps
+    nested sections as they are, so reads do not copy or re-walk them. Keys
+    outside the known fields are kept in `other` so no stored data is lost.
+    """
+    id: Optional[str] = None
+    sensor_type: str = ""
+    manufacturer: str = ""
+    model: str = ""
+    specifications: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    extra_fields: Dict[str, Any] = field(default_factory=dict)
+    source: Dict[str, Any] = field(default_factory=dict)
+    classification_model: Optional[str] = None
+    extraction_strategy: Optional[str] = None
+    extraction_stats: Dict[str, Any] = field(default_factory=dict)
+    field_provenance: List[Dict[str, Any]] = field(default_factory=list)
+    other: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SensorRecord":
+        """
+        Build a record from an extraction result or stored document.
+
+        Args:
+            data: Document with identity fields, specifications, extra_fields, source, ...
+
+        Returns:
+            SensorRecord: Nested sections are shared with data, not copied
+        """
+        record = cls()
+        for key, value in data.items():
+            if key in IDENTITY_FIELDS:
+                setattr(record, key, "" if value is None else str(value))
+            elif key in DICT_FIELDS:
+                if isinstance(value, dict):
+                    setattr(record, key, value)
+            elif key == "field_provenance":
+                if isinstance(value, list):
+                    record.field_provenance = value
+            elif key in ("classification_model", "extraction_strategy"):
+                setattr(record, key, None if value is None else str(value))
+            elif key == "_id":
+                record.id = str(value)
+            else:
+                record.other[key] = value
+        return record
+
+    @classmethod
+    def from_mongo(cls, document: Optional[Dict[str, Any]]) -> Optional["SensorRecord"]:
+        """Decode a sensor_specifications document (None stays None)."""
+        return None if document is None else cls.from_dict(document)
+
+    def to_mongo(self) -> Dict[str, Any]:
+        """Fields to $set in sensor_specifications; the id and unset optional fields are left out."""
+        document = {
+            "sensor_type": self.sensor_type,
+            "manufacturer": self.manufacturer,
+            "model": self.model,
+            "specifications": self.specifications,
+            "extra_fields": self.extra_fields,
+            "source": self.source,
+        }
+        if self.classification_model is not None:
+            document["classification_model"] = self.classification_model
+        if self.extraction_strategy is not None:
+            document["extraction_strategy"] = self.extraction_strategy
+        if self.extraction_stats:
+            document["extraction_stats"] = self.extraction_stats
+        if self.field_provenance:
+            document["field_provenance"] = self.field_provenance
+        document.update(self.other)
+        return document
+
+    def to_dict(self) -> Dict[str, Any]:
+        """API representation: the stored document with its id as "_id"."""
+        document = self.to_mongo()
+        if self.id is not None:
+            document = {"_id": self.id, **document}
+        return document
+
+    def to_json(self) -> bytes:
+        """API representation encoded with orjson."""
+        return orjson.dumps(self.to_dict())
+
+def encode_sensor_list(records: List[SensorRecord]) -> bytes:
+    """The GET /sensors response body ({"sensors": [...]}) encoded with orjson."""
+    return orjson.dumps({"sensors": [record.to_dict() for record in records]})
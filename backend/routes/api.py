@@ -1,28 +1,58 @@
+import os
 import time
-from fastapi import HTTPException, UploadFile, File, APIRouter, Form
-from typing import List
+import json
+import asyncio
+from fastapi import HTTPException, APIRouter, Depends, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from typing import List, Optional, Tuple
 from pydantic import BaseModel
 # Replace relative imports with absolute imports
-from config import logger
+from config import logger, settings
 from models.api_models import ChatRequest, ChatResponse
-from models.sensor import SensorSpecification
-from llm.client import create_chain, create_extraction_chain  # Add the new import
+from llm.client import (
+    create_chain, create_extraction_chain, call_llm_shared, get_llm_status, CircuitOpenError,
+    record_prompt_cache_usage
+)
+from services.single_flight import SingleFlight, hash_key
+from services.metrics import chat_llm_seconds, intent_detection_seconds
+from services.admin import require_admin
+from services.profiler import list_profiles, get_profile_path
+from services.usage import (
+    usage_scope, collect_usage, bill_usage, check_budget, get_usage_summary, BudgetExceededError
+)
+from services.upload_intake import (
+    receive_upload, SpooledFile, upload_bytes_in_flight, InvalidUploadError, UploadTooLargeError, UploadCapacityError
+)
 from services.conversation import (
-    get_conversation_state, reset_conversation, add_to_history, 
-    get_history_text, update_step, update_last_confirmation_time,
+    load_session, reset_conversation, add_to_history, 
+    get_history_messages, update_step, update_last_confirmation_time,
     should_throttle_confirmation, extract_simplified_message
 )
 from services.intent_detection import detect_intent
-from services.sensor_service import get_all_sensors, get_sensor_by_model, debug_mongodb_connection
+from services.response_cache import chat_response_cache
+from services.rate_limit import check_file_limit, client_key
+from services.sensor_service import get_sensor_by_model, debug_mongodb_connection
+from services.catalog import get_catalog_snapshot, conditional_response, make_etag
 # Import the PDF processing function
-from services.pdf_processor import process_pdf_datasheet
-from services.pdf_processor_alt import process_pdf_datasheet_alt
+from services.pdf_processor_alt import get_extraction_stats, new_upload_id
+from services.extraction_pipeline import process_datasheet, get_strategy_comparison_summary, STRATEGIES
 
 # Create router
 router = APIRouter()
 
+# Concurrent uploads of the same datasheet (double clicks, two users) share one pipeline run
+upload_single_flight = SingleFlight("PDF upload")
+
+def client_session_id(http_request: Request, session_id: Optional[str]) -> str:
+    """
+    Session a request belongs to: the session_id the client sent, or one derived from the
+    client's address, so clients that send none do not share a conversation and budget.
+    """
+    return session_id or f"client:{client_key(http_request)}"
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
+    session_id = client_session_id(http_request, request.session_id)
     try:
         # Use 'message' if provided, otherwise fall back to 'query'
         user_input = request.message if request.message else request.query
@@ -30,11 +60,12 @@ async def chat(request: ChatRequest):
             logger.warning("No message or query provided in request")
             raise HTTPException(status_code=400, detail="Message or query field is required")
 
-        # Get current conversation state
-        conversation_state = get_conversation_state()
+        # Get the session's conversation state (rehydrated from its stored transcript after a restart)
+        conversation_state = await load_session(session_id)
         
         # Log the incoming request
-        logger.debug(f"Incoming request: message='{request.message}', query='{request.query}', model='{request.model}', state={conversation_state}, auto_confirm={request.auto_confirm}")
+        logger.debug("Incoming request: message=%r, query=%r, model=%r, step=%s, auto_confirm=%s",
+                     request.message, request.query, request.model, conversation_state.get("step"), request.auto_confirm)
 
         # Add user input to chat history (unless it's an auto-confirmed "yes")
         if not request.auto_confirm:
@@ -57,7 +88,7 @@ async def chat(request: ChatRequest):
                 response_text = "Please upload a PDF with the sensor datasheet for further assistance."
                 simplified_message = "Please upload a PDF to provide more details about the sensor."
                 add_to_history("assistant", response_text)
-                logger.info(f"User responded 'no', transitioning to pdf_upload")
+                logger.info("User responded 'no', transitioning to pdf_upload")
                 return ChatResponse(
                     simplified_message=simplified_message,
                     response=response_text,
@@ -68,7 +99,7 @@ async def chat(request: ChatRequest):
                 if conversation_state["step"] == "step_1":
                     # User confirmed the sensor, move to step 2
                     update_step("step_2")
-                    logger.info(f"User confirmed sensor, transitioning from step_1 to step_2")
+                    logger.info("User confirmed sensor, transitioning from step_1 to step_2")
                     user_input = f"Confirmed sensor for {conversation_state['last_user_input']}. Provide detailed specifications and setup."
                 elif conversation_state["step"] == "step_2":
                     # User confirmed the setup, move to completion
@@ -76,7 +107,7 @@ async def chat(request: ChatRequest):
                     response_text = "Sensor setup confirmed. You can now proceed with implementation."
                     simplified_message = "Sensor setup confirmed. Proceed with implementation."
                     add_to_history("assistant", response_text)
-                    logger.info(f"User confirmed setup, transitioning to completed state")
+                    logger.info("User confirmed setup, transitioning to completed state")
                     return ChatResponse(
                         simplified_message=simplified_message,
                         response=response_text,
@@ -84,22 +115,38 @@ async def chat(request: ChatRequest):
                         chat_history=conversation_state["chat_history"]
                     )
 
-        # Create LLM chain with appropriate model
-        current_chain = create_chain(model_name=request.model, temperature=0.1)
+        # Previous turns as chat messages; the current input (already recorded above) is sent last
+        history_messages = get_history_messages(exclude_last=1)
 
-        # Format chat history for the prompt
-        history_text = get_history_text()
+        # A first turn depends only on the request, so near-identical openers can share a response
+        first_turn = (settings.chat_cache_enabled and not history_messages
+                      and conversation_state["step"] == "step_1" and not request.auto_confirm)
+        response_text = chat_response_cache.get(request.model, user_input) if first_turn else None
+        if response_text is None:
+            # Create LLM chain with appropriate model
+            current_chain = create_chain(model_name=request.model, temperature=0.1)
 
-        # Run LangChain chain with chat history
-        ai_response = await current_chain.ainvoke({"history": history_text, "user_input": user_input})
-        response_text = ai_response["text"]
-        logger.debug(f"Raw AI response: {response_text}")
+            # Run LangChain chain: static system prompt, then history, then the user input
+            chain_inputs = {"history": history_messages, "user_input": user_input}
+            prompt_key = hash_key(request.model, current_chain.first.format(**chain_inputs))
+            with chat_llm_seconds.labels(request.model).time(), usage_scope(session_id=session_id):
+                ai_response = await call_llm_shared(
+                    prompt_key,
+                    lambda: current_chain.ainvoke(chain_inputs),
+                    description="Chat completion"
+                )
+            response_text = ai_response.content
+            record_prompt_cache_usage(ai_response, request.model)
+            logger.debug("Raw AI response (%d chars): %.500s", len(response_text), response_text)
+            if first_turn:
+                chat_response_cache.put(request.model, user_input, response_text)
 
         # Add AI response to chat history
         add_to_history("assistant", response_text)
 
         # Process the response with spaCy to detect intent
-        next_action, detected_step = detect_intent(response_text, conversation_state["step"])
+        with intent_detection_seconds.time():
+            next_action, detected_step = detect_intent(response_text, conversation_state["step"])
         
         # Update step if intent detection suggests a different step
         if detected_step != conversation_state["step"]:
@@ -113,7 +160,7 @@ async def chat(request: ChatRequest):
             conversation_state["last_user_input"] = user_input
 
         # Log the determined next_action
-        logger.info(f"Determined next_action: {next_action}")
+        logger.info("Determined next_action: %s", next_action)
 
         # Send the simplified message, full response, next_action, and chat history
         return ChatResponse(
@@ -123,8 +170,18 @@ async def chat(request: ChatRequest):
             chat_history=conversation_state["chat_history"]
         )
 
+    except CircuitOpenError as e:
+        logger.warning("Chat request rejected: %s", e)
+        raise HTTPException(
+            status_code=503,
+            detail="The language model provider is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(int(e.retry_after) + 1)}
+        )
+    except BudgetExceededError as e:
+        logger.warning("Chat request rejected: %s", e)
+        raise HTTPException(status_code=402, detail="The token budget for this session has been used up.")
     except Exception as e:
-        logger.error(f"Error during AI interaction: {str(e)}", exc_info=True)
+        logger.error("Error during AI interaction: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.post("/sensor/confirm")
@@ -133,59 +190,137 @@ async def confirm_sensor(request: ChatRequest):
     Handle sensor confirmation (yes/no).
     """
     user_input = request.message if request.message else request.query
-    logger.debug(f"Received sensor confirmation: message='{user_input}'")
+    logger.debug("Received sensor confirmation: message=%r", user_input)
     if user_input.lower() == "yes":
         response = {"message": "Sensor setup confirmed. Proceeding with setup.", "next_action": "continue"}
-        logger.info(f"Sending confirmation response: {response}")
+        logger.info("Sending confirmation response: %s", response)
         return response
     elif user_input.lower() == "no":
         response = {"message": "Please upload a PDF to review the correct sensor configuration.", "next_action": "pdf_upload"}
-        logger.info(f"Sending confirmation response: {response}")
+        logger.info("Sending confirmation response: %s", response)
         return response
     else:
-        logger.warning(f"Invalid confirmation response: {user_input}")
+        logger.warning("Invalid confirmation response: %s", user_input)
         raise HTTPException(status_code=400, detail="Invalid response. Please respond with 'yes' or 'no'.")
 
-@router.post("/pdf/upload")
-async def upload_pdf(file: UploadFile = File(...), model: str = Form(default=None)):
+async def extract_shared(upload: SpooledFile, model: str, cascade: bool, session_id: str, **pipeline_options) -> Tuple[dict, str]:
     """
-    Handle PDF file upload, process it, and store extracted data.
+    Run the extraction pipeline on a spooled upload; concurrent uploads of the same file
+    (double clicks, two users) share one run.
+    
+    The shared run holds its own reference to the spooled file, so the file stays on disk
+    even if the request that started the run finishes or disconnects first. Once every
+    caller has gone, the run is cancelled. The run is
+    stored and billed under the upload ID of the request that started it, and every caller
+    gets that ID back. Its token usage is billed to each caller's session.
     
     Args:
+        upload: The spooled PDF
+        model: Optional model name to use for extraction
+        cascade: Use the small-then-large model cascade
+        session_id: Client session billed for the run
+        **pipeline_options: Passed on to process_datasheet (shared chain and semaphore of a batch)
+    
+    Returns:
+        tuple: (processed data, upload ID the extraction was stored under)
+    """
+    # A session over its budget may neither start nor join a run
+    with usage_scope(session_id=session_id):
+        await check_budget()
+    
+    async def run(upload_id: str):
+        collected = {}
+        try:
+            # Billed to the upload here; sessions are billed by each caller below
+            with usage_scope(session_id="", upload_id=upload_id), collect_usage(upload_id) as collected:
+                processed_data = await process_datasheet(
+                    None, upload.filename, model, cascade=cascade, content_hash=upload.sha256,
+                    upload_id=upload_id, pdf_path=upload.path, **pipeline_options
+                )
+            return processed_data, upload_id, collected
+        except BaseException:
+            # Callers get no result to bill from; charge what was spent to the session that started the run
+            bill_usage(collected, session_id)
+            raise
+        finally:
+            upload.release()
+    
+    def start():
+        # Runs synchronously in the first caller, before it can go away
+        upload.retain()
+        return run(new_upload_id(upload.sha256))
+    
+    processed_data, upload_id, collected = await upload_single_flight.do(
+        hash_key(upload.sha256, model, cascade, settings.extraction_strategy), start
+    )
+    bill_usage(collected, session_id)
+    return processed_data, upload_id
+
+# Request body of the upload endpoints, for the OpenAPI docs (the body is parsed by receive_upload, not FastAPI)
+def upload_openapi(file_field: str, many: bool, extra_fields: dict) -> dict:
+    file_schema = {"type": "string", "format": "binary"}
+    properties = {
+        file_field: {"type": "array", "items": file_schema} if many else file_schema,
+        "model": {"type": "string"},
+        "cascade": {"type": "boolean"},
+        "session_id": {"type": "string"},
+        **extra_fields
+    }
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {
+        "schema": {"type": "object", "properties": properties, "required": [file_field]}
+    }}}}
+
+def form_bool(value: Optional[str], default: Optional[bool] = None) -> Optional[bool]:
+    """Parse a boolean form field the way FastAPI does ("true", "1", "on", "yes" / "false", "0", "off", "no")."""
+    if value is None or value == "":
+        return default
+    lowered = value.strip().lower()
+    if lowered in ("true", "1", "on", "yes"):
+        return True
+    if lowered in ("false", "0", "off", "no"):
+        return False
+    raise HTTPException(status_code=422, detail=f"Invalid boolean value: {value!r}")
+
+@router.post("/pdf/upload", openapi_extra=upload_openapi("file", False, {}))
+async def upload_pdf(request: Request):
+    """
+    Handle PDF file upload, process it, and store extracted data.
+    
+    The multipart body is read as it arrives: the file goes straight to disk and the size
+    and in-flight caps are enforced while reading (see services.upload_intake).
+    
+    Form fields:
         file: The PDF file to process
         model: Optional model name to use for extraction (from frontend)
+        cascade: Use the small-then-large model cascade (defaults to PDF_CASCADE_ENABLED)
+        session_id: Client session the upload's token usage is also billed to
     """
-    logger.debug(f"Raw model parameter received: {model}")
-    if not file.filename.lower().endswith('.pdf'):
-        logger.warning(f"Upload attempt with non-PDF file: {file.filename}")
-        raise HTTPException(status_code=400, detail="Invalid file type. Only PDF files are allowed.")
-        
+    filename = None
     try:
-        content = await file.read()
-        filename = file.filename
-        logger.info(f"Received PDF for processing: filename='{filename}', size={len(content)} bytes, model={model}")
-        logger.debug(f"Model parameter received for PDF upload: {model}")
-        
-        # Use only the alternative processor
-        logger.info(f"Using alternative processor for {filename}")
-        processed_data = await process_pdf_datasheet_alt(content, filename, model)
+        async with receive_upload(request, "file", max_files=1) as (fields, files):
+            if not files:
+                raise HTTPException(status_code=422, detail="No file was uploaded.")
+            upload = files[0]
+            filename = upload.filename
+            model = fields.get("model") or None
+            cascade = form_bool(fields.get("cascade"))
+            session_id = client_session_id(request, fields.get("session_id"))
+            content_hash = upload.sha256
+            logger.info("Received PDF for processing: filename='%s', size=%s bytes, model=%s", filename, upload.size, model)
+            logger.debug("Model parameter received for PDF upload: %s", model)
+            
+            logger.info("Using extraction strategy %s for %s (sha256 %s)", settings.extraction_strategy, filename, content_hash[:12])
+            processed_data, upload_id = await extract_shared(upload, model, cascade, session_id)
         
         # Determine success message based on processing result
         model_name = processed_data.get("model", "Unknown")
+        extraction_quality = get_extraction_quality(processed_data)
         
-        # Check if we extracted meaningful data
-        extraction_quality = "partial"
-        if processed_data.get("manufacturer") and processed_data.get("sensor_type"):
-            # Check if any specifications were extracted
-            specs = processed_data.get("specifications", {})
-            if any(specs.get(category) for category in ["performance", "electrical", "mechanical", "environmental"]):
-                extraction_quality = "good"
-        
-        message = f"Successfully processed '{filename}' and extracted data for sensor model '{model_name}' using alternative processor."
+        message = f"Successfully processed '{filename}' and extracted data for sensor model '{model_name}'."
         if extraction_quality == "partial":
             message += " Limited data was extracted."
         
-        logger.info(f"Sending successful upload response: {message}")
+        logger.info("Sending successful upload response: %s", message)
         
         # Return more data to the frontend for feedback
         return {
@@ -198,27 +333,189 @@ async def upload_pdf(file: UploadFile = File(...), model: str = Form(default=Non
             "next_action": "none" # Explicitly indicate to return to default state
         }
         
+    except HTTPException:
+        raise
+    except InvalidUploadError as e:
+        logger.warning("Rejected PDF upload: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpenError as e:
+        logger.warning("PDF upload '%s' rejected: %s", filename, e)
+        raise HTTPException(
+            status_code=503,
+            detail="The language model provider is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(int(e.retry_after) + 1)}
+        )
+    except UploadTooLargeError as e:
+        logger.warning("PDF upload '%s' rejected: %s", filename, e)
+        raise HTTPException(status_code=413, detail=f"File too large. The maximum size is {e.limit} bytes.")
+    except UploadCapacityError as e:
+        logger.warning("PDF upload '%s' rejected: %s", filename, e)
+        raise HTTPException(
+            status_code=503,
+            detail="The server is busy processing other uploads. Please try again shortly.",
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+    except BudgetExceededError as e:
+        logger.warning("PDF upload '%s' stopped: %s", filename, e)
+        raise HTTPException(status_code=402, detail=f"The token budget for this {e.scope} has been used up.")
     except Exception as e:
         # Log the detailed error from processing
-        logger.error(f"Error processing uploaded PDF '{file.filename}': {str(e)}", exc_info=True)
+        logger.error("Error processing uploaded PDF '%s': %s", filename, e, exc_info=True)
         # Return a generic error message to the client
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
 
+def get_extraction_quality(processed_data: dict) -> str:
+    """"good" if manufacturer, sensor type and at least one specification category were extracted, else "partial"."""
+    if processed_data.get("manufacturer") and processed_data.get("sensor_type"):
+        specs = processed_data.get("specifications", {})
+        if any(specs.get(category) for category in ["performance", "electrical", "mechanical", "environmental"]):
+            return "good"
+    return "partial"
+
+async def process_batch_file(upload: SpooledFile, model: str, cascade: bool, session_id: str,
+                             extraction_chain, file_semaphore: asyncio.Semaphore, chunk_semaphore: asyncio.Semaphore) -> dict:
+    """
+    Process one spooled file of a batch upload; errors are reported in the result instead of raised.
+    
+    Returns:
+        dict: Per-file summary with status "ok" or "error"
+    """
+    result = {"filename": upload.filename}
+    if upload.error:
+        return {**result, "status": "error", "error": upload.error}
+    async with file_semaphore:
+        started = time.perf_counter()
+        try:
+            processed_data, upload_id = await extract_shared(
+                upload, model, cascade, session_id, extraction_chain=extraction_chain, chunk_semaphore=chunk_semaphore
+            )
+            return {
+                **result,
+                "status": "ok",
+                "upload_id": upload_id,
+                "content_hash": upload.sha256,
+                "processed_model": processed_data.get("model", "Unknown"),
+                "manufacturer": processed_data.get("manufacturer"),
+                "sensor_type": processed_data.get("sensor_type"),
+                "extraction_quality": get_extraction_quality(processed_data),
+                "seconds": round(time.perf_counter() - started, 2)
+            }
+        except CircuitOpenError:
+            error = "The language model provider is temporarily unavailable. Please retry this file shortly."
+        except BudgetExceededError as e:
+            error = f"The token budget for this {e.scope} has been used up."
+        except Exception as e:
+            logger.error("Error processing batch file '%s': %s", upload.filename, e, exc_info=True)
+            error = f"Error processing PDF: {str(e)}"
+        logger.warning("Batch file '%s' failed: %s", upload.filename, error)
+        return {**result, "status": "error", "error": error}
+
+@router.post("/pdf/upload/batch", openapi_extra=upload_openapi("files", True, {"stream": {"type": "boolean"}}))
+async def upload_pdf_batch(request: Request):
+    """
+    Upload and process several PDF datasheets in one request.
+    
+    Files share one extraction chain and the LLM connection pool. Up to BATCH_FILE_CONCURRENCY
+    files and BATCH_CHUNK_CONCURRENCY chunk extractions run at once across the batch. The body
+    is streamed to disk as it arrives, with the same caps as single uploads.
+    
+    Form fields:
+        files: The PDF files to process
+        model: Optional model name to use for extraction
+        cascade: Use the small-then-large model cascade (defaults to PDF_CASCADE_ENABLED)
+        session_id: Client session the batch's token usage is billed to
+        stream: Stream one JSON line per file as it finishes (application/x-ndjson)
+            instead of returning all results at the end
+    """
+    async def charge_file(file_number: int):
+        # One rate limit token per file, so batching does not multiply the per-client upload limit.
+        # Charged as each file part begins, so an over-limit batch is refused before the rest is read.
+        retry_after = await check_file_limit(request, file_number)
+        if retry_after:
+            raise HTTPException(status_code=429, detail="Too many uploads. Please wait before trying again.",
+                                headers={"Retry-After": str(retry_after)})
+
+    try:
+        async with receive_upload(request, "files", max_files=settings.batch_max_files, pdf_only=False,
+                                  on_file=charge_file) as (fields, files):
+            if not files:
+                raise HTTPException(status_code=422, detail="No files were uploaded.")
+            model = fields.get("model") or None
+            cascade = form_bool(fields.get("cascade"))
+            session_id = client_session_id(request, fields.get("session_id"))
+            stream = form_bool(fields.get("stream"), False)
+            logger.info("Received batch upload of %s files, model=%s, cascade=%s", len(files), model, cascade)
+            use_cascade = settings.pdf_cascade_enabled if cascade is None else cascade
+            # Cascade mode picks its own small/large chains per upload
+            extraction_chain = None if use_cascade else create_extraction_chain(
+                model_name=model or "meta-llama/llama-3.1-8b-instruct", temperature=0.1
+            )
+            # Each task holds its own reference, so files outlive this block while a streamed response runs
+            owned = [upload.retain() for upload in files]
+    except InvalidUploadError as e:
+        logger.warning("Rejected batch upload: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+    except UploadTooLargeError as e:
+        logger.warning("Batch upload rejected: %s", e)
+        raise HTTPException(status_code=413, detail=f"File too large. The maximum size is {e.limit} bytes.")
+    except UploadCapacityError as e:
+        logger.warning("Batch upload rejected: %s", e)
+        raise HTTPException(
+            status_code=503,
+            detail="The server is busy processing other uploads. Please try again shortly.",
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+    
+    file_semaphore = asyncio.Semaphore(settings.batch_file_concurrency)
+    chunk_semaphore = asyncio.Semaphore(settings.batch_chunk_concurrency)
+    tasks = []
+    for upload in owned:
+        task = asyncio.ensure_future(process_batch_file(upload, model, cascade, session_id, extraction_chain, file_semaphore, chunk_semaphore))
+        # A done callback also runs for tasks cancelled before they started
+        task.add_done_callback(lambda _, upload=upload: upload.release())
+        tasks.append(task)
+    
+    def summarize(results: List[dict]) -> dict:
+        succeeded = sum(1 for r in results if r["status"] == "ok")
+        return {"files": len(results), "succeeded": succeeded, "failed": len(results) - succeeded}
+    
+    if stream:
+        async def stream_results():
+            results = []
+            try:
+                for next_result in asyncio.as_completed(tasks):
+                    result = await next_result
+                    results.append(result)
+                    yield json.dumps(result) + "\n"
+                yield json.dumps({"summary": summarize(results)}) + "\n"
+            finally:
+                # Client went away: stop processing the remaining files. Pipeline runs that no other
+                # request is waiting on are cancelled with them (see SingleFlight), so they stop
+                # making LLM calls; runs shared with other uploads finish for those.
+                for task in tasks:
+                    task.cancel()
+        return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+    
+    results = await asyncio.gather(*tasks)
+    summary = summarize(results)
+    logger.info("Batch upload finished: %s/%s files succeeded", summary['succeeded'], summary['files'])
+    return {"summary": summary, "results": results, "next_action": "none"}
+
 @router.post("/reset")
-async def reset_api():
+async def reset_api(request: Request, session_id: Optional[str] = None):
     """
-    Reset the conversation state and history.
+    Reset the conversation state and history of a session.
     """
-    reset_conversation()
+    reset_conversation(client_session_id(request, session_id))
     return {"message": "Conversation reset successfully", "status": "success"}
 
 @router.get("/debug/state")
-async def debug_state():
+async def debug_state(request: Request, session_id: Optional[str] = None):
     """
-    Return the current conversation state for debugging.
+    Return a session's conversation state for debugging.
     """
-    conversation_state = get_conversation_state()
-    logger.info(f"Debug endpoint accessed. Current state: {conversation_state}")
+    conversation_state = await load_session(client_session_id(request, session_id))
+    logger.info("Debug endpoint accessed. Current state: %s", conversation_state)
     return {
         "state": conversation_state,
         "timestamp": time.time()
@@ -230,34 +527,102 @@ async def debug_data():
     Return MongoDB database connection status and sample data for debugging.
     """
     debug_info = await debug_mongodb_connection()
-    logger.info(f"Debug data endpoint accessed. Connection status: {debug_info['status']}")
+    logger.info("Debug data endpoint accessed. Connection status: %s", debug_info['status'])
     return debug_info
 
+@router.get("/debug/extraction-stats")
+async def debug_extraction_stats():
+    """
+    Return process-wide PDF extraction counters (failures, retries and their rates).
+    """
+    return {
+        **get_extraction_stats(),
+        "upload_single_flight": upload_single_flight.stats(),
+        "upload_bytes": upload_bytes_in_flight.snapshot()
+    }
+
+@router.get("/llm/status")
+async def llm_status():
+    """
+    Return the LLM provider circuit breaker and rate limiter state.
+    """
+    return get_llm_status()
+
+@router.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def admin_list_profiles():
+    """
+    List stored request profiles, newest first. Profile a request by sending it with
+    the X-Admin-Token header and either an X-Profile: 1 header or ?profile=1.
+    """
+    return {"profiles": list_profiles()}
+
+@router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def admin_get_profile(profile_id: str, format: str = "speedscope"):
+    """
+    Download a stored profile as speedscope JSON (open at https://www.speedscope.app)
+    or as collapsed stacks (format=collapsed) for flamegraph tools.
+    """
+    path = get_profile_path(profile_id, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "application/json" if format == "speedscope" else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
+
+@router.get("/admin/usage", dependencies=[Depends(require_admin)])
+async def admin_usage(scope: str = None, key: str = None, limit: int = 100):
+    """
+    Token usage and estimated cost aggregated per model, session or upload.
+    
+    Args:
+        scope: "model" (all calls per model), "session" or "upload"; all scopes if omitted
+        key: Restrict to one session or upload ID
+        limit: Maximum rows, most expensive first
+    """
+    if scope not in (None, "model", "session", "upload"):
+        raise HTTPException(status_code=400, detail="scope must be one of model, session, upload")
+    return await get_usage_summary(scope, key, limit)
+
+@router.get("/admin/strategy-comparisons", dependencies=[Depends(require_admin)])
+async def admin_strategy_comparisons(limit: int = 500):
+    """
+    Shadow-mode results: mean latency, token cost and field coverage of the primary
+    and candidate extraction strategies over the most recent compared uploads.
+    """
+    return {
+        "primary": settings.extraction_strategy,
+        "shadow": settings.shadow_strategy or None,
+        "shadow_sample_rate": settings.shadow_sample_rate,
+        "strategies": sorted(STRATEGIES),
+        **await get_strategy_comparison_summary(limit)
+    }
+
 # Add a SensorsResponse model
 class SensorsResponse(BaseModel):
     sensors: List[dict]
 
 @router.get("/sensors", response_model=SensorsResponse)
-async def get_sensors():
+async def get_sensors(request: Request):
     """
     Get all sensors from the database.
+
+    Served from the pre-serialized catalog snapshot with a strong ETag; clients
+    sending a matching If-None-Match get 304 Not Modified.
     
     Returns:
         SensorsResponse: Object containing list of sensors
     """
     try:
-        sensors = await get_all_sensors()
-        logger.info(f"Returning {len(sensors)} sensors to frontend")
-        return {"sensors": sensors}  # Return structured response expected by frontend
+        snapshot = await get_catalog_snapshot()
+        return conditional_response(request, snapshot.body, snapshot.etag, snapshot.gzip_body)
     except Exception as e:
-        logger.error(f"Error retrieving sensors: {str(e)}", exc_info=True)
+        logger.error("Error retrieving sensors: %s", e, exc_info=True)
         # Return empty list instead of error to avoid breaking frontend
         return {"sensors": []}
 
 @router.get("/sensors/{model}", response_model=dict)
-async def get_sensor(model: str):
+async def get_sensor(model: str, request: Request):
     """
-    Get sensor details by model.
+    Get sensor details by model, with a per-document ETag.
     
     Args:
         model: The sensor model to retrieve
@@ -266,15 +631,21 @@ async def get_sensor(model: str):
         dict: Sensor details or None if not found
     """
     try:
+        snapshot = await get_catalog_snapshot()
+        if model in snapshot.details:
+            body, etag = snapshot.details[model]
+            return conditional_response(request, body, etag)
+        # Not in the snapshot (beyond its first 100 sensors): read it directly
         sensor = await get_sensor_by_model(model)
         if sensor:
-            return sensor
+            body = sensor.to_json()
+            return conditional_response(request, body, make_etag(body))
         else:
             raise HTTPException(status_code=404, detail=f"Sensor with model {model} not found")
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error retrieving sensor {model}: {str(e)}", exc_info=True)
+        logger.error("Error retrieving sensor %s: %s", model, e, exc_info=True)
         raise HTTPException(status_code=500, detail="Error retrieving sensor")
 
 @router.get("/db-debug")
@@ -284,8 +655,8 @@ async def db_debug():
     """
     try:
         debug_info = await debug_mongodb_connection()
-        logger.info(f"DB Debug endpoint accessed. Connection status: {debug_info['status']}")
+        logger.info("DB Debug endpoint accessed. Connection status: %s", debug_info['status'])
         return debug_info
     except Exception as e:
-        logger.error(f"Error in DB debug endpoint: {str(e)}", exc_info=True)
+        logger.error("Error in DB debug endpoint: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -0,0 +1,22 @@
+import hmac
+from typing import Optional
+from fastapi import Header, HTTPException
+from config import settings
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Check a token against ADMIN_TOKEN; always False while no admin token is configured."""
+    if not settings.admin_token or not token:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), settings.admin_token.encode("utf-8"))
+
+async def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    FastAPI dependency guarding admin endpoints with the X-Admin-Token header.
+
+    Raises:
+        HTTPException: 404 if admin features are disabled, 403 if the token is missing or wrong
+    """
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
@@ -0,0 +1,168 @@
+import gzip
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from fastapi import Request, Response
+from pymongo import ReturnDocument
+from config import logger, settings
+from database.mongodb import get_database
+from models.sensor import encode_sensor_list
+from services.metrics import record_cache_lookup
+from services.sensor_service import get_all_sensors
+from services.single_flight import SingleFlight
+
+GZIP_LEVEL = 6
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """The GET /sensors response, serialized and compressed once per catalog version."""
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    # Detail bodies and ETags by model, for GET /sensors/{model}
+    details: Dict[str, Tuple[bytes, str]]
+    version: int
+    built_at: float
+
+# Document in catalog_state whose counter is bumped on every write to sensor_specifications, by any worker
+VERSION_ID = "sensor_specifications"
+
+_snapshot: Optional[CatalogSnapshot] = None
+_version = 0  # Last catalog version read from (or written to) catalog_state
+_version_checked_at = float("-inf")
+_rebuilds = SingleFlight("catalog_snapshot")
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a response body."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+async def invalidate_catalog():
+    """
+    Mark every worker's snapshot stale; call after writing to sensor_specifications.
+    Bumps the shared version in catalog_state, which workers compare before serving.
+    """
+    global _snapshot, _version, _version_checked_at
+    try:
+        db = await get_database()
+        state = await db.catalog_state.find_one_and_update(
+            {"_id": VERSION_ID}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except Exception as e:
+        # Other workers pick the write up after CATALOG_SNAPSHOT_MAX_AGE; this one rebuilds now
+        logger.warning("Could not bump the catalog version: %s", e)
+        _snapshot = None
+        return
+    _version = state["version"]
+    _version_checked_at = time.monotonic()
+
+async def _current_version() -> int:
+    """The shared catalog version, read from catalog_state at most every CATALOG_VERSION_CHECK_SECONDS."""
+    global _version, _version_checked_at
+    now = time.monotonic()
+    if now - _version_checked_at < settings.catalog_version_check_seconds:
+        return _version
+    _version_checked_at = now
+    try:
+        db = await get_database()
+        state = await db.catalog_state.find_one({"_id": VERSION_ID}, {"version": 1})
+    except Exception as e:
+        logger.warning("Could not read the catalog version, serving the current snapshot: %s", e)
+        return _version
+    _version = state["version"] if state else 0
+    return _version
+
+def _is_fresh(snapshot: Optional[CatalogSnapshot], version: int) -> bool:
+    return (snapshot is not None and snapshot.version == version
+            and time.monotonic() - snapshot.built_at < settings.catalog_snapshot_max_age)
+
+async def _build_snapshot(version: int) -> CatalogSnapshot:
+    global _snapshot
+    sensors = await get_all_sensors()
+    body = encode_sensor_list(sensors)
+    details = {}
+    for sensor in sensors:
+        # First document per model, as find_one({"model": ...}) would return
+        if sensor.model not in details:
+            detail = sensor.to_json()
+            details[sensor.model] = (detail, make_etag(detail))
+    snapshot = CatalogSnapshot(body, gzip.compress(body, GZIP_LEVEL), make_etag(body), details, version, time.monotonic())
+    if version == _version:
+        # A write during the rebuild leaves the snapshot stale; the next request rebuilds it
+        _snapshot = snapshot
+    logger.info("Built catalog snapshot: %s sensors, %s bytes (%s gzipped)", len(sensors), len(body), len(snapshot.gzip_body))
+    return snapshot
+
+async def get_catalog_snapshot() -> CatalogSnapshot:
+    """
+    Current catalog snapshot, rebuilt from MongoDB if any worker has written to the
+    catalog since it was built, or it is older than CATALOG_SNAPSHOT_MAX_AGE. The
+    shared version is one small read, made at most every CATALOG_VERSION_CHECK_SECONDS.
+    Concurrent rebuilds are coalesced.
+    """
+    snapshot = _snapshot
+    version = await _current_version()
+    fresh = _is_fresh(snapshot, version)
+    record_cache_lookup("catalog_snapshot", fresh)
+    if fresh:
+        return snapshot
+    return await _rebuilds.do(str(version), lambda: _build_snapshot(version))
+
+def gzip_etag(etag: str) -> str:
+    """ETag of the gzip-encoded representation; a strong ETag differs per content coding."""
+    return etag[:-1] + '-gzip"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match names etag or its gzip variant (weak comparison, as RFC 9110 requires for GET)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") in (etag, gzip_etag(etag)) for tag in header.split(","))
+
+def accepted_codings(header: str) -> Dict[str, float]:
+    """Content codings of an Accept-Encoding header with their q-values (1 when not given)."""
+    codings = {}
+    for item in header.split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+def accepts_gzip(request: Request) -> bool:
+    """Whether the client accepts gzip: its q-value, or else that of "*", is above 0."""
+    codings = accepted_codings(request.headers.get("accept-encoding", ""))
+    q = codings.get("gzip", codings.get("x-gzip", codings.get("*", 0.0)))
+    return q > 0
+
+def conditional_response(request: Request, body: bytes, etag: str, gzip_body: bytes = None) -> Response:
+    """
+    JSON response with an ETag, or 304 Not Modified if the client already has it.
+    Clients must revalidate (Cache-Control: no-cache), so changes show up on the next request.
+
+    Args:
+        request: Incoming request (If-None-Match, Accept-Encoding)
+        body: Encoded JSON body
+        etag: Strong ETag of body (the gzip representation gets its gzip_etag)
+        gzip_body: Pre-compressed body, sent to clients accepting gzip
+    """
+    use_gzip = gzip_body is not None and accepts_gzip(request)
+    # Vary on every response, so a shared cache never serves one representation for the other
+    headers = {"ETag": gzip_etag(etag) if use_gzip else etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=gzip_body, media_type="application/json", headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,181 @@
+import re
+from functools import lru_cache
+from typing import List, Dict, Any
+import tiktoken
+from config import logger
+from services.page_selection import estimate_tokens
+from services.metrics import register_lru_cache
+
+# Lines that start a new section or table; long pages are preferably split before them
+BOUNDARY_PATTERN = re.compile(
+    r"^\s*(?:\d+(?:\.\d+)*\.?\s+[A-Z][A-Za-z]+(?:[ \-/&][A-Za-z]+){0,8}"     # numbered headings: "7.2 Electrical Characteristics"
+    r"|[A-Z][A-Z0-9 &/\-]{4,60}"                                          # all-caps headings: "ABSOLUTE MAXIMUM RATINGS"
+    r"|(?i:(?:table|figure)\s+\d+.*)"                                    # captions: "Table 3 ..."
+    r"|(?i:parameters?\b.*\b(?:min|typ|max|unit)\b.*))\s*$",             # table header rows
+    re.MULTILINE
+)
+
+@lru_cache(maxsize=16)
+def get_encoding(model_name: str = None):
+    """
+    Get the tiktoken encoding for a model, falling back to cl100k_base.
+    OpenRouter names carry a provider prefix (e.g. "openai/gpt-4o"), which is stripped first.
+    Returns None if no encoding can be loaded (e.g. the BPE file cannot be downloaded).
+    """
+    name = (model_name or "").split("/")[-1]
+    try:
+        try:
+            return tiktoken.encoding_for_model(name)
+        except KeyError:
+            # Non-OpenAI models (llama, mistral, ...) have no tiktoken encoding; cl100k_base is a close estimate
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning("Could not load tokenizer for %s, using character estimate: %s", model_name, e)
+        return None
+
+register_lru_cache("tiktoken_encoding", get_encoding)
+
+def count_tokens(text: str, model_name: str = None) -> int:
+    """Count tokens in text using the model's tokenizer."""
+    if not text:
+        return 0
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def page_marker(page_number: int) -> str:
+    """Marker placed before each page's text so the model (and we) can tell pages apart."""
+    return f"--- Page {page_number} ---"
+
+def split_text(text: str, max_tokens: int, model_name: str = None) -> List[str]:
+    """
+    Split text into pieces of at most max_tokens, preferring table/section boundaries,
+    then blank lines, then single lines. Only a single over-long line is cut mid-text.
+
+    Args:
+        text: Text to split
+        max_tokens: Maximum tokens per piece
+        model_name: Model whose tokenizer is used
+
+    Returns:
+        List of text pieces in original order
+    """
+    if count_tokens(text, model_name) <= max_tokens:
+        return [text]
+
+    # Break into blocks at blank lines and before boundary lines
+    blocks = []
+    current = []
+    for line in text.split("\n"):
+        if current and (not line.strip() or BOUNDARY_PATTERN.match(line)):
+            blocks.append("\n".join(current))
+            current = []
+        if line.strip() or current:
+            current.append(line)
+    if current:
+        blocks.append("\n".join(current))
+
+    pieces = []
+    buffer = []
+    buffer_tokens = 0
+    for block in blocks:
+        block_tokens = count_tokens(block, model_name)
+        if block_tokens > max_tokens:
+            # Block is itself too large: flush and split it line by line
+            if buffer:
+                pieces.append("\n".join(buffer))
+                buffer, buffer_tokens = [], 0
+            pieces.extend(_split_lines(block, max_tokens, model_name))
+            continue
+        if buffer and buffer_tokens + block_tokens > max_tokens:
+            pieces.append("\n".join(buffer))
+            buffer, buffer_tokens = [], 0
+        buffer.append(block)
+        buffer_tokens += block_tokens
+    if buffer:
+        pieces.append("\n".join(buffer))
+    return pieces
+
+def _split_lines(text: str, max_tokens: int, model_name: str = None) -> List[str]:
+    """Split text line by line; a single line longer than max_tokens is cut on token boundaries."""
+    encoding = get_encoding(model_name)
+    pieces = []
+    buffer = []
+    buffer_tokens = 0
+    for line in text.split("\n"):
+        line_tokens = count_tokens(line, model_name)
+        if line_tokens > max_tokens:
+            if buffer:
+                pieces.append("\n".join(buffer))
+                buffer, buffer_tokens = [], 0
+            if encoding is None:
+                step = max_tokens * 4
+                pieces.extend(line[start:start + step] for start in range(0, len(line), step))
+            else:
+                tokens = encoding.encode(line, disallowed_special=())
+                for start in range(0, len(tokens), max_tokens):
+                    pieces.append(encoding.decode(tokens[start:start + max_tokens]))
+            continue
+        if buffer and buffer_tokens + line_tokens > max_tokens:
+            pieces.append("\n".join(buffer))
+            buffer, buffer_tokens = [], 0
+        buffer.append(line)
+        buffer_tokens += line_tokens + 1
+    if buffer:
+        pieces.append("\n".join(buffer))
+    return pieces
+
+def pack_pages(pages: List[Dict[str, Any]], max_tokens: int, model_name: str = None) -> List[Dict[str, Any]]:
+    """
+    Pack pages into context-sized chunks: several short pages share one chunk,
+    long pages are split at table/section boundaries. Every chunk keeps the page
+    numbers it was built from so results can be traced back when merging.
+
+    Args:
+        pages: Dicts with page_number and text, in document order
+        max_tokens: Maximum page-text tokens per chunk (excluding the instruction prompt)
+        model_name: Model whose tokenizer is used
+
+    Returns:
+        List of dicts with text, page_numbers and tokens
+    """
+    chunks = []
+    current_parts = []
+    current_pages = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current_parts, current_pages, current_tokens
+        if current_parts:
+            chunks.append({
+                "text": "\n\n".join(current_parts),
+                "page_numbers": current_pages,
+                "tokens": current_tokens
+            })
+        current_parts, current_pages, current_tokens = [], [], 0
+
+    for page in pages:
+        page_number = page["page_number"]
+        marker = page_marker(page_number)
+        marker_tokens = count_tokens(marker, model_name) + 8  # room for the "(part i/n)" suffix
+        pieces = split_text(page["text"], max_tokens - marker_tokens, model_name)
+
+        for index, piece in enumerate(pieces):
+            label = marker if len(pieces) == 1 else f"{marker} (part {index + 1}/{len(pieces)})"
+            part = f"{label}\n{piece}"
+            part_tokens = count_tokens(part, model_name)
+            if current_parts and current_tokens + part_tokens > max_tokens:
+                flush()
+            current_parts.append(part)
+            if page_number not in current_pages:
+                current_pages.append(page_number)
+            current_tokens += part_tokens
+
+    flush()
+    logger.info("Packed %s pages into %s chunks (max %s tokens each)", len(pages), len(chunks), max_tokens)
+    return chunks
+
+def describe_pages(page_numbers: List[int]) -> str:
+    """Human-readable page label for prompts, e.g. "3" or "3, 4, 7"."""
+    return ", ".join(str(n) for n in page_numbers)
@@ -1,56 +1,132 @@
 import time
-from config import logger
+import uuid
+import contextvars
+from collections import OrderedDict
+from typing import Dict, Any
+from config import logger, settings
+from services.single_flight import SingleFlight
+from services.transcripts import transcript_writer, load_latest_transcript
 
-# In-memory conversation state and chat history
-conversation_state = {
-    "step": "step_1",
-    "last_user_input": None,
-    "last_sensor": None,
-    "chat_history": [],  # List to store chat history as {"role": "user" or "assistant", "content": "message"}
-    "last_confirmation_time": 0  # Timestamp of the last confirmation response to prevent spamming
-}
+# In-memory conversation state and chat history per client session (least recently used evicted
+# first; evicted sessions are rehydrated from their stored transcript when they come back)
+_sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
 
-def get_conversation_state():
-    """Get the current conversation state."""
-    return conversation_state
+# Session the current request works on; set with load_session()
+_current_session: contextvars.ContextVar[str] = contextvars.ContextVar("conversation_session", default="default")
+
+# Concurrent first requests of a session share one transcript read
+_rehydrations = SingleFlight("session rehydration")
 
-def reset_conversation():
-    """Reset the conversation state and history."""
-    global conversation_state
-    conversation_state = {
+def new_conversation_state(session_id: str) -> Dict[str, Any]:
+    """A fresh conversation for a session."""
+    return {
+        "session_id": session_id,
+        "conversation_id": uuid.uuid4().hex,
         "step": "step_1",
-        "last_user_input": None, 
+        "last_user_input": None,
         "last_sensor": None,
-        "chat_history": [],
-        "last_confirmation_time": 0
+        "chat_history": [],  # List to store chat history as {"role": "user" or "assistant", "content": "message"}
+        "last_confirmation_time": 0  # Timestamp of the last confirmation response to prevent spamming
     }
-    logger.info("Conversation state reset")
+
+def _remember(session_id: str, state: Dict[str, Any]) -> Dict[str, Any]:
+    _sessions[session_id] = state
+    _sessions.move_to_end(session_id)
+    while len(_sessions) > settings.chat_max_sessions:
+        _sessions.popitem(last=False)
+    return state
+
+async def _rehydrate(session_id: str) -> Dict[str, Any]:
+    state = new_conversation_state(session_id)
+    if settings.transcript_persistence:
+        try:
+            stored = await load_latest_transcript(session_id)
+        except Exception as e:
+            logger.warning("Could not load the transcript of session %s, starting a new conversation: %s", session_id, e)
+            stored = None
+        if stored:
+            state.update({
+                "conversation_id": stored["conversation_id"],
+                "step": stored["step"] or "step_1",
+                "last_user_input": stored["last_user_input"],
+                "last_sensor": stored["last_sensor"],
+                "chat_history": stored["messages"]
+            })
+            logger.info("Rehydrated session %s with %s messages", session_id, len(stored['messages']))
+    # Another request may have started the session while we were reading
+    return _sessions.get(session_id) or _remember(session_id, state)
+
+async def load_session(session_id: str = "default") -> Dict[str, Any]:
+    """
+    Make session_id the current session for this request and return its state.
+    A session not in memory (first use, evicted, or after a restart) is
+    rehydrated from its latest stored transcript.
+    """
+    _current_session.set(session_id)
+    state = _sessions.get(session_id)
+    if state is not None:
+        _sessions.move_to_end(session_id)
+        return state
+    return await _rehydrations.do(session_id, lambda: _rehydrate(session_id))
+
+def get_conversation_state():
+    """Get the current session's conversation state."""
+    session_id = _current_session.get()
+    state = _sessions.get(session_id)
+    if state is None:
+        state = _remember(session_id, new_conversation_state(session_id))
+    return state
+
+def reset_conversation(session_id: str = None):
+    """Reset a session's (default: the current one's) conversation state and history; later turns go to a new transcript."""
+    session_id = session_id or _current_session.get()
+    conversation_state = _remember(session_id, new_conversation_state(session_id))
+    transcript_writer.start_conversation(conversation_state["conversation_id"], session_id, conversation_state)
+    logger.info("Conversation state reset for session %s", session_id)
     return conversation_state
 
 def add_to_history(role, content):
-    """Add a message to the chat history."""
-    conversation_state["chat_history"].append({"role": role, "content": content})
+    """Add a message to the chat history and queue it for the stored transcript."""
+    conversation_state = get_conversation_state()
+    message = {"role": role, "content": content}
+    conversation_state["chat_history"].append(message)
+    transcript_writer.append(conversation_state["conversation_id"], conversation_state["session_id"], conversation_state, message)
+
+def get_history_messages(exclude_last: int = 0):
+    """
+    Get the chat history as (role, content) message tuples for a chat prompt.
+    
+    Args:
+        exclude_last: Number of most recent entries to leave out (e.g. the current user turn)
+    """
+    entries = get_conversation_state()["chat_history"]
+    if exclude_last:
+        entries = entries[:-exclude_last]
+    return [("human" if entry["role"] == "user" else "ai", entry["content"]) for entry in entries]
 
 def get_history_text():
     """Format the chat history as a text string."""
-    return "\n".join([f"{entry['role']}: {entry['content']}" for entry in conversation_state["chat_history"]])
+    return "\n".join([f"{entry['role']}: {entry['content']}" for entry in get_conversation_state()["chat_history"]])
 
 def update_step(new_step):
     """Update the conversation step."""
+    conversation_state = get_conversation_state()
     previous_step = conversation_state["step"]
     conversation_state["step"] = new_step
-    logger.info(f"Updated conversation step from {previous_step} to {new_step}")
+    transcript_writer.touch(conversation_state["conversation_id"], conversation_state["session_id"], conversation_state)
+    logger.info("Updated conversation step from %s to %s", previous_step, new_step)
 
 def update_last_confirmation_time():
     """Update the last confirmation time to prevent spamming."""
-    conversation_state["last_confirmation_time"] = time.time()
+    get_conversation_state()["last_confirmation_time"] = time.time()
 
 def should_throttle_confirmation():
     """Check if confirmation responses should be throttled."""
-    return time.time() - conversation_state["last_confirmation_time"] < 2  # 2 seconds throttle
+    return time.time() - get_conversation_state()["last_confirmation_time"] < 2  # 2 seconds throttle
 
 def extract_simplified_message(response_text):
     """Extract a simplified message based on the conversation state."""
+    conversation_state = get_conversation_state()
     if conversation_state["step"] == "step_1":
         # Extract sensor name from response
         sensor_lines = [line for line in response_text.split('\n') if "Sensor Name:" in line]
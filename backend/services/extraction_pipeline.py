@@ -0,0 +1,601 @@
+from langchain_community.document_loaders import PyPDFLoader
+from dataclasses import dataclass
+import tempfile
+import asyncio
+import hashlib
+import random
+import time
+import os
+from pymongo.errors import DuplicateKeyError
+from config import logger, settings
+from llm.client import create_extraction_chain, CircuitOpenError
+from services.usage import BudgetExceededError, usage_scope, get_scope_totals
+from services.page_selection import select_pages, MIN_PAGE_CHARS
+from services.chunking import pack_pages, count_tokens, describe_pages
+from services.metrics import upload_stage_seconds, elapsed_since
+from services.request_context import job_context
+from services.table_extraction import extract_page_tables
+from services.rule_extraction import extract_rule_fields, confident_fields
+from services.pdf_processor_alt import (
+    EXTRACTION_PROMPT, new_extraction_stats, record_extraction_stat, extract_chunk, cascade_escalation_reason,
+    count_spec_fields, guess_sensor_type_from_filename, merge_extracted_data, hash_pdf_file, new_upload_id,
+    describe_specification_fields
+)
+from services.pdf_processor import LEGACY_EXTRACTION_PROMPT, merge_extracted_data as merge_latest_data
+from services.merge_engine import MergeEngine
+from models.sensor import SensorRecord
+from services.catalog import invalidate_catalog
+from database.mongodb import get_database
+from typing import List, Dict, Any, Optional, Callable
+from datetime import datetime
+
+DEFAULT_EXTRACTION_MODEL = "meta-llama/llama-3.1-8b-instruct"
+
+@dataclass(frozen=True)
+class ExtractionStrategy:
+    """
+    One way of turning datasheet pages into a sensor record.
+
+    Attributes:
+        name: Registry key, stored with results and comparisons
+        prompt: Template with page_num, total_pages, page_text, model_hint, sensor_type_hint
+            and (optionally) specification_fields
+        page_selection: Key in PAGE_SELECTORS deciding which page text is sent, in which chunks
+        merge_policy: Key in MERGE_POLICIES combining chunk results
+        model: Fixed model, or None to use the model requested for the upload
+        fill_from_filename: Fill a missing model/sensor_type from the filename after merging
+        table_extraction: Parse specification tables locally and skip the LLM for pages they resolve
+        rule_extraction: Pre-extract common fields with patterns and ask the LLM only for the rest
+    """
+    name: str
+    prompt: str
+    page_selection: str = "ranked"
+    merge_policy: str = "scored"
+    model: Optional[str] = None
+    fill_from_filename: bool = False
+    table_extraction: bool = False
+    rule_extraction: bool = False
+
+def select_ranked_chunks(page_texts: List[str], model_name: str) -> List[Dict[str, Any]]:
+    """Best pages by spec density within the token budget, packed into context-sized chunks."""
+    selected_pages = select_pages(
+        page_texts,
+        max_pages=settings.pdf_max_pages,
+        token_budget=settings.pdf_page_token_budget,
+        token_counter=lambda text: count_tokens(text, model_name)
+    )
+    return pack_pages(selected_pages, settings.pdf_chunk_max_tokens, model_name)
+
+def select_first_page_chunks(page_texts: List[str], model_name: str) -> List[Dict[str, Any]]:
+    """The first pages in document order, one chunk each, truncated to 8000 characters."""
+    chunks = []
+    for index, text in enumerate(page_texts[:settings.pdf_max_pages]):
+        if len(text.strip()) < MIN_PAGE_CHARS:
+            continue
+        chunks.append({"text": text[:8000], "page_numbers": [index + 1], "tokens": count_tokens(text[:8000], model_name)})
+    return chunks
+
+PAGE_SELECTORS: Dict[str, Callable[[List[str], str], List[Dict[str, Any]]]] = {
+    "ranked": select_ranked_chunks,
+    "first_pages": select_first_page_chunks,
+}
+
+def merge_scored(chunk_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Most specific value per field, with page provenance and runner-up values (see services.merge_engine)."""
+    engine = MergeEngine()
+    for result in chunk_results:
+        engine.add(result["data"], result["pages"], result["source"], result.get("confidence"))
+    return engine.result()
+
+def merge_latest(chunk_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Later non-null values win (the original merge)."""
+    return merge_latest_data([result["data"] for result in chunk_results])
+
+# Merge policies take chunk results ({pages, data, source, confidence}) in document order
+MERGE_POLICIES: Dict[str, Callable[[List[Dict[str, Any]]], Dict[str, Any]]] = {
+    "scored": merge_scored,
+    "latest": merge_latest,
+}
+
+STRATEGIES: Dict[str, ExtractionStrategy] = {}
+
+def register_strategy(strategy: ExtractionStrategy) -> ExtractionStrategy:
+    """Add a strategy to the registry (replacing one with the same name)."""
+    if strategy.page_selection not in PAGE_SELECTORS:
+        raise ValueError(f"Unknown page selection '{strategy.page_selection}' for strategy {strategy.name}")
+    if strategy.merge_policy not in MERGE_POLICIES:
+        raise ValueError(f"Unknown merge policy '{strategy.merge_policy}' for strategy {strategy.name}")
+    STRATEGIES[strategy.name] = strategy
+    return strategy
+
+def get_strategy(name: str) -> ExtractionStrategy:
+    """Look up a registered strategy by name."""
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown extraction strategy '{name}'. Available: {', '.join(sorted(STRATEGIES))}")
+
+register_strategy(ExtractionStrategy(name="default", prompt=EXTRACTION_PROMPT, table_extraction=True, rule_extraction=True))
+register_strategy(ExtractionStrategy(name="llm_only", prompt=EXTRACTION_PROMPT))
+register_strategy(ExtractionStrategy(
+    name="legacy",
+    prompt=LEGACY_EXTRACTION_PROMPT,
+    page_selection="first_pages",
+    merge_policy="latest",
+    fill_from_filename=True
+))
+
+# Shadow runs still in progress, kept referenced until they finish
+_shadow_tasks = set()
+
+async def run_strategy(strategy: ExtractionStrategy, page_texts: List[str], filename: str, model_name: str = None,
+                       cascade: bool = False, extraction_chain=None, chunk_semaphore: asyncio.Semaphore = None,
+                       page_tables: List[Dict[str, Any]] = None, shadow: bool = False) -> Dict[str, Any]:
+    """
+    Extract and merge sensor data from page texts with one strategy. Does not write to the database.
+
+    Args:
+        strategy: Strategy to run
+        page_texts: Text of every page, in document order
+        filename: Original filename (used for hints)
+        model_name: Requested model (ignored if the strategy fixes one, or in cascade mode)
+        cascade: Send each chunk to the small model first and escalate hard ones to the large model
+        extraction_chain: Chain to reuse; created for the extraction model if not given
+        chunk_semaphore: Limits concurrent chunk extractions (defaults to PDF_CHUNK_CONCURRENCY)
+        page_tables: Per-page table parser results (see extract_page_tables), used by table_extraction strategies
+        shadow: Candidate run for comparison; kept out of stage metrics and global extraction counters
+
+    Returns:
+        dict: merged_data, chunk_results [{pages, data, source, confidence}], upload_stats, extraction_model,
+            escalated (bool) and seconds
+    """
+    started = time.perf_counter()
+    if cascade:
+        extraction_model = settings.cascade_small_model
+    else:
+        extraction_model = strategy.model or model_name or DEFAULT_EXTRACTION_MODEL
+    if extraction_chain is None or strategy.model or cascade:
+        extraction_chain = create_extraction_chain(model_name=extraction_model, temperature=0.1)
+    escalation_chain = None  # Large-model chain, created on the first escalation in cascade mode
+    upload_stats = new_extraction_stats(shadow=shadow)
+    possible_sensor_type = guess_sensor_type_from_filename(filename)
+    model_hint = os.path.splitext(os.path.basename(filename))[0]  # Sensor model guessed from the filename
+    if chunk_semaphore is None:
+        chunk_semaphore = asyncio.Semaphore(settings.pdf_chunk_concurrency)
+
+    def stage_timer(stage):
+        return upload_stage_seconds.labels(stage).time() if not shadow else _no_timer()
+
+    # Pages whose tables resolve enough fields are not sent to the LLM
+    table_results = []
+    llm_page_texts = page_texts
+    if strategy.table_extraction and page_tables:
+        llm_page_texts = list(page_texts)
+        for i, tables in enumerate(page_tables):
+            if not tables["fields"] and not tables["extra_fields"]:
+                continue
+            table_results.append({
+                "pages": [i + 1],
+                "data": {"specifications": tables["specifications"], "extra_fields": tables["extra_fields"]},
+                "source": "table"
+            })
+            record_extraction_stat(upload_stats, "table_fields", tables["fields"])
+            if tables["fields"] >= settings.pdf_table_min_fields:
+                record_extraction_stat(upload_stats, "table_pages")
+                llm_page_texts[i] = ""
+
+    with stage_timer("select"):
+        chunks = PAGE_SELECTORS[strategy.page_selection](llm_page_texts, extraction_model)
+    if not chunks and table_results:
+        # Every spec page was resolved from tables; still ask for model, manufacturer and type
+        first = next((i for i, text in enumerate(page_texts) if len(text.strip()) >= MIN_PAGE_CHARS), None)
+        if first is not None:
+            text = page_texts[first][:8000]
+            chunks = [{"text": text, "page_numbers": [first + 1], "tokens": count_tokens(text, extraction_model)}]
+
+    async def process_chunk(i, chunk):
+        """Extract one chunk (and escalate it in cascade mode); returns its chunk results (rules, LLM)."""
+        nonlocal escalation_chain
+        chunk_pages = chunk["page_numbers"]
+        current_page_num = describe_pages(chunk_pages)
+        async with chunk_semaphore:
+            logger.info("Processing chunk %d/%d (pages %s, %d tokens) for %s [%s]",
+                        i + 1, len(chunks), current_page_num, chunk["tokens"], filename, strategy.name)
+            try:
+                # Fields the pattern library already found with confidence are left out of the prompt
+                rule_matches = extract_rule_fields(chunk["text"]) if strategy.rule_extraction else {}
+                rule_data = confident_fields(rule_matches)
+                chunk_outputs = []
+                if rule_data:
+                    record_extraction_stat(upload_stats, "rule_fields", sum(len(fields) for fields in rule_data.values()))
+                    chunk_outputs.append({
+                        "pages": chunk_pages,
+                        "data": {"specifications": rule_data},
+                        "source": "rules",
+                        "confidence": {
+                            f"specifications.{category}.{field}": rule_matches[category][field]["confidence"]
+                            for category, fields in rule_data.items() for field in fields
+                        }
+                    })
+                chunk_prompt = strategy.prompt.format(
+                    specification_fields=describe_specification_fields(rule_data),
+                    page_num=current_page_num,
+                    total_pages=len(page_texts),
+                    page_text=chunk["text"],
+                    model_hint=model_hint,
+                    sensor_type_hint=possible_sensor_type or "sensor"
+                )
+                with stage_timer("llm_chunk"):
+                    extracted_data = await extract_chunk(extraction_chain, chunk_prompt, current_page_num, upload_stats)
+
+                if cascade:
+                    record_extraction_stat(upload_stats, "cascade_chunks")
+                    reason = cascade_escalation_reason(extracted_data, chunk_pages)
+                    if reason:
+                        record_extraction_stat(upload_stats, "escalations")
+                        logger.info("Cascade: escalating page %s to %s (%s)", current_page_num, settings.cascade_large_model, reason)
+                        if escalation_chain is None:
+                            escalation_chain = create_extraction_chain(model_name=settings.cascade_large_model, temperature=0.1)
+                        with stage_timer("llm_chunk"):
+                            escalated_data = await extract_chunk(escalation_chain, chunk_prompt, current_page_num, upload_stats)
+                        if escalated_data is not None:
+                            # Keep whatever the small model found; the merge keeps the more detailed values
+                            extracted_data = merge_extracted_data([extracted_data, escalated_data]) if extracted_data else escalated_data
+                    else:
+                        logger.info("Cascade: kept %s result for page %s", extraction_model, current_page_num)
+                if extracted_data is not None:
+                    chunk_outputs.append({"pages": chunk_pages, "data": extracted_data, "source": "llm"})
+                return chunk_outputs
+            except (CircuitOpenError, BudgetExceededError):
+                # Provider is down or the upload is out of budget: stop spending on the remaining chunks
+                raise
+            except Exception as e:
+                record_extraction_stat(upload_stats, "failed_chunks")
+                logger.error("Error processing page %s: %s", current_page_num, e, exc_info=True)
+                return []
+
+    # Chunks run concurrently up to the semaphore limit; results keep document order
+    tasks = [asyncio.ensure_future(process_chunk(i, chunk)) for i, chunk in enumerate(chunks)]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    # Table results first, then chunks in document order; pages are kept for provenance
+    chunk_results = list(table_results)
+    for chunk_outputs in results:
+        chunk_results.extend(chunk_outputs)
+
+    if not chunk_results:
+        logger.warning("No valid data extracted from any processed chunk for %s [%s]", filename, strategy.name)
+    if table_results:
+        logger.info("Tables for %s [%s]: %d fields, %d pages skipped by the LLM",
+                    filename, strategy.name, upload_stats["table_fields"], upload_stats["table_pages"])
+    logger.info(
+        "Extraction stats for %s [%s]: %d/%d chunks failed, %d retries (%d succeeded)",
+        filename, strategy.name, upload_stats["failed_chunks"], upload_stats["chunks"],
+        upload_stats["retries"], upload_stats["retry_successes"]
+    )
+    if cascade:
+        logger.info("Cascade for %s: escalated %d/%d chunks", filename, upload_stats["escalations"], upload_stats["cascade_chunks"])
+
+    # Merge extracted data from all chunks
+    with stage_timer("merge"):
+        merged_data = MERGE_POLICIES[strategy.merge_policy](chunk_results)
+    if strategy.fill_from_filename:
+        fill_from_filename(merged_data, filename, possible_sensor_type)
+
+    return {
+        "merged_data": merged_data,
+        "chunk_results": chunk_results,
+        "upload_stats": upload_stats,
+        "extraction_model": extraction_model,
+        "escalated": escalation_chain is not None,
+        "seconds": time.perf_counter() - started
+    }
+
+class _no_timer:
+    """Stand-in for a histogram timer in shadow runs."""
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+
+def fill_from_filename(merged_data: Dict[str, Any], filename: str, possible_sensor_type: Optional[str]):
+    """Fill a missing model from the cleaned filename and a missing sensor_type from the filename guess."""
+    if not merged_data.get("model"):
+        possible_model = os.path.splitext(os.path.basename(filename))[0].replace('_', ' ').strip()
+        merged_data["model"] = possible_model or f"Unknown_{filename}"
+        logger.info("Using cleaned filename as model: %s", merged_data['model'])
+    if not merged_data.get("sensor_type") and possible_sensor_type:
+        merged_data["sensor_type"] = possible_sensor_type
+        logger.info("Using guessed sensor type: %s", possible_sensor_type)
+
+async def process_datasheet(pdf_content: Optional[bytes], filename: str, model_name: str = None, cascade: bool = None,
+                            content_hash: str = None, upload_id: str = None, pdf_path: str = None,
+                            extraction_chain=None, chunk_semaphore: asyncio.Semaphore = None, strategy: str = None):
+    """
+    Process a PDF datasheet with an extraction strategy and store the results.
+
+    Args:
+        pdf_content: The binary content of the PDF (None when pdf_path is given)
+        filename: The original filename
+        model_name: Optional model name to use for extraction (ignored in cascade mode)
+        cascade: Send each chunk to the small model first and escalate hard ones
+            to the large model (defaults to PDF_CASCADE_ENABLED)
+        content_hash: SHA-256 of the PDF, computed if not given; identifies the datasheet
+        upload_id: ID for this upload (see new_upload_id), generated if not given
+        pdf_path: PDF already on disk (e.g. a spooled upload); read in place and left for the caller to delete
+        extraction_chain: Chain to reuse (e.g. one per batch); created for the extraction model if not given
+        chunk_semaphore: Limits concurrent chunk extractions; share one across files to bound a whole batch
+            (defaults to a per-upload semaphore of PDF_CHUNK_CONCURRENCY)
+        strategy: Name of the primary strategy (defaults to EXTRACTION_STRATEGY)
+
+    Returns:
+        dict: Extracted structured data
+    """
+    primary = get_strategy(strategy or settings.extraction_strategy)
+    if cascade is None:
+        cascade = settings.pdf_cascade_enabled
+    if content_hash is None:
+        content_hash = hash_pdf_file(pdf_path) if pdf_path else hashlib.sha256(pdf_content).hexdigest()
+    if upload_id is None:
+        upload_id = new_upload_id(content_hash)
+    with job_context(upload_id):
+        upload_started = time.perf_counter()
+        logger.info("Starting PDF datasheet processing for: %s with strategy %s", filename, primary.name)
+        logger.debug("Model parameter received for PDF processing: %s", model_name)
+
+        if pdf_path:
+            temp_file_path = None  # Nothing of ours to clean up
+            pdf_file_path = pdf_path
+        else:
+            logger.info("Progress update for %s: [1/5] Saving temporary file.", filename)
+            # Save the PDF content to a temporary file
+            with upload_stage_seconds.labels("temp_file").time():
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
+                    temp_file_path = temp_file.name
+                    temp_file.write(pdf_content)
+            pdf_file_path = temp_file_path
+
+        try:
+            logger.info("Progress update for %s: [2/5] Loading PDF pages.", filename)
+            with upload_stage_seconds.labels("parse").time():
+                loader = PyPDFLoader(pdf_file_path)
+                # Parsing is CPU-bound; keep the event loop free for other uploads and chats
+                pages = await asyncio.to_thread(loader.load)
+            page_texts = [page.page_content for page in pages]
+            total_pages_to_process = len(pages)
+            logger.info("Loaded %s pages from PDF: %s", total_pages_to_process, filename)
+            page_tables = None
+            shadow = STRATEGIES.get(settings.shadow_strategy)
+            if primary.table_extraction or (shadow and shadow.table_extraction):
+                with upload_stage_seconds.labels("table_parse").time():
+                    try:
+                        page_tables = await asyncio.to_thread(extract_page_tables, pdf_file_path)
+                    except Exception as e:
+                        logger.warning("Table parsing failed for %s, using the LLM for all pages: %s", filename, e)
+
+            logger.info("Progress update for %s: [3/5] Extracting data with strategy %s", filename, primary.name)
+            run = await run_strategy(primary, page_texts, filename, model_name, cascade, extraction_chain, chunk_semaphore,
+                                     page_tables=page_tables)
+            extraction_model = run["extraction_model"]
+            chunk_results = run["chunk_results"]
+            upload_stats = run["upload_stats"]
+            merged_data = run["merged_data"]
+
+            # Prepare data for storage
+            logger.info("Progress update for %s: [4/5] Preparing data for storage.", filename)
+            logger.info("Assigning upload ID %s for %s", upload_id, filename)
+
+            # Add classification model information
+            if cascade:
+                merged_data["classification_model"] = f"{extraction_model} -> {settings.cascade_large_model}" if run["escalated"] else extraction_model
+            else:
+                merged_data["classification_model"] = extraction_model
+            merged_data["extraction_strategy"] = primary.name
+            merged_data["extraction_stats"] = upload_stats
+
+            # Add source information
+            merged_data["source"] = {
+                "filename": filename,
+                "upload_date": datetime.now().isoformat(),
+                "page_count": total_pages_to_process,
+                "content_hash": content_hash
+            }
+
+            # Log summary of filled vs missing fields for debugging
+            specs = merged_data.get("specifications", {})
+            for category in ["performance", "electrical", "mechanical", "environmental"]:
+                cat_data = specs.get(category, {})
+                filled = sum(1 for v in cat_data.values() if v and v != "Unknown")
+                total = len(cat_data)
+                logger.info("Category %s: %s/%s fields filled", category, filled, total)
+
+            # Validation: Check for critical missing fields
+            critical_fields = ["model", "sensor_type"]
+            missing_critical = [f for f in critical_fields if not merged_data.get(f) or merged_data.get(f) == "Unknown"]
+            if missing_critical:
+                logger.warning("Critical fields missing or unknown: %s", missing_critical)
+
+            # Save to database
+            logger.info("Progress update for %s: [5/5] Saving data to MongoDB.", filename)
+            mongo_started = time.perf_counter()
+            await store_extraction(merged_data, pages, chunk_results, upload_id, filename, extraction_model, content_hash)
+            upload_stage_seconds.labels("mongo_write").observe(elapsed_since(mongo_started))
+            upload_stage_seconds.labels("total").observe(elapsed_since(upload_started))
+
+            maybe_start_shadow(primary, run, page_texts, page_tables, filename, model_name, upload_id, content_hash)
+
+            logger.info("Finished processing PDF: %s", filename)
+            return merged_data
+
+        except Exception as e:
+            logger.error("Critical error during PDF processing for %s: %s", filename, e, exc_info=True)
+            raise
+
+        finally:
+            # Clean up the temporary file
+            if temp_file_path and os.path.exists(temp_file_path):
+                try:
+                    os.unlink(temp_file_path)
+                    logger.debug("Successfully removed temporary file: %s", temp_file_path)
+                except Exception as e:
+                    logger.error("Error removing temporary file %s: %s", temp_file_path, e)
+
+async def store_extraction(merged_data: Dict[str, Any], pages, chunk_results, upload_id: str, filename: str,
+                           extraction_model: str, content_hash: str):
+    """
+    Store per-page documents in uploads and upsert the merged record into
+    sensor_specifications, keyed by content hash.
+    """
+    db = await get_database()
+    collection = db["uploads"]
+
+    # Store each page's raw data as a separate document
+    for i, page in enumerate(pages):
+        page_document = {
+            "upload_id": upload_id,
+            "page_number": i + 1,
+            "filename": filename,
+            "upload_date": datetime.now().isoformat(),
+            "processed_at": datetime.now().isoformat(),
+            "raw_text": page.page_content,
+            "extraction_model": extraction_model,
+            "text_snippet": page.page_content[:200] if page.page_content else ""  # Short excerpt for reference
+        }
+        page_chunks = [result for result in chunk_results if (i + 1) in result["pages"]]
+        if page_chunks:
+            # A long page may have been split across several chunks, or have table/rule results too; merge them
+            if len(page_chunks) == 1:
+                extracted_data_with_meta = page_chunks[0]["data"].copy()
+            else:
+                extracted_data_with_meta = merge_extracted_data([result["data"] for result in page_chunks])
+            extracted_data_with_meta["metadata"] = {
+                "page_number": i + 1,
+                "source_pages": sorted({n for result in page_chunks for n in result["pages"]}),
+                "sources": sorted({result["source"] for result in page_chunks}),
+                "extraction_confidence": "high" if "model" in extracted_data_with_meta and extracted_data_with_meta["model"] else "medium"
+            }
+            page_document["extracted_data"] = extracted_data_with_meta
+        insert_result = await collection.insert_one(page_document)
+        logger.info("Inserted data for page %d of %s with ID %s", i + 1, filename, insert_result.inserted_id)
+
+    # Store the structured data in sensor_specifications collection
+    # Upsert keyed by content hash so re-uploading a datasheet replaces its previous extraction
+    specs_collection = db["sensor_specifications"]
+    spec_filter = {"source.content_hash": content_hash}
+    spec_update = {"$set": SensorRecord.from_dict(merged_data).to_mongo()}
+    try:
+        spec_result = await specs_collection.update_one(spec_filter, spec_update, upsert=True)
+    except DuplicateKeyError:
+        # Another worker inserted the same datasheet between our match and insert; update theirs
+        spec_result = await specs_collection.update_one(spec_filter, spec_update)
+    await invalidate_catalog()
+    if spec_result.upserted_id:
+        logger.info("Inserted structured specifications with ID %s", spec_result.upserted_id)
+    else:
+        logger.info("Updated structured specifications for content hash %.12s", content_hash)
+
+def field_coverage(data: Dict[str, Any]) -> Dict[str, int]:
+    """Identity fields and specification fields filled in an extraction result."""
+    identity = sum(1 for field in ["sensor_type", "manufacturer", "model"] if data.get(field) not in (None, "", "Unknown", "null"))
+    return {"identity_fields": identity, "spec_fields": count_spec_fields(data)}
+
+def flatten_fields(data: Dict[str, Any]) -> Dict[str, str]:
+    """Identity and specification values keyed by dotted path, normalized for comparison."""
+    fields = {}
+    for field in ["sensor_type", "manufacturer", "model"]:
+        if data.get(field):
+            fields[field] = str(data[field]).strip().lower()
+    for category, values in (data.get("specifications") or {}).items():
+        if isinstance(values, dict):
+            for key, value in values.items():
+                if value not in (None, "", "Unknown", "null"):
+                    fields[f"{category}.{key}"] = str(value).strip().lower()
+    return fields
+
+def summarize_run(strategy: ExtractionStrategy, run: Dict[str, Any], usage: Dict[str, float]) -> Dict[str, Any]:
+    """Latency, cost and coverage of one strategy run, as stored in strategy_comparisons."""
+    return {
+        "strategy": strategy.name,
+        "model": run["extraction_model"],
+        "seconds": round(run["seconds"], 3),
+        "chunks": run["upload_stats"]["chunks"],
+        "failed_chunks": run["upload_stats"]["failed_chunks"],
+        "total_tokens": int(usage.get("total_tokens", 0)),
+        "cost_usd": round(usage.get("cost_usd", 0.0), 6),
+        **field_coverage(run["merged_data"])
+    }
+
+def maybe_start_shadow(primary: ExtractionStrategy, primary_run: Dict[str, Any], page_texts: List[str],
+                       page_tables: Optional[List[Dict[str, Any]]], filename: str, model_name: str, upload_id: str,
+                       content_hash: str):
+    """
+    With SHADOW_STRATEGY set, run it in the background on SHADOW_SAMPLE_RATE of uploads
+    and record the comparison; the upload response does not wait for it.
+    """
+    if not settings.shadow_strategy or settings.shadow_strategy == primary.name:
+        return
+    if random.random() >= settings.shadow_sample_rate:
+        return
+    task = asyncio.ensure_future(run_shadow(primary, primary_run, page_texts, page_tables, filename, model_name, upload_id, content_hash))
+    _shadow_tasks.add(task)
+    task.add_done_callback(_shadow_tasks.discard)
+
+async def run_shadow(primary: ExtractionStrategy, primary_run: Dict[str, Any], page_texts: List[str],
+                     page_tables: Optional[List[Dict[str, Any]]], filename: str, model_name: str, upload_id: str,
+                     content_hash: str):
+    """Run the shadow strategy on already-parsed pages and store its metrics next to the primary's."""
+    try:
+        candidate = get_strategy(settings.shadow_strategy)
+        shadow_upload_id = f"{upload_id}:shadow:{candidate.name}"
+        # Billed to its own upload scope and no session, so it never counts against the user's budgets
+        with usage_scope(session_id="", upload_id=shadow_upload_id), job_context(shadow_upload_id):
+            candidate_run = await run_strategy(candidate, page_texts, filename, model_name, page_tables=page_tables, shadow=True)
+        primary_fields = flatten_fields(primary_run["merged_data"])
+        candidate_fields = flatten_fields(candidate_run["merged_data"])
+        shared = set(primary_fields) & set(candidate_fields)
+        comparison = {
+            "upload_id": upload_id,
+            "content_hash": content_hash,
+            "filename": filename,
+            "created_at": datetime.now().isoformat(),
+            "primary": summarize_run(primary, primary_run, get_scope_totals("upload", upload_id)),
+            "candidate": summarize_run(candidate, candidate_run, get_scope_totals("upload", shadow_upload_id)),
+            "fields_only_primary": len(set(primary_fields) - shared),
+            "fields_only_candidate": len(set(candidate_fields) - shared),
+            "agreement": round(sum(1 for f in shared if primary_fields[f] == candidate_fields[f]) / len(shared), 4) if shared else None
+        }
+        db = await get_database()
+        await db["strategy_comparisons"].insert_one(comparison)
+        logger.info(
+            "Shadow %s vs %s for %s: %ss vs %ss, %s vs %s spec fields",
+            candidate.name, primary.name, filename,
+            comparison['candidate']['seconds'], comparison['primary']['seconds'],
+            comparison['candidate']['spec_fields'], comparison['primary']['spec_fields']
+        )
+    except Exception as e:
+        logger.warning("Shadow extraction with %s failed for %s: %s", settings.shadow_strategy, filename, e)
+
+async def get_strategy_comparison_summary(limit: int = 500) -> Dict[str, Any]:
+    """Average latency, cost and coverage per (primary, candidate) pair over recent comparisons."""
+    db = await get_database()
+    rows = await db["strategy_comparisons"].find({}, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(length=limit)
+    pairs: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        key = f"{row['primary']['strategy']} vs {row['candidate']['strategy']}"
+        pair = pairs.setdefault(key, {"comparisons": 0, "primary": {}, "candidate": {}, "agreement": []})
+        pair["comparisons"] += 1
+        for side in ("primary", "candidate"):
+            for metric in ("seconds", "total_tokens", "cost_usd", "spec_fields", "identity_fields", "failed_chunks"):
+                pair[side][metric] = pair[side].get(metric, 0) + row[side].get(metric, 0)
+        if row.get("agreement") is not None:
+            pair["agreement"].append(row["agreement"])
+    for pair in pairs.values():
+        for side in ("primary", "candidate"):
+            pair[side] = {metric: round(total / pair["comparisons"], 4) for metric, total in pair[side].items()}
+        agreement = pair.pop("agreement")
+        pair["mean_agreement"] = round(sum(agreement) / len(agreement), 4) if agreement else None
+    return {"pairs": pairs, "recent": rows[:20]}
@@ -60,35 +60,35 @@ def detect_intent(response_text, current_step):
     next_action = "none"
     
     # Log the full response for debugging
-    logger.debug(f"Analyzing for intents: {response_text[:100]}...")
+    logger.debug("Analyzing for intents: %.100s...", response_text)
 
     # Check for matched intents based on conversation state
     for match_id, start, end in matches:
         intent = nlp.vocab.strings[match_id]
         matched_text = doc[start:end].text
-        logger.debug(f"Matched intent: {intent} at span {start}:{end} with text: '{matched_text}'")
+        logger.debug("Matched intent: %s at span %d:%d with text: %r", intent, start, end, matched_text)
         
         if intent == "CONFIRM_SENSOR_STEP1":
             # If we're in step_1, this is a direct match
             # If not, we might need to reset the conversation state
             if current_step == "step_1":
                 next_action = "confirm_sensor"
-                logger.info(f"Setting next_action to 'confirm_sensor' based on CONFIRM_SENSOR_STEP1 match")
+                logger.info("Setting next_action to 'confirm_sensor' based on CONFIRM_SENSOR_STEP1 match")
             else:
                 # We found sensor confirmation text but we're not in step_1
                 # This likely means we need to reset to step_1 for a new sensor
                 next_action = "confirm_sensor"
-                logger.info(f"Resetting to step_1 and setting next_action to 'confirm_sensor'")
+                logger.info("Resetting to step_1 and setting next_action to 'confirm_sensor'")
             return next_action, "step_1"
         
         elif intent == "CONFIRM_SENSOR_STEP2" and current_step == "step_2":
             next_action = "confirm_sensor"
-            logger.info(f"Setting next_action to 'confirm_sensor' based on CONFIRM_SENSOR_STEP2 match")
+            logger.info("Setting next_action to 'confirm_sensor' based on CONFIRM_SENSOR_STEP2 match")
             return next_action, current_step
         
         elif intent == "PDF_UPLOAD":
             next_action = "pdf_upload"
-            logger.info(f"Setting next_action to 'pdf_upload' based on PDF_UPLOAD match")
+            logger.info("Setting next_action to 'pdf_upload' based on PDF_UPLOAD match")
             return next_action, "pdf_upload"
 
     # If no match was found but text contains likely confirmation phrases, set action anyway
@@ -104,11 +104,11 @@ def detect_intent(response_text, current_step):
         # Set the appropriate next_action based on which step we're in or assume step_1
         if "specifications" in response_text.lower() or "setup" in response_text.lower():
             next_action = "confirm_sensor"
-            logger.info(f"Setting next_action to 'confirm_sensor' (step 2) based on keyword detection")
+            logger.info("Setting next_action to 'confirm_sensor' (step 2) based on keyword detection")
             return next_action, "step_2"
         else:
             next_action = "confirm_sensor"
-            logger.info(f"Setting next_action to 'confirm_sensor' (step 1) based on keyword detection")
+            logger.info("Setting next_action to 'confirm_sensor' (step 1) based on keyword detection")
             return next_action, "step_1"
     
     # No intent detected
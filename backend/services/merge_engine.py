@@ -0,0 +1,209 @@
+import re
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Union
+from services.page_selection import UNIT_PATTERN
+from services.metrics import register_lru_cache
+
+IDENTITY_FIELDS = ["sensor_type", "manufacturer", "model"]
+SPEC_CATEGORIES = ["performance", "electrical", "mechanical", "environmental"]
+PLACEHOLDERS = {"", "null", "none", "unknown", "n/a", "na", "-"}
+
+# Default trust in each extractor; rule matches carry their own per-field confidence
+SOURCE_CONFIDENCE = {"table": 0.95, "rules": 0.85, "llm": 0.8}
+
+MAX_CANDIDATES = 8   # Distinct values kept per field; the weakest is dropped beyond this
+MAX_RUNNER_UPS = 3   # Runner-up values recorded in the provenance of each field
+AGREEMENT_BONUS = 2.0  # Score added per extra chunk reporting the same value (up to three)
+BOOL_SCORE = 5.0  # Flags ("waterproof": true) have no text to judge; agreement between chunks decides
+
+RANGE_PATTERN = re.compile(r"\d\s*(?:to|-|–|—|~|…)\s*[-+]?\d", re.IGNORECASE)
+HEDGE_PATTERN = re.compile(r"approx|low confidence|unclear|not specified|\?", re.IGNORECASE)
+DIGIT_PATTERN = re.compile(r"\d")
+
+def normalize_value(value: Any) -> str:
+    """Comparison key for a value: lower case with collapsed whitespace."""
+    return " ".join(str(value).lower().split())
+
+def score_value(value: Any, confidence: float = 1.0) -> float:
+    """
+    Score how specific a value is: units, numbers, ranges and length count for it,
+    hedges ("approx", "low confidence") against it, scaled by the extractor's confidence.
+
+    Returns:
+        float: 0 for empty or placeholder values; booleans get the fixed BOOL_SCORE
+    """
+    if value is None or isinstance(value, dict):
+        return 0.0
+    if isinstance(value, bool):
+        return BOOL_SCORE * confidence
+    text = " ".join(map(str, value)) if isinstance(value, list) else str(value)
+    return _text_score(text) * confidence
+
+@lru_cache(maxsize=4096)
+def _text_score(text: str) -> float:
+    # Cached: the same values recur across the chunks and uploads of a batch
+    if normalize_value(text) in PLACEHOLDERS:
+        return 0.0
+    score = min(len(text), 80) / 8
+    if UNIT_PATTERN.search(text):
+        score += 10
+    if DIGIT_PATTERN.search(text):
+        score += 5
+    if RANGE_PATTERN.search(text):
+        score += 3
+    if HEDGE_PATTERN.search(text):
+        score -= 8
+    return max(score, 0.1)
+
+register_lru_cache("merge_value_score", _text_score)
+
+class FieldCandidates:
+    """Distinct values seen for one field, with their best score and the pages reporting them."""
+
+    __slots__ = ("values", "best")
+
+    def __init__(self):
+        self.values: Dict[str, Dict[str, Any]] = {}
+        self.best: Optional[str] = None
+
+    def add(self, value: Any, score: float, pages: List[int], source: str):
+        key = normalize_value(value)
+        candidate = self.values.get(key)
+        if candidate is None:
+            if len(self.values) >= MAX_CANDIDATES:
+                weakest = min(self.values, key=lambda k: self.values[k]["score"])
+                if self.values[weakest]["score"] >= score:
+                    return
+                del self.values[weakest]
+                if self.best == weakest:
+                    self.best = None
+            candidate = self.values[key] = {"value": value, "score": score, "base": score, "pages": set(), "sources": [], "reports": 0}
+        elif score > candidate["base"]:
+            candidate["value"], candidate["base"] = value, score
+        candidate["reports"] += 1
+        candidate["pages"].update(pages)
+        if source not in candidate["sources"]:
+            candidate["sources"].append(source)
+        candidate["score"] = candidate["base"] + AGREEMENT_BONUS * min(candidate["reports"] - 1, 3)
+        if self.best is None or self.best not in self.values or candidate["score"] > self.values[self.best]["score"]:
+            self.best = key
+
+    def winner(self) -> Dict[str, Any]:
+        if self.best not in self.values:
+            self.best = max(self.values, key=lambda k: self.values[k]["score"])
+        return self.values[self.best]
+
+    def runner_ups(self) -> List[Dict[str, Any]]:
+        others = [c for k, c in self.values.items() if k != self.best]
+        others.sort(key=lambda c: c["score"], reverse=True)
+        return [{"value": c["value"], "score": round(c["score"], 2), "pages": sorted(c["pages"]), "sources": c["sources"]}
+                for c in others[:MAX_RUNNER_UPS]]
+
+class MergeEngine:
+    """
+    Merge per-chunk extraction results field by field.
+
+    Every leaf field (identity fields, specifications.<category>.<field>, extra_fields.<...>)
+    keeps its distinct candidate values with scores (see score_value), the pages and
+    extractors that reported them, and how often. The best-scoring value wins; the next
+    ones are kept as runner-ups. Work is linear in the number of fields added, as each
+    field holds at most MAX_CANDIDATES values.
+    """
+
+    def __init__(self):
+        self.fields: Dict[Tuple[str, ...], FieldCandidates] = {}
+
+    def add(self, data: Dict[str, Any], pages: Iterable[int] = (), source: str = "llm",
+            confidence: Union[float, Dict[str, float], None] = None) -> "MergeEngine":
+        """
+        Add one extraction result.
+
+        Args:
+            data: Result with identity fields, specifications and extra_fields
+            pages: Page numbers the result came from
+            source: Extractor name ("llm", "table", "rules", ...)
+            confidence: Trust in the extractor, or per-field confidences keyed by dotted path
+                (e.g. "specifications.electrical.power_supply"); defaults to SOURCE_CONFIDENCE
+        """
+        if not isinstance(data, dict):
+            return self
+        pages = list(pages)
+        default = SOURCE_CONFIDENCE.get(source, 0.8) if not isinstance(confidence, (int, float)) else confidence
+        per_field = confidence if isinstance(confidence, dict) else {}
+        for field in IDENTITY_FIELDS:
+            if field in data:
+                self._add_leaf((field,), data[field], pages, source, per_field.get(field, default))
+        for section in ("specifications", "extra_fields"):
+            if isinstance(data.get(section), dict):
+                self._add_tree((section,), data[section], pages, source, default, per_field)
+        return self
+
+    def _add_tree(self, path, node, pages, source, default, per_field):
+        for key, value in node.items():
+            child = path + (key,)
+            if isinstance(value, dict):
+                self._add_tree(child, value, pages, source, default, per_field)
+            else:
+                self._add_leaf(child, value, pages, source, per_field.get(".".join(child), default))
+
+    def _add_leaf(self, path, value, pages, source, confidence):
+        score = score_value(value, confidence)
+        if score <= 0:
+            return
+        candidates = self.fields.get(path)
+        if candidates is None:
+            candidates = self.fields[path] = FieldCandidates()
+        candidates.add(value, score, pages, source)
+
+    def result(self, include_provenance: bool = True) -> Dict[str, Any]:
+        """
+        Merged document in the extraction schema.
+
+        Args:
+            include_provenance: Add field_provenance, one entry per field with its dotted path,
+                pages, sources, score and runner_ups (a list, as MongoDB keys cannot contain dots)
+        """
+        # Identity fields nobody reported stay None, as in the original merge; categories keep their usual order
+        merged: Dict[str, Any] = {field: None for field in IDENTITY_FIELDS}
+        merged["specifications"] = {category: {} for category in SPEC_CATEGORIES}
+        merged["extra_fields"] = {}
+        provenance = []
+        for path, candidates in self.fields.items():
+            winner = candidates.winner()
+            if len(path) == 1:
+                merged[path[0]] = winner["value"]
+            else:
+                node = merged
+                for key in path[:-1]:
+                    if not isinstance(node.get(key), dict):
+                        node[key] = {}
+                    node = node[key]
+                node[path[-1]] = winner["value"]
+            if include_provenance:
+                provenance.append({
+                    "field": ".".join(map(str, path)),
+                    "pages": sorted(winner["pages"]),
+                    "sources": winner["sources"],
+                    "score": round(winner["score"], 2),
+                    "runner_ups": candidates.runner_ups()
+                })
+        for category in SPEC_CATEGORIES:
+            if merged["specifications"].get(category) == {}:
+                del merged["specifications"][category]
+        if include_provenance:
+            merged["field_provenance"] = provenance
+        return merged
+
+def merge_with_provenance(chunk_results: List[Tuple[List[int], Dict[str, Any], str]],
+                          confidences: Dict[int, Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Merge (page_numbers, data, source) chunk results and record field provenance.
+
+    Args:
+        chunk_results: Results in document order
+        confidences: Optional per-field confidences by index into chunk_results
+    """
+    engine = MergeEngine()
+    for index, (pages, data, source) in enumerate(chunk_results):
+        engine.add(data, pages, source, (confidences or {}).get(index))
+    return engine.result()
@@ -0,0 +1,139 @@
+import time
+from typing import Callable, Dict, Any, List, Tuple
+from prometheus_client import Counter, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from pymongo import monitoring
+
+# Buckets spanning fast local work (ms) up to slow LLM calls (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+upload_stage_seconds = Histogram(
+    "pdf_upload_stage_seconds",
+    "Time spent in each stage of the PDF upload pipeline",
+    ["stage"],  # temp_file, parse, select, llm_chunk, merge, mongo_write, total
+    buckets=LATENCY_BUCKETS
+)
+chat_llm_seconds = Histogram(
+    "chat_llm_seconds",
+    "LLM latency per chat turn",
+    ["model"],
+    buckets=LATENCY_BUCKETS
+)
+intent_detection_seconds = Histogram(
+    "chat_intent_detection_seconds",
+    "Time spent detecting the intent of an assistant reply",
+    buckets=FAST_BUCKETS
+)
+llm_tokens_total = Counter(
+    "llm_tokens",
+    "LLM tokens by model and kind (prompt, completion, cached_prompt); estimated when the provider reports no usage",
+    ["model", "kind"]
+)
+mongo_operation_seconds = Histogram(
+    "mongo_operation_seconds",
+    "MongoDB command latency",
+    ["collection", "operation", "outcome"],
+    buckets=FAST_BUCKETS + (5, 10)
+)
+cache_lookups_total = Counter(
+    "cache_lookups",
+    "Cache lookups by cache and result (hit or miss)",
+    ["cache", "result"]
+)
+
+def record_llm_usage(model_name: str, prompt_tokens: int, completion_tokens: int, cached_prompt_tokens: int = 0):
+    """Add one LLM call's token usage to the per-model counters."""
+    llm_tokens_total.labels(model_name, "prompt").inc(prompt_tokens)
+    llm_tokens_total.labels(model_name, "completion").inc(completion_tokens)
+    if cached_prompt_tokens:
+        llm_tokens_total.labels(model_name, "cached_prompt").inc(cached_prompt_tokens)
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Count a hit or miss for a named cache."""
+    cache_lookups_total.labels(cache, "hit" if hit else "miss").inc()
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    pymongo command listener timing every MongoDB command by collection and
+    operation, so latencies are recorded without wrapping individual calls.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[Any, int], Tuple[str, str]] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self._pending[(event.connection_id, event.request_id)] = (
+            collection if isinstance(collection, str) else "", event.command_name
+        )
+
+    def _finish(self, event, outcome: str):
+        collection, operation = self._pending.pop((event.connection_id, event.request_id), ("", event.command_name))
+        mongo_operation_seconds.labels(collection, operation, outcome).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+class StatsCollector:
+    """
+    Exposes counters kept elsewhere (extraction stats, single-flight counts,
+    lru_cache statistics) at scrape time, so their owners do not depend on prometheus_client.
+    """
+
+    def __init__(self):
+        self._sources: List[Tuple[str, str, List[str], str, Callable[[], Dict[Any, Any]]]] = []
+
+    def add(self, name: str, documentation: str, labels: List[str], source: Callable[[], Dict[Any, Any]], kind: str = "counter"):
+        self._sources.append((name, documentation, labels, kind, source))
+
+    def collect(self):
+        for name, documentation, labels, kind, source in self._sources:
+            family_class = CounterMetricFamily if kind == "counter" else GaugeMetricFamily
+            family = family_class(name, documentation, labels=labels)
+            for key, value in source().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    family.add_metric(list(key) if isinstance(key, tuple) else [key], value)
+            yield family
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+def register_counters(name: str, documentation: str, labels: List[str], source: Callable[[], Dict[Any, Any]]):
+    """
+    Export running totals kept in a dict as a counter family. Keys are label
+    values (a tuple when there are several labels), e.g.
+    register_counters("pdf_extraction_events", "...", ["event"], lambda: extraction_stats).
+    """
+    stats_collector.add(name, documentation, labels, source, "counter")
+
+def register_gauges(name: str, documentation: str, labels: List[str], source: Callable[[], Dict[Any, Any]]):
+    """Export current values (sizes, rates) kept in a dict as a gauge family."""
+    stats_collector.add(name, documentation, labels, source, "gauge")
+
+lru_caches: Dict[str, Any] = {}
+
+def register_lru_cache(cache: str, cached_function):
+    """Export hit/miss counts of a functools.lru_cache-decorated function."""
+    lru_caches[cache] = cached_function
+
+def _lru_cache_lookups():
+    lookups = {}
+    for cache, cached_function in lru_caches.items():
+        info = cached_function.cache_info()
+        lookups[(cache, "hit")] = info.hits
+        lookups[(cache, "miss")] = info.misses
+    return lookups
+
+register_counters("lru_cache_lookups", "functools.lru_cache lookups by cache and result", ["cache", "result"], _lru_cache_lookups)
+
+def elapsed_since(started: float) -> float:
+    """Seconds since a time.perf_counter() reading."""
+    return time.perf_counter() - started
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with its content type."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,113 @@
+import re
+import math
+from typing import List, Dict, Any, Callable, Optional
+from config import logger
+
+# Units that commonly appear next to values in specification tables
+UNIT_PATTERN = re.compile(
+    r"\d\s*(?:[mkµu]?v|[mµun]?a|[mk]?w|[kmg]?hz|°\s?[cf]|[mµ]?m|cm|[mk]?g|%|[km]?pa|psi|bar|ppm|db|[mµn]?s|ms|ohm|[kmΩ]?Ω|lux|rpm|nm|n·m|bit|bps|baud)(?![a-z])",
+    re.IGNORECASE
+)
+NUMBER_PATTERN = re.compile(r"[-+±]?\d+(?:[.,]\d+)?")
+WORD_PATTERN = re.compile(r"\w+")
+
+# Phrases that indicate a page carries specification data
+SPEC_KEYWORDS = [
+    "specification", "characteristics", "parameter", "min", "typ", "max", "unit",
+    "supply voltage", "current consumption", "operating temperature", "storage temperature",
+    "accuracy", "resolution", "sensitivity", "range", "response time", "output",
+    "interface", "dimensions", "weight", "humidity", "protection", "rating", "tolerance"
+]
+SPEC_KEYWORD_PATTERN = re.compile(r"\b(?:" + "|".join(re.escape(k) for k in SPEC_KEYWORDS) + r")\b", re.IGNORECASE)
+
+# Phrases that indicate boilerplate pages (ordering info, legal text, revision history)
+BOILERPLATE_KEYWORDS = [
+    "ordering information", "revision history", "disclaimer", "table of contents",
+    "trademark", "all rights reserved", "package marking", "tape and reel", "legal notice"
+]
+BOILERPLATE_PATTERN = re.compile(r"(?:" + "|".join(re.escape(k) for k in BOILERPLATE_KEYWORDS) + r")", re.IGNORECASE)
+
+MIN_PAGE_CHARS = 50
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (roughly four characters per token)."""
+    return len(text) // 4 + 1
+
+def score_page(text: str) -> float:
+    """
+    Score a page by the density of units, numbers and specification keywords.
+
+    Args:
+        text: Raw text of the page
+
+    Returns:
+        float: Higher values mean the page is more likely to hold specifications
+    """
+    if not text or len(text.strip()) < MIN_PAGE_CHARS:
+        return 0.0
+
+    word_count = len(WORD_PATTERN.findall(text)) or 1
+    units = len(UNIT_PATTERN.findall(text))
+    numbers = len(NUMBER_PATTERN.findall(text))
+    keywords = len(SPEC_KEYWORD_PATTERN.findall(text))
+    boilerplate = len(BOILERPLATE_PATTERN.findall(text))
+
+    density = (3.0 * units + 1.0 * numbers + 2.0 * keywords) / word_count
+    # Scale by log length so a tiny page with two numbers does not outrank a full table
+    score = density * math.log(word_count + 1)
+    score /= (1 + boilerplate)
+    return round(score, 4)
+
+def select_pages(page_texts: List[str], max_pages: int = 5, token_budget: int = 12000,
+                 always_include_first: bool = True,
+                 token_counter: Optional[Callable[[str], int]] = None) -> List[Dict[str, Any]]:
+    """
+    Rank all pages by specification density and pick the best ones within a token budget.
+
+    Args:
+        page_texts: Text of every page, in document order
+        max_pages: Maximum number of pages to select
+        token_budget: Maximum estimated tokens across all selected pages
+        always_include_first: Keep the first page, which usually names the model and manufacturer
+        token_counter: Function counting tokens in a text; defaults to estimate_tokens
+
+    Returns:
+        List of dicts with page_number (1-based), text, score and tokens, in document order
+    """
+    token_counter = token_counter or estimate_tokens
+    candidates = []
+    for i, text in enumerate(page_texts):
+        score = score_page(text)
+        if score <= 0:
+            continue
+        candidates.append({
+            "page_number": i + 1,
+            "text": text,
+            "score": score,
+            "tokens": token_counter(text)
+        })
+
+    if not candidates:
+        return []
+
+    ranked = sorted(candidates, key=lambda c: c["score"], reverse=True)
+    if always_include_first and candidates[0]["page_number"] == 1:
+        ranked.remove(candidates[0])
+        ranked.insert(0, candidates[0])
+
+    selected = []
+    used_tokens = 0
+    for candidate in ranked:
+        if len(selected) >= max_pages:
+            break
+        if selected and used_tokens + candidate["tokens"] > token_budget:
+            continue
+        selected.append(candidate)
+        used_tokens += candidate["tokens"]
+
+    selected.sort(key=lambda c: c["page_number"])
+    logger.info(
+        "Selected pages %s of %s (~%s tokens, budget %s)",
+        [c['page_number'] for c in selected], len(page_texts), used_tokens, token_budget
+    )
+    return selected
@@ -1,16 +1,83 @@
 # Alternative PDF Processor
 from langchain_community.document_loaders import PyPDFLoader
 from io import BytesIO
-import tempfile
+import asyncio
 import os
 import json
 import re
-from config import logger
-from llm.client import create_extraction_chain
-from database.mongodb import get_database
-from typing import List, Dict, Any
+import hashlib
+from config import logger, settings
+from llm.client import astream_json
+from models.sensor import PageExtraction
+from pydantic import ValidationError
+from services.metrics import register_counters
+from services.merge_engine import MergeEngine
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+# Process-wide extraction counters, see get_extraction_stats()
+EXTRACTION_STAT_KEYS = ["chunks", "parse_failures", "validation_failures", "retries", "retry_successes", "failed_chunks",
+                        "cascade_chunks", "escalations", "table_pages", "table_fields", "rule_fields"]
+extraction_stats = {key: 0 for key in EXTRACTION_STAT_KEYS}
+register_counters("pdf_extraction_events", "PDF extraction chunk events (retries, failures, escalations)", ["event"], lambda: extraction_stats)
+
+RETRY_PROMPT = """{prompt}
+
+Your previous response could not be used: {error}
+Previous response:
+{previous}
+
+Respond again with ONLY a corrected JSON object that fixes this problem."""
+
+# Specification fields requested from the LLM, per category
+SPECIFICATION_FIELDS = {
+    "performance": ["sensitivity", "range", "accuracy", "resolution", "response_time"],
+    "electrical": ["power_supply", "current_consumption", "output_type", "interface"],
+    "mechanical": ["dimensions", "weight", "mounting_options", "package_type"],
+    "environmental": ["operating_temp", "storage_temp", "humidity_range", "protection_rating"],
+}
+
+def describe_specification_fields(known: Dict[str, Dict[str, Any]] = None) -> str:
+    """
+    The specification field list for EXTRACTION_PROMPT, leaving out fields already known
+    (e.g. from the rule-based pre-extractor) so the model neither reads nor writes them.
+    """
+    known = known or {}
+    lines = []
+    for category, fields in SPECIFICATION_FIELDS.items():
+        missing = [field for field in fields if field not in known.get(category, {})]
+        if missing:
+            lines.append(f"    - {category}: {', '.join(missing)}")
+    return "\n".join(lines) or "    - (all listed fields are already known; report only extra_fields)"
+
+# Extraction prompt; page_text holds one packed chunk with "--- Page N ---" markers
+EXTRACTION_PROMPT = """You are a specialized AI for extracting structured data from sensor datasheets. Your task is to analyze the provided text from a sensor datasheet and extract key information into a well-structured JSON format with high accuracy and flexibility.
+
+**Instructions**:
+- Extract the following information if present in the text:
+  - sensor_type: The type of sensor (e.g., "Temperature Sensor", "Pressure Sensor")
+  - manufacturer: The company that makes the sensor
+  - model: The specific model number or name of the sensor
+  - specifications: An object containing these nested objects (include fields only if found):
+{specification_fields}
+- For each field, include the exact value FROM THE TEXT, with units if specified.
+- **Do not use "Unknown" or null as placeholders** unless explicitly stated in the text. If data is unclear or missing, omit the field or provide partial data with a confidence note in the field value (e.g., "Approx 5V - low confidence").
+- Use `model_hint` and `sensor_type_hint` as supplementary information if direct text data is missing or ambiguous.
+- If you find additional relevant information outside the schema, include it in an "extra_fields" object with detailed context if possible.
+
+**Context**:
+- Sensor model from filename appears to be: {model_hint}
+- This may be a {sensor_type_hint} based on the filename.
+- Accuracy and data integrity are critical for technical use cases.
+
+**Constraints**:
+- Respond ONLY with a valid JSON object containing the extracted information.
+- Ensure strict JSON formatting (no trailing commas, no extra text outside the JSON).
+
+Text from page(s) {page_num} of {total_pages} (each page starts with a "--- Page N ---" marker):
+{page_text}
+"""
+
 class PDFProcessorAlt:
     def __init__(self, pdf_dir: str = None):
         # If pdf_dir is not provided, use a directory relative to the current file
@@ -52,7 +119,7 @@ class PDFProcessorAlt:
             
             return chunked_pages
         except Exception as e:
-            logger.error(f"Error loading or chunking PDF '{pdf_path}': {str(e)}", exc_info=True)
+            logger.error("Error loading or chunking PDF '%s': %s", pdf_path, e, exc_info=True)
             raise Exception(f"Error processing PDF: {str(e)}")
     
     def process_directory(self) -> List[Dict[str, Any]]:
@@ -64,265 +131,171 @@ class PDFProcessorAlt:
         """
         all_pages = []
         pdf_files = [f for f in os.listdir(self.pdf_dir) if f.lower().endswith('.pdf')]
-        logger.info(f"Found {len(pdf_files)} PDF(s) in directory '{self.pdf_dir}'")
+        logger.info("Found %s PDF(s) in directory '%s'", len(pdf_files), self.pdf_dir)
         
         for i, file in enumerate(pdf_files):
             pdf_path = os.path.join(self.pdf_dir, file)
-            logger.info(f"Processing file {i+1}/{len(pdf_files)}: {file}")
+            logger.info("Processing file %s/%s: %s", i+1, len(pdf_files), file)
             try:
                 pages = self.load_and_chunk_pdf(pdf_path)
                 all_pages.extend(pages)
-                logger.info(f"Successfully loaded {len(pages)} pages from {file}")
+                logger.info("Successfully loaded %s pages from %s", len(pages), file)
             except Exception as e:
-                logger.error(f"Failed to process {file}: {str(e)}")
+                logger.error("Failed to process %s: %s", file, e)
         
-        logger.info(f"Finished processing directory. Total pages loaded: {len(all_pages)}")
+        logger.info("Finished processing directory. Total pages loaded: %s", len(all_pages))
         return all_pages
 
-async def process_pdf_datasheet_alt(pdf_content: bytes, filename: str, model_name: str = None):
+async def process_pdf_datasheet_alt(pdf_content: Optional[bytes], filename: str, model_name: str = None, cascade: bool = None,
+                                    content_hash: str = None, upload_id: str = None, pdf_path: str = None,
+                                    extraction_chain=None, chunk_semaphore: asyncio.Semaphore = None):
     """
-    Process a PDF datasheet to extract structured data using an alternative approach.
+    Process a PDF datasheet with the default extraction strategy.
+    Kept for existing callers; see services.extraction_pipeline.process_datasheet for the arguments.
     
-    Args:
-        pdf_content: The binary content of the PDF
-        filename: The original filename
-        model_name: Optional model name to use for extraction
-        
     Returns:
         dict: Extracted structured data
     """
-    extraction_model = model_name if model_name else "meta-llama/llama-3.1-8b-instruct"
-    logger.info(f"Starting alternative PDF datasheet processing for: {filename} using model: {extraction_model}")
-    logger.debug(f"Model parameter received for PDF processing: {model_name}")
-    logger.info(f"Progress update for {filename}: [1/5] Saving temporary file.")
-    
-    # Save the PDF content to a temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-        temp_file_path = temp_file.name
-        temp_file.write(pdf_content)
-    
-    try:
-        logger.info(f"Progress update for {filename}: [2/5] Loading PDF pages.")
-        loader = PyPDFLoader(temp_file_path)
-        pages = loader.load()
-        
-        total_pages_to_process = len(pages)
-        logger.info(f"Loaded {total_pages_to_process} pages from PDF: {filename}")
-        
-        logger.info(f"Progress update for {filename}: [3/5] Extracting data using model: {extraction_model}")
-        extraction_chain = create_extraction_chain(model_name=extraction_model, temperature=0.1)
-        
-        all_extracted_data = []
-        pages_to_process_limit = min(5, total_pages_to_process)
-        possible_sensor_type = guess_sensor_type_from_filename(filename)
-        
-        for i, page in enumerate(pages[:pages_to_process_limit]):
-            current_page_num = i + 1
-            logger.info(f"Processing page {current_page_num}/{pages_to_process_limit} for {filename}")
-            
-            page_text = page.page_content
-            
-            if len(page_text.strip()) < 50:
-                logger.debug(f"Skipping page {current_page_num} - insufficient text content")
-                continue
-                
-            # Enhanced prompt based on specification
-            prompt_text = """You are a specialized AI for extracting structured data from sensor datasheets. Your task is to analyze the provided text from a sensor datasheet and extract key information into a well-structured JSON format with high accuracy and flexibility.
+    from services.extraction_pipeline import process_datasheet  # Imported here: the pipeline builds on this module
+    return await process_datasheet(
+        pdf_content, filename, model_name, cascade=cascade, content_hash=content_hash, upload_id=upload_id,
+        pdf_path=pdf_path, extraction_chain=extraction_chain, chunk_semaphore=chunk_semaphore, strategy="default"
+    )
 
-**Instructions**:
-- Extract the following information if present in the text:
-  - sensor_type: The type of sensor (e.g., "Temperature Sensor", "Pressure Sensor")
-  - manufacturer: The company that makes the sensor
-  - model: The specific model number or name of the sensor
-  - specifications: An object containing these nested objects (include fields only if found):
-    - performance: sensitivity, range, accuracy, resolution, response_time
-    - electrical: power_supply, current_consumption, output_type, interface
-    - mechanical: dimensions, weight, mounting_options, package_type
-    - environmental: operating_temp, storage_temp, humidity_range, protection_rating
-- For each field, include the exact value FROM THE TEXT, with units if specified.
-- **Do not use "Unknown" or null as placeholders** unless explicitly stated in the text. If data is unclear or missing, omit the field or provide partial data with a confidence note in the field value (e.g., "Approx 5V - low confidence").
-- Use `model_hint` and `sensor_type_hint` as supplementary information if direct text data is missing or ambiguous.
-- If you find additional relevant information outside the schema, include it in an "extra_fields" object with detailed context if possible.
+def hash_pdf_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file on disk, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-**Context**:
-- Sensor model from filename appears to be: {model_hint}
-- This may be a {sensor_type_hint} based on the filename.
-- Accuracy and data integrity are critical for technical use cases.
+def new_upload_id(content_hash: str) -> str:
+    """Generate an upload ID from the timestamp and content hash (unique even within one second)."""
+    return f"upload_{datetime.now().strftime('%Y%m%dT%H%M%S')}_{content_hash[:8]}"
 
-**Constraints**:
-- Respond ONLY with a valid JSON object containing the extracted information.
-- Ensure strict JSON formatting (no trailing commas, no extra text outside the JSON).
+def new_extraction_stats(shadow: bool = False) -> Dict[str, int]:
+    """
+    Create an empty per-upload extraction stats dict.
+    Shadow runs (strategy comparisons) are counted per run only, not in the process-wide counters.
+    """
+    upload_stats = {key: 0 for key in EXTRACTION_STAT_KEYS}
+    if shadow:
+        upload_stats["shadow"] = True
+    return upload_stats
 
-Text from page {page_num} of {total_pages}:
-{page_text}
-"""
-            try:
-                # Get model name from filename for hint
-                model_hint = os.path.splitext(os.path.basename(filename))[0]
-                
-                # Invoke the LLM chain with the prompt
-                extraction_result = await extraction_chain.ainvoke({
-                    "user_input": prompt_text.format(
-                        page_num=current_page_num,
-                        total_pages=total_pages_to_process,
-                        page_text=page_text[:8000],  # Limit text length to avoid token limits
-                        model_hint=model_hint,
-                        sensor_type_hint=possible_sensor_type or "sensor"
-                    )
-                })
-                
-                # Extract the text response from the LLM
-                response_text = extraction_result.get("text", "")
-                logger.debug(f"Raw extraction response: {response_text[:200]}...")
-                
-                # Try to parse the JSON response
-                json_content = extract_json_from_text(response_text)
-                
-                if json_content:
-                    try:
-                        extracted_data = json.loads(json_content)
-                        logger.debug(f"Successfully parsed JSON from page {current_page_num}")
-                        all_extracted_data.append(extracted_data)
-                    except json.JSONDecodeError as e:
-                        logger.error(f"Error parsing JSON from page {current_page_num}: {str(e)}")
-                        logger.debug(f"Problematic JSON content: {json_content}")
-                        
-                        # Try to fix common JSON issues and retry
-                        fixed_json = attempt_json_repair(json_content)
-                        if fixed_json:
-                            try:
-                                extracted_data = json.loads(fixed_json)
-                                logger.info(f"Successfully parsed JSON after repair for page {current_page_num}")
-                                all_extracted_data.append(extracted_data)
-                            except json.JSONDecodeError:
-                                logger.warning("JSON repair attempt failed")
-                else:
-                    logger.warning(f"No valid JSON found in response from page {current_page_num}")
-            except Exception as e:
-                logger.error(f"Error processing page {current_page_num}: {str(e)}", exc_info=True)
-        
-        # Fallback to direct extraction if no valid data
-        if not all_extracted_data:
-            logger.warning(f"No valid data extracted from any processed page for {filename}, attempting direct extraction")
-            # Try one more extraction with combined text from first 2 pages
-            combined_text = ""
-            for i, page in enumerate(pages[:min(2, total_pages_to_process)]):
-                combined_text += page.page_content + "\n\n"
-            
-            if combined_text:
-                try:
-                    # More direct prompt focusing on basics
-                    direct_prompt = """Extract ONLY these fields from the sensor datasheet text:
-- model: The model number or name
-- manufacturer: The company name
-- sensor_type: What kind of sensor this is (light, temperature, etc.)
+def record_extraction_stat(upload_stats: Dict[str, int], key: str, amount: int = 1):
+    """Increment an extraction counter for both the upload and the process."""
+    upload_stats[key] += amount
+    if not upload_stats.get("shadow"):
+        extraction_stats[key] += amount
 
-Text:
-{text}
+def get_extraction_stats() -> Dict[str, Any]:
+    """
+    Get process-wide extraction counters with derived failure and retry rates.
+    
+    Returns:
+        dict: Counters plus failure_rate and retry_rate per chunk
+    """
+    chunks = extraction_stats["chunks"] or 1
+    return {
+        **extraction_stats,
+        "failure_rate": round(extraction_stats["failed_chunks"] / chunks, 4),
+        "retry_rate": round(extraction_stats["retries"] / chunks, 4),
+        "escalation_rate": round(extraction_stats["escalations"] / (extraction_stats["cascade_chunks"] or 1), 4)
+    }
 
-Return as valid JSON with these three fields only. If information is not found, use null.
-"""
-                    direct_result = await extraction_chain.ainvoke({
-                        "user_input": direct_prompt.format(text=combined_text[:5000])
-                    })
-                    
-                    json_content = extract_json_from_text(direct_result.get("text", ""))
-                    if json_content:
-                        try:
-                            direct_data = json.loads(json_content)
-                            all_extracted_data.append(direct_data)
-                            logger.info("Successfully extracted basic data through direct approach")
-                        except json.JSONDecodeError:
-                            logger.warning("Failed to parse JSON from direct extraction")
-                except Exception as e:
-                    logger.error(f"Error in direct extraction: {str(e)}")
-        
-        # Prepare data for storage
-        logger.info(f"Progress update for {filename}: [4/5] Preparing data for storage.")
-        
-        # Generate a unique upload ID based on timestamp
-        upload_timestamp = datetime.now().strftime("%Y%m%dT%H%M%S")
-        upload_id = f"upload_{upload_timestamp}"
-        logger.info(f"Assigning upload ID {upload_id} for {filename}")
-        
-        # Merge extracted data from all pages
-        merged_data = merge_extracted_data(all_extracted_data)
-        
-        # Add classification model information
-        merged_data["classification_model"] = extraction_model
-        
-        # Add source information
-        merged_data["source"] = {
-            "filename": filename,
-            "upload_date": datetime.now().isoformat(),
-            "page_count": total_pages_to_process
-        }
-        
-        # Structure data at root level as per user preference
-        structured_data = merged_data
-        
-        # Log summary of filled vs missing fields for debugging
-        specs = merged_data.get("specifications", {})
-        for category in ["performance", "electrical", "mechanical", "environmental"]:
-            cat_data = specs.get(category, {})
-            filled = sum(1 for v in cat_data.values() if v and v != "Unknown")
-            total = len(cat_data)
-            logger.info(f"Category {category}: {filled}/{total} fields filled")
-        
-        # Validation: Check for critical missing fields
-        critical_fields = ["model", "sensor_type"]
-        missing_critical = [f for f in critical_fields if not merged_data.get(f) or merged_data.get(f) == "Unknown"]
-        if missing_critical:
-            logger.warning(f"Critical fields missing or unknown: {missing_critical}")
-            # Potential secondary extraction could be triggered here if needed
-        
-        # Save to database
-        logger.info(f"Progress update for {filename}: [5/5] Saving data to MongoDB.")
-        db = await get_database()
-        collection = db["uploads"]
-        
-        # Store each page's raw data as a separate document
-        for i, page in enumerate(pages):
-            page_document = {
-                "upload_id": upload_id,
-                "page_number": i + 1,
-                "filename": filename,
-                "upload_date": datetime.now().isoformat(),
-                "processed_at": datetime.now().isoformat(),
-                "raw_text": page.page_content,
-                "extraction_model": extraction_model,
-                "text_snippet": page.page_content[:200] if page.page_content else ""  # Short excerpt for reference
-            }
-            if i < len(all_extracted_data):
-                extracted_data_with_meta = all_extracted_data[i].copy()
-                extracted_data_with_meta["metadata"] = {
-                    "page_number": i + 1,
-                    "extraction_confidence": "high" if "model" in extracted_data_with_meta and extracted_data_with_meta["model"] else "medium"
-                }
-                page_document["extracted_data"] = extracted_data_with_meta
-            insert_result = await collection.insert_one(page_document)
-            logger.info(f"Inserted data for page {i+1} of {filename} with ID {insert_result.inserted_id}")
-        
-        # Store the structured data in sensor_specifications collection
-        specs_collection = db["sensor_specifications"]
-        spec_result = await specs_collection.insert_one(structured_data)
-        logger.info(f"Inserted structured specifications with ID {spec_result.inserted_id}")
+def count_spec_fields(data: Dict[str, Any]) -> int:
+    """Count non-empty fields across all specification categories."""
+    specs = data.get("specifications") if isinstance(data, dict) else None
+    if not isinstance(specs, dict):
+        return 0
+    return sum(
+        1 for category in specs.values() if isinstance(category, dict)
+        for value in category.values() if value not in (None, "", "Unknown", "null")
+    )
+
+def cascade_escalation_reason(data: Optional[Dict[str, Any]], page_numbers: List[int]) -> Optional[str]:
+    """
+    Decide whether a small-model result needs the large model.
+    
+    Args:
+        data: Validated small-model result, or None if extraction failed
+        page_numbers: Pages covered by the chunk
         
-        logger.info(f"Finished processing PDF: {filename}")
-        return merged_data
+    Returns:
+        str: Reason for escalating, or None to keep the small-model result
+    """
+    if data is None:
+        return "small model produced no valid result"
+    if 1 in page_numbers:
+        # The first page names the sensor; missing identity there means the datasheet was misread
+        missing = [field for field in ["model", "sensor_type"] if not data.get(field) or data.get(field) == "Unknown"]
+        if missing:
+            return f"missing required fields {missing}"
+    spec_fields = count_spec_fields(data)
+    if spec_fields < settings.cascade_min_spec_fields:
+        return f"low spec coverage ({spec_fields} < {settings.cascade_min_spec_fields} fields)"
+    return None
+
+def validate_extraction(data: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Validate extracted data against the PageExtraction schema.
     
-    except Exception as e:
-        logger.error(f"Critical error during PDF processing for {filename}: {str(e)}", exc_info=True)
-        raise
+    Returns:
+        str: Error description, or None if the data is valid
+    """
+    if data is None:
+        return "the response did not contain a JSON object"
+    try:
+        PageExtraction.model_validate(data)
+    except ValidationError as e:
+        # Keep the error short: field paths and messages only
+        return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()[:5])
+    return None
+
+async def extract_chunk(extraction_chain, prompt: str, page_label: str, upload_stats: Dict[str, int]) -> Optional[Dict[str, Any]]:
+    """
+    Extract and validate JSON for one chunk, with a single targeted retry
+    that feeds the parse/validation error back to the model.
     
-    finally:
-        # Clean up the temporary file
-        if 'temp_file_path' in locals() and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                logger.debug(f"Successfully removed temporary file: {temp_file_path}")
-            except Exception as e:
-                logger.error(f"Error removing temporary file {temp_file_path}: {str(e)}")
+    Args:
+        extraction_chain: Chain from create_extraction_chain
+        prompt: Rendered extraction prompt
+        page_label: Page numbers covered by the chunk, for logging
+        upload_stats: Per-upload stats dict from new_extraction_stats()
+        
+    Returns:
+        dict: Validated extracted data, or None if both attempts failed
+    """
+    record_extraction_stat(upload_stats, "chunks")
+    parser = await astream_json(extraction_chain.llm, prompt)
+    logger.debug("Raw extraction response: %.200s...", parser.json_text)
+    data = parser.result()
+    error = validate_extraction(data)
+    if error is None:
+        if parser.repaired:
+            logger.info("Successfully parsed JSON after repair for page %s", page_label)
+        return data
+
+    record_extraction_stat(upload_stats, "parse_failures" if data is None else "validation_failures")
+    logger.warning("Invalid extraction for page %s, retrying once: %s", page_label, error)
+    record_extraction_stat(upload_stats, "retries")
+    parser = await astream_json(extraction_chain.llm, RETRY_PROMPT.format(
+        prompt=prompt,
+        error=error,
+        previous=parser.json_text[:2000] or "(no JSON)"
+    ))
+    data = parser.result()
+    error = validate_extraction(data)
+    if error is None:
+        record_extraction_stat(upload_stats, "retry_successes")
+        logger.info("Retry succeeded for page %s", page_label)
+        return data
+
+    record_extraction_stat(upload_stats, "failed_chunks")
+    logger.error("Extraction failed for page %s after retry: %s", page_label, error)
+    return None
 
 def extract_json_from_text(text: str) -> str:
     """
@@ -439,110 +412,13 @@ def guess_sensor_type_from_filename(filename: str) -> str:
 def merge_extracted_data(extracted_data_list: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Merge data extracted from multiple pages into a single document.
-    Prioritizes detailed and complete data based on a scoring system. Aggregates extra_fields comprehensively.
+    Keeps the most specific value per field (see services.merge_engine); use
+    merge_with_provenance to also get each field's pages and runner-up values.
     """
-    # Build structure dynamically based on extracted data
-    merged_data = {
-        "sensor_type": "",
-        "manufacturer": "",
-        "model": "",
-        "specifications": {
-            "performance": {},
-            "electrical": {},
-            "mechanical": {},
-            "environmental": {}
-        },
-        "extra_fields": {}
-    }
-
-    if not extracted_data_list:
-        return merged_data
-
-    def score_value(value):
-        """ Score a value based on detail level (length, presence of units, numerical data). """
-        if not value or value in ["null", "Unknown", ""]:
-            return 0
-        score = len(str(value))
-        if any(unit in str(value).lower() for unit in ['v', 'a', 'w', 'hz', '°c', 'mm', 'g', '%']):
-            score += 10  # Bonus for units
-        if any(char.isdigit() for char in str(value)):
-            score += 5   # Bonus for numerical data
-        return score
-
-    def deep_merge_dicts(target, source, path=""):
-        """ Recursively merge dictionary 'source' into 'target', prioritizing detailed data. """
-        if not isinstance(target, dict):
-            logger.error(f"Target is not a dictionary at path {path}. Target type: {type(target)}")
-            return source if isinstance(source, dict) else {}
-            
-        if not isinstance(source, dict):
-            logger.error(f"Source is not a dictionary at path {path}. Source type: {type(source)}")
-            return target
-            
-        for key, value in source.items():
-            full_path = f"{path}.{key}" if path else key
-            if isinstance(value, dict):
-                if key in target and not isinstance(target[key], dict):
-                    logger.warning(f"Overwriting non-dict value with dict at key '{full_path}'. Old type: {type(target[key])}")
-                    target[key] = {}
-                node = target.setdefault(key, {})
-                deep_merge_dicts(node, value, full_path)
-            else:
-                if key not in target or score_value(value) > score_value(target.get(key, "")):
-                    logger.debug(f"Updating key '{full_path}' with higher scored value. New value: {value}")
-                    target[key] = value
-        return target
-
-    def merge_extra_fields(target, source):
-        """ Merge extra_fields comprehensively, using lists for conflicting keys. """
-        for key, value in source.items():
-            if key in target:
-                if isinstance(target[key], list):
-                    if value not in target[key]:
-                        target[key].append(value)
-                elif target[key] != value:
-                    target[key] = [target[key], value]
-            else:
-                target[key] = value
-        return target
-
+    engine = MergeEngine()
     for data in extracted_data_list:
         if not isinstance(data, dict):
-            logger.warning(f"Skipping non-dict item during merge: {type(data)}")
+            logger.warning("Skipping non-dict item during merge: %s", type(data))
             continue
-            
-        for field in ["sensor_type", "manufacturer", "model"]:
-            if field in data:
-                current_score = score_value(merged_data[field])
-                new_score = score_value(data[field])
-                if new_score > current_score:
-                    merged_data[field] = data[field]
-                    logger.debug(f"Updated {field} to {data[field]} with score {new_score}")
-        
-        if "specifications" in data and isinstance(data["specifications"], dict):
-            merged_data["specifications"] = deep_merge_dicts(
-                merged_data["specifications"],
-                data["specifications"]
-            )
-        elif "specifications" in data:
-            logger.warning(f"Skipping non-dict specifications: {type(data['specifications'])}")
-        
-        if "extra_fields" in data and isinstance(data["extra_fields"], dict):
-            merged_data["extra_fields"] = merge_extra_fields(
-                merged_data["extra_fields"],
-                data["extra_fields"]
-            )
-        elif "extra_fields" in data:
-            logger.warning(f"Skipping non-dict extra_fields: {type(data['extra_fields'])}")
-            
-        if "extra_fields" in data:
-            # Validate extra_fields is a dict before merging
-            if isinstance(data["extra_fields"], dict):
-                merged_data["extra_fields"] = deep_merge_dicts(
-                    merged_data.get("extra_fields", {}),
-                    data["extra_fields"]
-                )
-            else:
-                logger.warning(f"Skipping non-dict extra_fields: {type(data['extra_fields'])}")
-    
-    return merged_data
+        engine.add(data)
+    return engine.result(include_provenance=False)
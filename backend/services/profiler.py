@@ -0,0 +1,222 @@
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from config import logger, settings
+from services.admin import is_admin_token
+
+# Only one request is profiled at a time to keep the overhead bounded
+_profile_lock = asyncio.Lock()
+
+Frame = Tuple[str, str, int]  # (function, file, line)
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for all threads of the process.
+
+    A daemon thread reads every other thread's current stack every `interval`
+    seconds via sys._current_frames(), so the profiled code is not instrumented
+    and overhead stays small. Stacks are kept per thread name, so work pushed to
+    the default executor (PDF parsing, table extraction in asyncio.to_thread)
+    shows up under its asyncio_N threads next to the event loop thread. Samples
+    taken while the loop is idle show up under the selector's select() call, i.e.
+    time spent waiting on I/O such as LLM calls. Other requests running
+    concurrently appear in the samples too.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()  # (thread name, stack root first) -> samples
+        self.sample_count = 0
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, frame.f_lineno))
+                    frame = frame.f_back
+                stack.reverse()  # Root first
+                self.stacks[(names.get(thread_id, f"thread-{thread_id}"), tuple(stack))] += 1
+            self.sample_count += 1
+
+    def threads(self) -> List[str]:
+        """Names of the threads seen, busiest first."""
+        per_thread: Counter = Counter()
+        for (thread_name, _), count in self.stacks.items():
+            per_thread[thread_name] += count
+        return [thread_name for thread_name, _ in per_thread.most_common()]
+
+    def collapsed(self) -> str:
+        """Stacks in the collapsed format used by flamegraph.pl and speedscope ("[thread];a;b;c 12")."""
+        lines = []
+        for (thread_name, stack), count in self.stacks.most_common():
+            names = ";".join(f"{function} ({os.path.basename(filename)}:{line})" for function, filename, line in stack)
+            # Thread name as the root frame
+            lines.append(f"[{thread_name}];{names} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str) -> Dict[str, Any]:
+        """Profile in the speedscope file format (https://www.speedscope.app), one profile per thread."""
+        frame_index: Dict[Frame, int] = {}
+        frames: List[Dict[str, Any]] = []
+        profiles = []
+        interval_ms = self.interval * 1000
+        for thread_name in self.threads():
+            samples = []
+            weights = []
+            for (stack_thread, stack), count in self.stacks.items():
+                if stack_thread != thread_name:
+                    continue
+                indices = []
+                for frame in stack:
+                    if frame not in frame_index:
+                        frame_index[frame] = len(frames)
+                        function, filename, line = frame
+                        frames.append({"name": function, "file": filename, "line": line})
+                    indices.append(frame_index[frame])
+                samples.append(indices)
+                weights.append(count * interval_ms)
+            profiles.append({
+                "type": "sampled",
+                "name": f"{name} [{thread_name}]",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "sensors-assistant sampling profiler",
+            "shared": {"frames": frames},
+            "profiles": profiles
+        }
+
+def wants_profile(request) -> bool:
+    """A request is profiled when it carries the admin token and asks for it (X-Profile header or ?profile=1)."""
+    flag = request.headers.get("x-profile") or request.query_params.get("profile")
+    if not flag or flag.lower() not in ("1", "true", "yes"):
+        return False
+    return is_admin_token(request.headers.get("x-admin-token"))
+
+def save_profile(profiler: SamplingProfiler, request, status_code: int) -> str:
+    """
+    Write a finished profile (collapsed stacks, speedscope JSON, metadata) and
+    prune the oldest profiles beyond PROFILE_RETENTION.
+
+    Returns:
+        str: Profile ID
+    """
+    profile_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    name = f"{request.method} {request.url.path}"
+    os.makedirs(settings.profile_directory, exist_ok=True)
+    base = os.path.join(settings.profile_directory, profile_id)
+    with open(f"{base}.collapsed.txt", "w", encoding="utf-8") as file:
+        file.write(profiler.collapsed())
+    with open(f"{base}.speedscope.json", "w", encoding="utf-8") as file:
+        json.dump(profiler.speedscope(name), file)
+    with open(f"{base}.meta.json", "w", encoding="utf-8") as file:
+        json.dump({
+            "id": profile_id,
+            "request": name,
+            "query": str(request.url.query),
+            "status_code": status_code,
+            "duration_ms": round(profiler.duration * 1000, 1),
+            "samples": profiler.sample_count,
+            "threads": profiler.threads(),
+            "interval_ms": profiler.interval * 1000,
+            "created_at": datetime.now().isoformat()
+        }, file)
+    prune_profiles()
+    return profile_id
+
+def prune_profiles():
+    """Delete the oldest profiles beyond PROFILE_RETENTION."""
+    profiles = list_profiles()
+    for meta in profiles[settings.profile_retention:]:
+        for suffix in (".collapsed.txt", ".speedscope.json", ".meta.json"):
+            try:
+                os.unlink(os.path.join(settings.profile_directory, meta["id"] + suffix))
+            except FileNotFoundError:
+                pass
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Metadata of stored profiles, newest first."""
+    if not os.path.isdir(settings.profile_directory):
+        return []
+    profiles = []
+    for entry in os.listdir(settings.profile_directory):
+        if entry.endswith(".meta.json"):
+            with open(os.path.join(settings.profile_directory, entry), "r", encoding="utf-8") as file:
+                profiles.append(json.load(file))
+    return sorted(profiles, key=lambda meta: meta["id"], reverse=True)
+
+def get_profile_path(profile_id: str, profile_format: str) -> Optional[str]:
+    """
+    Path of a stored profile file, or None if it does not exist.
+
+    Args:
+        profile_id: ID from list_profiles()
+        profile_format: "collapsed" or "speedscope"
+    """
+    suffix = {"collapsed": ".collapsed.txt", "speedscope": ".speedscope.json"}.get(profile_format)
+    if suffix is None or os.path.basename(profile_id) != profile_id:
+        return None
+    path = os.path.join(settings.profile_directory, profile_id + suffix)
+    return path if os.path.isfile(path) else None
+
+async def profiling_middleware(request, call_next):
+    """
+    HTTP middleware running admin-requested requests under the sampling profiler.
+    The profile ID is returned in the X-Profile-Id response header.
+    """
+    if not wants_profile(request):
+        return await call_next(request)
+    if _profile_lock.locked():
+        logger.info("Profiling skipped for %s: another request is being profiled", request.url.path)
+        response = await call_next(request)
+        response.headers["X-Profile-Skipped"] = "busy"
+        return response
+
+    async with _profile_lock:
+        profiler = SamplingProfiler(settings.profile_sample_interval_ms / 1000)
+        profiler.start()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+        finally:
+            profiler.stop()
+            profile_id = await asyncio.to_thread(save_profile, profiler, request, status_code)
+            logger.info("Profiled %s %s: %s samples over %.2fs, profile %s", request.method, request.url.path,
+                        profiler.sample_count, profiler.duration, profile_id)
+    response.headers["X-Profile-Id"] = profile_id
+    return response
@@ -0,0 +1,182 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from fastapi.responses import JSONResponse
+from pymongo import ReturnDocument
+from config import logger, settings
+from database.mongodb import get_database
+from services.metrics import register_counters
+from services.token_bucket import TokenBucket
+
+# Buckets kept in memory (least recently used dropped first; a dropped bucket starts full again)
+MAX_TRACKED_CLIENTS = 10000
+
+# Requests rejected per limit class, for metrics
+rejected_requests: Dict[str, int] = {}
+
+def limit_classes() -> Dict[str, Tuple[float, float]]:
+    """(tokens per second, burst) per limit class, from settings."""
+    return {
+        "chat": (settings.rate_limit_chat_per_second, settings.rate_limit_chat_burst),
+        "upload": (settings.rate_limit_upload_per_second, settings.rate_limit_upload_burst),
+        "read": (settings.rate_limit_read_per_second, settings.rate_limit_read_burst),
+        # One token per file: the first by the middleware, the rest as their parts arrive (check_file_limit)
+        "batch": (settings.rate_limit_batch_files_per_second, settings.rate_limit_batch_files_burst),
+    }
+
+def classify_request(method: str, path: str) -> Optional[str]:
+    """
+    Limit class of a request: "chat" for LLM chat turns, "upload" for single PDF uploads,
+    "batch" for batch uploads (their first file), "read" for other API GETs, or None for
+    requests the middleware does not limit (CORS preflights, health, metrics, admin
+    endpoints, state resets).
+    """
+    if method == "OPTIONS" or not path.startswith("/api/v1/") or path.startswith("/api/v1/admin/"):
+        return None
+    if method == "POST":
+        if path in ("/api/v1/chat", "/api/v1/sensor/confirm"):
+            return "chat"
+        if path == "/api/v1/pdf/upload":
+            return "upload"
+        if path == "/api/v1/pdf/upload/batch":
+            return "batch"
+        return None
+    return "read" if method == "GET" else None
+
+def client_key(request) -> str:
+    """Client identity for rate limiting: the peer address, or the first X-Forwarded-For hop behind a trusted proxy."""
+    if settings.rate_limit_trust_forwarded_for:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+class MemoryRateLimitBackend:
+    """Per-process token buckets; each worker enforces the limits on its own."""
+
+    def __init__(self):
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    async def acquire(self, key: str, rate: float, capacity: float, cost: float = 1) -> float:
+        """
+        Take cost tokens from the bucket for key.
+
+        Returns:
+            float: 0 if allowed, otherwise seconds until a token is available
+        """
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(rate, capacity)
+            while len(self.buckets) > MAX_TRACKED_CLIENTS:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket.try_acquire(cost)
+
+class MongoRateLimitBackend:
+    """
+    Token buckets in the rate_limits collection, shared by all workers. Each request
+    refills and takes from its bucket in one atomic find_one_and_update. Idle buckets
+    expire through a TTL index. If MongoDB is unavailable the in-memory buckets are used.
+    """
+
+    def __init__(self):
+        self.fallback = MemoryRateLimitBackend()
+
+    async def acquire(self, key: str, rate: float, capacity: float, cost: float = 1) -> float:
+        now = time.time()
+        refilled = {"$min": [capacity, {"$add": [
+            {"$ifNull": ["$tokens", capacity]},
+            {"$multiply": [rate, {"$max": [0, {"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}]}]}
+        ]}]}
+        # Full again after capacity / rate seconds; keep the document a little longer than that
+        ttl_ms = int((capacity / rate if rate > 0 else 3600) * 1000) + 60000
+        pipeline = [
+            {"$set": {"tokens": refilled, "updated_at": now}},
+            {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+            {"$set": {
+                "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]},
+                "expires_at": {"$add": ["$$NOW", ttl_ms]}
+            }},
+        ]
+        try:
+            db = await get_database()
+            bucket = await db.rate_limits.find_one_and_update(
+                {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except Exception as e:
+            logger.warning("Rate limit lookup in MongoDB failed, using in-memory buckets: %s", e)
+            return await self.fallback.acquire(key, rate, capacity, cost)
+        if bucket["allowed"]:
+            return 0.0
+        if rate <= 0:
+            return float("inf")
+        return (cost - bucket["tokens"]) / rate
+
+def create_backend():
+    """The backend selected by RATE_LIMIT_BACKEND ("memory" or "mongodb")."""
+    if settings.rate_limit_backend == "mongodb":
+        return MongoRateLimitBackend()
+    if settings.rate_limit_backend != "memory":
+        logger.warning("Unknown RATE_LIMIT_BACKEND %r, using memory", settings.rate_limit_backend)
+    return MemoryRateLimitBackend()
+
+rate_limit_backend = create_backend()
+
+async def check_limit(request, limit_class: str, cost: float = 1) -> int:
+    """
+    Charge cost tokens to the client's bucket for a limit class.
+
+    Args:
+        request: Incoming request (identifies the client)
+        limit_class: Key of limit_classes()
+        cost: Tokens to take, e.g. the number of files in a batch; capped at the burst
+            so a request the limits allow at all can always succeed eventually
+
+    Returns:
+        int: 0 if allowed, otherwise the Retry-After in seconds
+    """
+    if not settings.rate_limit_enabled:
+        return 0
+    rate, capacity = limit_classes()[limit_class]
+    client = client_key(request)
+    wait = await rate_limit_backend.acquire(f"{limit_class}:{client}", rate, capacity, min(cost, capacity))
+    if wait <= 0:
+        return 0
+    rejected_requests[limit_class] = rejected_requests.get(limit_class, 0) + 1
+    retry_after = math.ceil(wait) if math.isfinite(wait) else 3600
+    logger.warning("Rate limited %s request from %s to %s; retry after %ss", limit_class, client, request.url.path, retry_after)
+    return retry_after
+
+async def check_file_limit(request, file_number: int) -> int:
+    """
+    Charge the "batch" token of one file of a batch upload as its part begins, so an
+    over-limit batch is refused before the rest of its body is read. The middleware
+    charged the first file; files beyond the burst are free, as with check_limit's cost.
+
+    Returns:
+        int: 0 if allowed, otherwise the Retry-After in seconds
+    """
+    if file_number <= 1 or file_number > limit_classes()["batch"][1]:
+        return 0
+    return await check_limit(request, "batch")
+
+async def rate_limit_middleware(request, call_next):
+    """
+    HTTP middleware applying per-client token buckets, with separate limits for
+    chat, upload and read endpoints. Over-limit requests get 429 with Retry-After.
+    """
+    limit_class = classify_request(request.method, request.url.path) if settings.rate_limit_enabled else None
+    if limit_class is None:
+        return await call_next(request)
+    retry_after = await check_limit(request, limit_class)
+    if retry_after:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Too many requests. Please wait before trying again."},
+            headers={"Retry-After": str(retry_after)}
+        )
+    return await call_next(request)
+
+register_counters("rate_limited_requests", "Requests rejected with 429 by limit class", ["limit_class"], lambda: rejected_requests)
@@ -0,0 +1,32 @@
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+from config import request_id_var, job_id_var
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+@contextmanager
+def job_context(job_id: Optional[str]):
+    """Stamp log records inside the block with a background job id (e.g. an upload ID)."""
+    token = job_id_var.set(job_id)
+    try:
+        yield
+    finally:
+        job_id_var.reset(token)
+
+async def request_id_middleware(request, call_next):
+    """
+    HTTP middleware giving every request an id for its log records. A client-supplied
+    X-Request-ID is reused (so ids can be traced across services); it is echoed in the response.
+    """
+    request_id = (request.headers.get(REQUEST_ID_HEADER) or "")[:64] or new_request_id()
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers[REQUEST_ID_HEADER] = request_id
+    return response
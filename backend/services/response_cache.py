@@ -0,0 +1,105 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import FrozenSet, Optional, Tuple
+from config import logger, settings
+from llm.client import read_iot_prompt
+from services.metrics import record_cache_lookup, register_gauges
+
+# Words that do not change what a first request asks for
+STOPWORDS = frozenset("""
+a an the i im i'm me my we our you your it its this that these those is are be am was were
+need want looking look for find recommend suggest please can could would should will do does
+some any something to of in on at with and or but so just also good best suitable kind type
+hi hello hey thanks thank give show tell about which what
+""".split())
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+def normalize_prompt(text: str) -> Tuple[str, ...]:
+    """
+    Content words of a request in order: lower-cased, punctuation and stopwords removed.
+    Order and repeats are kept, so "pressure above temperature" and "temperature above
+    pressure" are different requests.
+    """
+    return tuple(word for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS)
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Share of distinct words two requests have in common."""
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+@lru_cache(maxsize=1)
+def prompt_version() -> str:
+    """Short hash of the chat instructions, so a changed iot_prompt.txt (after a restart) retires cached responses."""
+    return hashlib.sha256(read_iot_prompt().encode("utf-8")).hexdigest()[:12]
+
+class ChatResponseCache:
+    """
+    Responses to first chat turns, keyed by model, prompt version and the normalized
+    request. Entries expire after CHAT_CACHE_TTL_SECONDS; beyond CHAT_CACHE_MAX_ENTRIES
+    the least recently used go first. With CHAT_CACHE_SIMILARITY above 0, a request
+    without an exact match may reuse the response to the most similar cached request
+    (Jaccard similarity of their words) at or above that threshold.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[Tuple[str, str, Tuple[str, ...]], Tuple[str, float]]" = OrderedDict()
+
+    def get(self, model_name: str, user_input: str) -> Optional[str]:
+        """
+        Cached response for a first-turn request, or None.
+
+        Args:
+            model_name: Model the response must come from
+            user_input: The user's message
+        """
+        words = normalize_prompt(user_input)
+        if not words:
+            return None
+        version = prompt_version()
+        now = time.monotonic()
+        key = (model_name, version, words)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= now:
+            del self._entries[key]
+            entry = None
+        if entry is None and settings.chat_cache_similarity > 0:
+            key, entry = self._most_similar(model_name, version, words, now)
+        record_cache_lookup("chat_first_turn", entry is not None)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        logger.info("Answering first chat turn from cache (%s)", ' '.join(key[2]))
+        return entry[0]
+
+    def _most_similar(self, model_name, version, words, now):
+        best_key, best_entry, best_score = None, None, settings.chat_cache_similarity
+        word_set = frozenset(words)
+        for key, entry in self._entries.items():
+            if key[0] != model_name or key[1] != version or entry[1] <= now:
+                continue
+            score = jaccard(word_set, frozenset(key[2]))
+            if score >= best_score:
+                best_key, best_entry, best_score = key, entry, score
+        return best_key, best_entry
+
+    def put(self, model_name: str, user_input: str, response_text: str):
+        """Cache the response to a first-turn request."""
+        words = normalize_prompt(user_input)
+        if not words or not response_text:
+            return
+        key = (model_name, prompt_version(), words)
+        self._entries[key] = (response_text, time.monotonic() + settings.chat_cache_ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > settings.chat_cache_max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+chat_response_cache = ChatResponseCache()
+
+register_gauges("chat_response_cache_entries", "First-turn chat responses currently cached", [],
+                lambda: {(): len(chat_response_cache._entries)})
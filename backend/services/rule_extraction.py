@@ -0,0 +1,100 @@
+import re
+from typing import List, Dict, Any, Tuple
+from config import settings
+
+# Building blocks for the field patterns
+NUM = r"[-+−–]?\d+(?:[.,]\d+)?"
+RANGE_SEP = r"\s*(?:to|-|–|—|…|\.\.\.?|~)\s*"
+GAP = r"[^\n]{0,40}?"  # Label and value on the same line, at most 40 characters apart
+TEMP_UNIT = r"(?:(?:°|deg(?:rees?)?\.?)\s*)?C\b|℃"  # °C, deg C, degC, degrees C, plain C
+TEMP = rf"{NUM}\s*(?:{TEMP_UNIT}|°)?{RANGE_SEP}\+?{NUM}\s*(?:{TEMP_UNIT})"
+
+# (category, field, pattern, confidence). The value is the "value" group; where it
+# follows a label the match is trusted more than a bare value found anywhere.
+RULES: List[Tuple[str, str, str, float]] = [
+    ("electrical", "power_supply",
+     rf"(?:(?:supply|operating|input)\s+voltage(?:\s+range)?|\bV(?:DD|CC|S|IN)\b){GAP}(?P<value>{NUM}\s*V?{RANGE_SEP}{NUM}\s*V(?:DC|AC)?\b)", 0.9),
+    ("electrical", "power_supply",
+     rf"(?:supply|operating|input)\s+voltage{GAP}(?P<value>{NUM}\s*V(?:DC|AC)?\b)", 0.75),
+    ("electrical", "current_consumption",
+     rf"(?:(?:supply|operating|quiescent)\s+current|current\s+consumption|\bI(?:DD|CC|Q)\b){GAP}(?P<value>(?:{NUM}\s*(?:[µu]A|mA)?{RANGE_SEP})?{NUM}\s*(?:[µu]A|mA|A)\b)", 0.85),
+    ("environmental", "operating_temp",
+     rf"operating\s+(?:temperature|temp\.?)(?:\s+range)?{GAP}(?P<value>{TEMP})", 0.9),
+    ("environmental", "storage_temp",
+     rf"storage\s+(?:temperature|temp\.?)(?:\s+range)?{GAP}(?P<value>{TEMP})", 0.9),
+    ("environmental", "humidity_range",
+     rf"(?:operating\s+)?humidity{GAP}(?P<value>{NUM}{RANGE_SEP}{NUM}\s*%\s*RH)", 0.85),
+    # IEC 60529 codes (IP67, IPX7, IP6K9K); a following ".digit" means an address such as "IP 192.168.1.1"
+    ("environmental", "protection_rating",
+     r"(?P<value>\bIP\s?[0-6X]K?[0-9X]K?\b)(?![.,]\d)", 0.95),
+    ("mechanical", "dimensions",
+     rf"\b(?:dimensions?|size|package)\b{GAP}(?P<value>{NUM}\s*[x×]\s*{NUM}(?:\s*[x×]\s*{NUM})?\s*mm)", 0.9),
+    ("mechanical", "dimensions",
+     rf"(?P<value>\b\d+(?:[.,]\d+)?\s*[x×]\s*{NUM}(?:\s*[x×]\s*{NUM})?\s*mm)", 0.7),
+    ("mechanical", "weight",
+     rf"\bweight{GAP}(?P<value>{NUM}\s*(?:mg|g|kg)\b)", 0.85),
+]
+
+# Rules matching a bare value without a label in front (the pattern starts at the value)
+BARE_RULES = {i for i, (_, _, pattern, _) in enumerate(RULES) if pattern.startswith("(?P<value>")}
+# Whole words that confirm what a bare value is when they appear shortly before it
+CONTEXT_PATTERNS = {
+    "protection_rating": re.compile(
+        r"\b(?:protection|ingress|enclosures?|housings?|ratings?|sealed|waterproof|dust(?:proof)?)\b", re.IGNORECASE
+    ),
+    "dimensions": re.compile(r"\b(?:dimensions?|sizes?|packages?|outlines?)\b", re.IGNORECASE),
+}
+CONTEXT_WINDOW = 60  # Characters before a bare value searched for context words
+UNCONFIRMED_FACTOR = 0.8  # Share of its rule's confidence a bare value keeps without context words
+
+# All rules in one alternation so each text is scanned once; group r{i}/v{i} belong to RULES[i]
+RULE_PATTERN = re.compile(
+    "|".join(f"(?P<r{i}>{pattern.replace('(?P<value>', f'(?P<v{i}>')})" for i, (_, _, pattern, _) in enumerate(RULES)),
+    re.IGNORECASE
+)
+
+def extract_rule_fields(text: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Extract common specification fields with the compiled pattern library in one pass.
+
+    Args:
+        text: Page or chunk text
+
+    Returns:
+        dict: category -> field -> {"value", "confidence"}; for repeated fields the most confident match wins
+    """
+    found: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for match in RULE_PATTERN.finditer(text):
+        index = int(match.lastgroup[1:])
+        category, field, _, confidence = RULES[index]
+        value = " ".join(match.group(f"v{index}").split())
+        if index in BARE_RULES:
+            confidence = match_confidence(text, match.start(), field, confidence)
+        current = found.get(category, {}).get(field)
+        if current is None or confidence > current["confidence"]:
+            found.setdefault(category, {})[field] = {"value": value, "confidence": confidence}
+    return found
+
+def match_confidence(text: str, start: int, field: str, confidence: float) -> float:
+    """
+    Confidence of one bare-value match: the rule's confidence if a context word for the field
+    precedes it on the same line (within CONTEXT_WINDOW characters), else scaled by UNCONFIRMED_FACTOR.
+    """
+    context = CONTEXT_PATTERNS.get(field)
+    if context is None:
+        return confidence
+    line_start = text.rfind("\n", 0, start) + 1
+    if context.search(text, max(line_start, start - CONTEXT_WINDOW), start):
+        return confidence
+    return round(confidence * UNCONFIRMED_FACTOR, 3)
+
+def confident_fields(found: Dict[str, Dict[str, Dict[str, Any]]], min_confidence: float = None) -> Dict[str, Dict[str, str]]:
+    """Values of the fields at or above RULE_MIN_CONFIDENCE, shaped like extraction specifications."""
+    if min_confidence is None:
+        min_confidence = settings.rule_min_confidence
+    specifications: Dict[str, Dict[str, str]] = {}
+    for category, fields in found.items():
+        for field, match in fields.items():
+            if match["confidence"] >= min_confidence:
+                specifications.setdefault(category, {})[field] = match["value"]
+    return specifications
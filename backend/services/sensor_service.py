@@ -1,24 +1,23 @@
+from typing import List, Optional
 from database.mongodb import get_database
+from models.sensor import SensorRecord
 from config import logger
 
-async def get_all_sensors():
+async def get_all_sensors() -> List[SensorRecord]:
     """
     Get all sensors from the database.
     
     Returns:
-        list: List of sensors with basic information
+        list: SensorRecord per stored sensor
     """
     db = await get_database()
-    sensors = await db.sensor_specifications.find({}).to_list(length=100)  # Limit to 100 sensors
+    documents = await db.sensor_specifications.find({}).to_list(length=100)  # Limit to 100 sensors
+    sensors = [SensorRecord.from_mongo(document) for document in documents]
     
-    # Convert MongoDB ObjectId to string
-    for sensor in sensors:
-        sensor["_id"] = str(sensor["_id"])
-    
-    logger.info(f"Retrieved {len(sensors)} sensors from database")
+    logger.info("Retrieved %s sensors from database", len(sensors))
     return sensors
 
-async def get_sensor_by_model(model: str):
+async def get_sensor_by_model(model: str) -> Optional[SensorRecord]:
     """
     Get sensor details by model.
     
@@ -26,17 +25,15 @@ async def get_sensor_by_model(model: str):
         model: The sensor model to retrieve
         
     Returns:
-        dict: Sensor details or None if not found
+        SensorRecord: Sensor details or None if not found
     """
     db = await get_database()
-    sensor = await db.sensor_specifications.find_one({"model": model})
+    sensor = SensorRecord.from_mongo(await db.sensor_specifications.find_one({"model": model}))
     
     if sensor:
-        # Convert MongoDB ObjectId to string
-        sensor["_id"] = str(sensor["_id"])
-        logger.info(f"Retrieved sensor details for model {model}")
+        logger.info("Retrieved sensor details for model %s", model)
     else:
-        logger.warning(f"Sensor with model {model} not found")
+        logger.warning("Sensor with model %s not found", model)
     
     return sensor
 
@@ -70,5 +67,5 @@ async def debug_mongodb_connection():
             "sample_document": sample
         }
     except Exception as e:
-        logger.error(f"MongoDB connection test failed: {str(e)}")
+        logger.error("MongoDB connection test failed: %s", e)
         return {"status": "error", "message": str(e)}
@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict
+from config import logger
+from services.metrics import register_counters, register_gauges
+
+# Every SingleFlight instance, for metrics
+instances = []
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical work: while a call for a key is in flight,
+    further callers with the same key await the same result instead of
+    starting their own. The work runs as a separate task, so a caller that
+    disconnects (is cancelled) does not cancel it for the others; when the
+    last waiting caller is cancelled, the work is cancelled too, as nobody
+    would receive its result.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}  # Callers still awaiting each in-flight call
+        self.executed = 0
+        self.shared = 0
+        self.abandoned = 0
+        instances.append(self)
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run call() for key, or join the in-flight call for the same key.
+
+        Args:
+            key: Identity of the work (e.g. a content hash)
+            call: Zero-argument function returning the awaitable to run
+
+        Returns:
+            The result of the (possibly shared) call
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+            self.executed += 1
+        else:
+            self.shared += 1
+            logger.info("%s: joining in-flight call for key %.12s", self.name, key)
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                self.abandoned += 1
+                logger.info("%s: last caller left, cancelling call for key %.12s", self.name, key)
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def stats(self) -> Dict[str, Any]:
+        """Executed vs. shared call counts for status endpoints."""
+        total = self.executed + self.shared
+        return {
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "shared": self.shared,
+            "abandoned": self.abandoned,
+            "share_rate": round(self.shared / total, 4) if total else 0.0
+        }
+
+register_counters(
+    "single_flight_calls",
+    "Coalesced calls by group and result (executed, shared with an in-flight call, or abandoned by all callers)",
+    ["name", "result"],
+    lambda: {(sf.name, result): count for sf in instances
+             for result, count in (("executed", sf.executed), ("shared", sf.shared), ("abandoned", sf.abandoned))}
+)
+register_gauges("single_flight_in_flight", "Calls currently in flight per group", ["name"],
+                lambda: {sf.name: len(sf._calls) for sf in instances})
+
+def hash_key(*parts: Any) -> str:
+    """Build a single-flight key from strings or bytes."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
@@ -0,0 +1,258 @@
+import re
+from typing import List, Dict, Any, Optional, Tuple
+from pypdf import PdfReader
+from config import logger
+
+# Header words naming the columns of an electrical-characteristics style table
+HEADER_COLUMNS = {
+    "parameter": re.compile(r"^(?:parameters?|characteristics?|description|item)$", re.IGNORECASE),
+    "symbol": re.compile(r"^(?:symbol|sym\.?)$", re.IGNORECASE),
+    "conditions": re.compile(r"^(?:(?:test\s+)?conditions?|notes?|comments?)$", re.IGNORECASE),
+    "min": re.compile(r"^min(?:imum|\.)?$", re.IGNORECASE),
+    "typ": re.compile(r"^typ(?:ical|\.)?$", re.IGNORECASE),
+    "max": re.compile(r"^max(?:imum|\.)?$", re.IGNORECASE),
+    "unit": re.compile(r"^units?$", re.IGNORECASE),
+}
+VALUE_COLUMNS = ("min", "typ", "max")
+
+# Cells are separated by two or more spaces in pypdf's layout-mode text
+CELL_PATTERN = re.compile(r"\S+(?: \S+)*")
+NUMERIC_CELL = re.compile(r"^[-+±~≤≥<>]?\s?\d+(?:[.,]\d+)?(?:\s?[eE][-+]?\d+)?(?:\s*\S{0,6})?$")
+TRAILING_UNIT = re.compile(r"^(?P<value>[-+±~≤≥<>]?\s?\d+(?:[.,]\d+)?)\s*(?P<unit>[^\d\s]{1,6})$")
+
+# Parameter name patterns mapped to (category, field) in the specifications schema; first match wins
+TABLE_FIELD_PATTERNS: List[Tuple[re.Pattern, str, str]] = [
+    (re.compile(p, re.IGNORECASE), category, field) for p, category, field in [
+        (r"supply\s+voltage|operating\s+voltage|\bv(?:dd|cc|s)\b|input\s+voltage", "electrical", "power_supply"),
+        (r"standby|sleep|shutdown|power[- ]down", "electrical", "standby_current"),
+        (r"supply\s+current|current\s+consumption|operating\s+current|quiescent\s+current|\bi(?:dd|cc|q)\b", "electrical", "current_consumption"),
+        (r"output\s+(?:voltage|current|signal|type)", "electrical", "output_type"),
+        (r"power\s+(?:consumption|dissipation)", "electrical", "power_consumption"),
+        (r"storage\s+temp", "environmental", "storage_temp"),
+        (r"operating\s+temp|ambient\s+temp|temperature\s+range", "environmental", "operating_temp"),
+        (r"humidity", "environmental", "humidity_range"),
+        (r"accuracy|error", "performance", "accuracy"),
+        (r"resolution", "performance", "resolution"),
+        (r"sensitivity", "performance", "sensitivity"),
+        (r"response\s+time|settling\s+time|rise\s+time", "performance", "response_time"),
+        (r"(?:measurement|measuring|sensing|detection|full[- ]scale|input)\s+range|^range$", "performance", "range"),
+        (r"sampl\w*\s+rate|output\s+data\s+rate|bandwidth|frequency", "performance", "sample_rate"),
+        (r"hysteresis", "performance", "hysteresis"),
+        (r"drift|stability", "performance", "long_term_stability"),
+        (r"start[- ]?up\s+time|power[- ]on\s+time", "performance", "startup_time"),
+        (r"weight|mass", "mechanical", "weight"),
+        (r"length|width|height|dimensions?|thickness", "mechanical", "dimensions"),
+    ]
+]
+
+def read_layout_pages(pdf_path: str) -> List[str]:
+    """
+    Read every page of a PDF as layout-preserving text (columns kept apart by spaces).
+
+    Args:
+        pdf_path: Path of the PDF on disk
+
+    Returns:
+        List of page texts in document order ("" for pages that fail to render)
+    """
+    reader = PdfReader(pdf_path)
+    pages = []
+    for i, page in enumerate(reader.pages):
+        try:
+            pages.append(page.extract_text(extraction_mode="layout"))
+        except Exception as e:
+            logger.warning("Layout extraction failed for page %s of %s: %s", i+1, pdf_path, e)
+            pages.append("")
+    return pages
+
+def split_cells(line: str) -> List[Tuple[int, int, str]]:
+    """Cells of a layout line as (start, end, text); single spaces stay inside a cell."""
+    return [(match.start(), match.end(), match.group(0)) for match in CELL_PATTERN.finditer(line)]
+
+def match_header(line: str) -> Optional[Dict[str, Tuple[int, int]]]:
+    """
+    Column spans of a table header line, or None if the line is not one.
+    A header needs at least two of min/typ/max.
+    """
+    columns = {}
+    for start, end, text in split_cells(line):
+        for word_match in re.finditer(r"\S+", text):
+            word = word_match.group(0).strip("().:")
+            for name, pattern in HEADER_COLUMNS.items():
+                if name not in columns and pattern.match(word):
+                    columns[name] = (start + word_match.start(), start + word_match.end())
+                    break
+    if sum(1 for name in VALUE_COLUMNS if name in columns) < 2:
+        return None
+    return columns
+
+def assign_cells(cells: List[Tuple[int, int, str]], columns: Dict[str, Tuple[int, int]]) -> Dict[str, str]:
+    """
+    Assign the cells of a row to header columns by horizontal position.
+
+    Layout text only approximates glyph widths, so columns drift by a few characters
+    from line to line. The first cell left of the other columns is the parameter name;
+    the rest are matched to columns in left-to-right order, minimising the total
+    distance between cell and column centres.
+    """
+    ordered = [(name, (span[0] + span[1]) / 2) for name, span in sorted(columns.items(), key=lambda item: item[1][0])
+               if name != "parameter"]
+    row: Dict[str, str] = {}
+    if cells and ordered and cells[0][0] < min(columns[name][0] for name, _ in ordered):
+        row["parameter"] = cells[0][2]
+        cells = cells[1:]
+    if not cells:
+        return row
+    if len(cells) > len(ordered):
+        # More cells than columns: fall back to the nearest column per cell
+        for start, end, text in cells:
+            name = min(ordered, key=lambda item: abs(item[1] - (start + end) / 2))[0]
+            row[name] = f"{row[name]} {text}" if name in row else text
+        return row
+
+    # cost[i][j]: best total distance placing the first i cells in the first j columns
+    n, m = len(cells), len(ordered)
+    inf = float("inf")
+    cost = [[inf] * (m + 1) for _ in range(n + 1)]
+    cost[0] = [0.0] * (m + 1)
+    for i in range(1, n + 1):
+        center = (cells[i - 1][0] + cells[i - 1][1]) / 2
+        for j in range(i, m + 1):
+            cost[i][j] = min(cost[i][j - 1], cost[i - 1][j - 1] + abs(ordered[j - 1][1] - center))
+    # Walk back to recover which column each cell went to
+    j = m
+    for i in range(n, 0, -1):
+        while j > i and cost[i][j] == cost[i][j - 1]:
+            j -= 1
+        row[ordered[j - 1][0]] = cells[i - 1][2]
+        j -= 1
+    return row
+
+def format_value(row: Dict[str, str]) -> Optional[str]:
+    """Combine min/typ/max and unit cells into one value string such as "2.7 to 5.5 V (typ 3.3 V)"."""
+    unit = row.get("unit", "").strip()
+    values = {}
+    for name in VALUE_COLUMNS:
+        cell = row.get(name, "").strip()
+        if not cell or cell in ("-", "–", "—"):
+            continue
+        if not NUMERIC_CELL.match(cell):
+            return None
+        trailing = TRAILING_UNIT.match(cell)
+        if trailing and not unit:
+            unit = trailing.group("unit")
+        values[name] = trailing.group("value") if trailing else cell
+    if not values:
+        return None
+    suffix = f" {unit}" if unit else ""
+    if "min" in values and "max" in values:
+        text = f"{values['min']} to {values['max']}{suffix}"
+        if "typ" in values:
+            text += f" (typ {values['typ']}{suffix})"
+        return text
+    parts = [f"{name} {values[name]}{suffix}" if name != "typ" or len(values) > 1 else f"{values[name]}{suffix}"
+             for name in VALUE_COLUMNS if name in values]
+    return ", ".join(parts)
+
+def map_parameter(parameter: str) -> Optional[Tuple[str, str]]:
+    """Specification (category, field) for a table parameter name, or None if it is not a known field."""
+    for pattern, category, field in TABLE_FIELD_PATTERNS:
+        if pattern.search(parameter):
+            return category, field
+    return None
+
+def parse_layout_tables(text: str) -> List[Dict[str, str]]:
+    """
+    Find min/typ/max tables in a layout-mode page and return their data rows.
+
+    Args:
+        text: Page text from read_layout_pages
+
+    Returns:
+        List of rows with parameter, value and (if present) symbol and conditions
+    """
+    rows = []
+    columns = None
+    pending_name = None  # Parameter name on a line of its own (wrapped, or heading indented sub-rows)
+    misses = 0  # Consecutive lines without values; three end the table
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        header = match_header(line)
+        if header:
+            columns, pending_name, misses = header, None, 0
+            continue
+        if columns is None:
+            continue
+        row = assign_cells(split_cells(line), columns)
+        value = format_value(row)
+        misses = 0 if value is not None else misses + 1
+        if misses >= 3:
+            columns, pending_name = None, None
+            continue
+        if value is None:
+            if row.keys() <= {"parameter", "symbol", "conditions"} and row.get("parameter"):
+                pending_name = row["parameter"]
+            continue
+        parameter = row.get("parameter")
+        indent = len(line) - len(line.lstrip())
+        if parameter and pending_name and indent > columns.get("parameter", (0, 0))[0]:
+            parameter = f"{pending_name} {parameter}"  # Indented sub-row, e.g. "Supply current" / "  sleep mode"
+        elif parameter:
+            pending_name = None
+        else:
+            parameter = pending_name
+        if not parameter:
+            continue
+        rows.append({
+            "parameter": parameter,
+            "value": value,
+            **{key: row[key] for key in ("symbol", "conditions") if row.get(key)}
+        })
+    return rows
+
+def table_extraction_from_rows(rows: List[Dict[str, str]]) -> Dict[str, Any]:
+    """
+    Map table rows into the extraction result shape. Known parameters go into
+    specifications, the rest into extra_fields; the first row for a field wins.
+
+    Returns:
+        dict: specifications, extra_fields and the number of mapped fields
+    """
+    specifications: Dict[str, Dict[str, str]] = {}
+    extra_fields: Dict[str, str] = {}
+    for row in rows:
+        target = map_parameter(row["parameter"])
+        value = row["value"]
+        if row.get("conditions"):
+            value = f"{value} ({row['conditions']})"
+        if target:
+            category, field = target
+            specifications.setdefault(category, {}).setdefault(field, value)
+        else:
+            key = re.sub(r"[^a-z0-9]+", "_", row["parameter"].lower()).strip("_")
+            if key:
+                extra_fields.setdefault(key, value)
+    return {
+        "specifications": specifications,
+        "extra_fields": extra_fields,
+        "fields": sum(len(values) for values in specifications.values())
+    }
+
+def extract_page_tables(pdf_path: str) -> List[Dict[str, Any]]:
+    """
+    Parse specification tables on every page of a PDF without calling the LLM.
+
+    Args:
+        pdf_path: Path of the PDF on disk
+
+    Returns:
+        Per page (document order): specifications, extra_fields and fields (count of mapped spec fields)
+    """
+    results = []
+    for text in read_layout_pages(pdf_path):
+        results.append(table_extraction_from_rows(parse_layout_tables(text)) if text else
+                       {"specifications": {}, "extra_fields": {}, "fields": 0})
+    resolved = [i + 1 for i, result in enumerate(results) if result["fields"]]
+    logger.info("Table parser mapped fields on pages %s of %s in %s", resolved, len(results), pdf_path)
+    return results
@@ -0,0 +1,48 @@
+import asyncio
+import time
+from typing import Dict, Any
+
+class TokenBucket:
+    """
+    Token bucket rate limiter: holds up to `capacity` tokens and refills at
+    `rate` tokens per second. Not thread-safe; meant for a single event loop.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        Take tokens if available.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise seconds until they will be available
+        """
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (tokens - self.tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1):
+        """Wait until tokens are available, then take them."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current bucket state for status endpoints."""
+        self._refill()
+        return {"rate": self.rate, "capacity": self.capacity, "available": round(self.tokens, 2)}
@@ -0,0 +1,213 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from pymongo import UpdateOne
+from config import logger, settings
+from database.mongodb import get_database
+from services.metrics import register_counters, register_gauges
+
+# Conversation state fields saved with each transcript (the throttle timestamp is not worth keeping)
+PERSISTED_STATE_FIELDS = ("step", "last_user_input", "last_sensor")
+
+class TranscriptWriter:
+    """
+    Write-behind persistence of chat transcripts to the chat_transcripts collection.
+
+    Chat turns only append to an in-memory buffer. A background task writes the
+    buffer with one bulk_write every TRANSCRIPT_FLUSH_INTERVAL_SECONDS, or as soon
+    as TRANSCRIPT_FLUSH_MAX_MESSAGES messages are pending, and close() drains it on
+    shutdown. Each flush issues one upsert per conversation, pushing its new
+    messages and setting its current state. If a flush fails, the messages go back
+    to the front of the buffer and are retried; beyond TRANSCRIPT_MAX_PENDING the
+    oldest are dropped.
+    """
+
+    def __init__(self):
+        # conversation_id -> {"session_id", "state", "messages", "created_at"}, in arrival order
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pending_messages = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _entry(self, conversation_id: str, session_id: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        entry = self._pending.get(conversation_id)
+        if entry is None:
+            # created_at only applies if this write creates the document; it is taken now rather than at
+            # flush time, so a conversation started later in the same batch still sorts as the latest
+            entry = self._pending[conversation_id] = {
+                "session_id": session_id, "state": state, "messages": [], "created_at": datetime.now()
+            }
+        return entry
+
+    def start_conversation(self, conversation_id: str, session_id: str, state: Dict[str, Any]):
+        """Record a new (empty) conversation, so rehydration after a restart finds it rather than the previous one."""
+        if not settings.transcript_persistence:
+            return
+        self._entry(conversation_id, session_id, state)
+        self._ensure_started()
+
+    def append(self, conversation_id: str, session_id: str, state: Dict[str, Any], message: Dict[str, Any]):
+        """
+        Queue one transcript message; the conversation's state is saved with it.
+
+        Args:
+            conversation_id: Conversation the message belongs to
+            session_id: Client session of the conversation
+            state: Live conversation state, read at flush time
+            message: {"role", "content"}
+        """
+        if not settings.transcript_persistence:
+            return
+        self._entry(conversation_id, session_id, state)["messages"].append({**message, "ts": datetime.now()})
+        self._pending_messages += 1
+        self._ensure_started()
+        if self._pending_messages > settings.transcript_max_pending:
+            self._drop_oldest()
+        if self._pending_messages >= settings.transcript_flush_max_messages:
+            self._wakeup.set()
+
+    def touch(self, conversation_id: str, session_id: str, state: Dict[str, Any]):
+        """Queue a state-only update (e.g. a step change) for a conversation."""
+        if not settings.transcript_persistence:
+            return
+        self._entry(conversation_id, session_id, state)
+        self._ensure_started()
+
+    def has_pending(self, session_id: str) -> bool:
+        """Whether writes for a session are still buffered."""
+        return any(entry["session_id"] == session_id for entry in self._pending.values())
+
+    def _drop_oldest(self):
+        for entry in self._pending.values():
+            if entry["messages"]:
+                entry["messages"].pop(0)
+                self._pending_messages -= 1
+                self.dropped += 1
+                logger.warning("Transcript buffer full (%s messages); dropped the oldest message", settings.transcript_max_pending)
+                return
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.transcript_flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Write everything buffered with one bulk_write.
+
+        Returns:
+            int: Number of messages written (0 if the buffer was empty or the write failed)
+        """
+        if not self._pending:
+            return 0
+        async with self._flush_lock:
+            # A flush that held the lock meanwhile may have written everything
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, OrderedDict()
+            messages = self._pending_messages
+            self._pending_messages = 0
+            now = datetime.now()
+            operations = []
+            for conversation_id, entry in batch.items():
+                update: Dict[str, Any] = {
+                    "$set": {"updated_at": now, **{field: entry["state"].get(field) for field in PERSISTED_STATE_FIELDS}},
+                    "$setOnInsert": {"session_id": entry["session_id"], "created_at": entry["created_at"]}
+                }
+                if entry["messages"]:
+                    update["$push"] = {"messages": {"$each": entry["messages"]}}
+                operations.append(UpdateOne({"conversation_id": conversation_id}, update, upsert=True))
+            started = time.perf_counter()
+            try:
+                db = await get_database()
+                await db.chat_transcripts.bulk_write(operations, ordered=False)
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.warning("Transcript flush of %s messages failed, will retry: %s", messages, e)
+                self._requeue(batch, messages)
+                return 0
+            except BaseException:
+                # Cancelled mid-write: keep the batch for the next flush rather than losing it
+                self._requeue(batch, messages)
+                raise
+            self.written += messages
+            logger.debug("Flushed %d transcript messages in %d conversations in %.1f ms",
+                         messages, len(operations), (time.perf_counter() - started) * 1000)
+            return messages
+
+    def _requeue(self, batch: "OrderedDict[str, Dict[str, Any]]", messages: int):
+        # Failed messages go before anything queued since, keeping each conversation in order
+        for conversation_id, entry in self._pending.items():
+            if conversation_id in batch:
+                batch[conversation_id]["messages"].extend(entry["messages"])
+            else:
+                batch[conversation_id] = entry
+        self._pending = batch
+        self._pending_messages += messages
+        while self._pending_messages > settings.transcript_max_pending:
+            self._drop_oldest()
+
+    async def close(self):
+        """Stop the background task and write what is left (called on shutdown)."""
+        if self._task is not None:
+            # Let the task finish the flush it may be in instead of cancelling it mid-write
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        if self._pending:
+            await self.flush()
+
+transcript_writer = TranscriptWriter()
+
+async def load_latest_transcript(session_id: str) -> Optional[Dict[str, Any]]:
+    """
+    The most recent conversation stored for a session, or None.
+
+    Returns:
+        dict: conversation_id, messages ({"role", "content"}) and the persisted state fields
+    """
+    if transcript_writer.has_pending(session_id):
+        # Write buffered turns first so the stored transcript is complete
+        await transcript_writer.flush()
+    db = await get_database()
+    document = await db.chat_transcripts.find_one({"session_id": session_id}, sort=[("created_at", -1)])
+    if document is None:
+        return None
+    return {
+        "conversation_id": document["conversation_id"],
+        "messages": [{"role": m["role"], "content": m["content"]} for m in document.get("messages", [])],
+        **{field: document.get(field) for field in PERSISTED_STATE_FIELDS}
+    }
+
+def get_transcript_stats() -> Dict[str, int]:
+    """Counters for status endpoints."""
+    return {
+        "pending_messages": transcript_writer._pending_messages,
+        "written": transcript_writer.written,
+        "dropped": transcript_writer.dropped,
+        "failed_flushes": transcript_writer.failed_flushes
+    }
+
+register_counters("transcript_messages", "Chat transcript messages by result (written, dropped)", ["result"],
+                  lambda: {"written": transcript_writer.written, "dropped": transcript_writer.dropped})
+register_gauges("transcript_pending_messages", "Chat transcript messages waiting to be written", [],
+                lambda: {(): transcript_writer._pending_messages})
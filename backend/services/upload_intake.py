@@ -0,0 +1,258 @@
+import os
+import hashlib
+import tempfile
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from python_multipart.multipart import MultipartParser, parse_options_header
+from config import logger, settings
+from services.metrics import register_gauges
+
+class UploadTooLargeError(Exception):
+    """The upload exceeds PDF_MAX_UPLOAD_BYTES."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        super().__init__(f"Upload exceeds the maximum size of {limit} bytes")
+
+class UploadCapacityError(Exception):
+    """Accepting the upload would exceed UPLOAD_MAX_INFLIGHT_BYTES; the client should retry later."""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Too many bytes in flight, retry after {retry_after:.0f}s")
+
+class InFlightBytes:
+    """
+    Process-wide count of upload bytes currently being received or processed.
+    Reservations grow chunk by chunk and are released when the upload finishes.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+
+    def reserve(self, amount: int):
+        """Reserve bytes or raise UploadCapacityError if the cap would be exceeded."""
+        if self.limit and self.in_flight + amount > self.limit:
+            self.rejected += 1
+            raise UploadCapacityError(settings.upload_retry_after_seconds)
+        self.in_flight += amount
+
+    def release(self, amount: int):
+        self.in_flight = max(0, self.in_flight - amount)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"in_flight_bytes": self.in_flight, "limit_bytes": self.limit, "rejected": self.rejected}
+
+upload_bytes_in_flight = InFlightBytes(settings.upload_max_inflight_bytes)
+register_gauges("pdf_upload_intake", "Upload bytes in flight, the cap, and uploads rejected at the cap", ["measure"],
+                upload_bytes_in_flight.snapshot)
+
+# Largest accepted non-file form field (model name, flags, session id)
+MAX_FIELD_BYTES = 64 * 1024
+# Allowance for multipart boundaries, part headers and form fields on top of the file bytes
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+class InvalidUploadError(Exception):
+    """The request is not a well-formed upload (wrong content type, field too large, too many files, ...)."""
+
+class SpooledFile:
+    """
+    An uploaded file written to a temporary file while it was received.
+
+    Holders share it by reference count: the request that received it holds one
+    reference, and work that outlives the request (e.g. a shared pipeline run)
+    takes another with retain(). The file is deleted and its bytes leave the
+    in-flight count when the last holder calls release().
+    """
+
+    def __init__(self, filename: str, path: Optional[str], size: int, sha256: Optional[str], error: Optional[str] = None):
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.error = error  # Set for files that were rejected instead of spooled
+        self.refs = 1
+
+    def retain(self) -> "SpooledFile":
+        self.refs += 1
+        return self
+
+    def release(self):
+        self.refs -= 1
+        if self.refs > 0:
+            return
+        upload_bytes_in_flight.release(self.size)
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except OSError as e:
+                logger.error("Error removing temporary file %s: %s", self.path, e)
+
+def check_content_length(request, max_files: int = 1):
+    """
+    Reject a request whose declared Content-Length already exceeds what max_files files
+    may add up to, before reading any of it.
+
+    Raises:
+        UploadTooLargeError: If the declared body is too large
+    """
+    content_length = request.headers.get("content-length")
+    limit = settings.pdf_max_upload_bytes * max_files + MULTIPART_OVERHEAD_BYTES * max_files
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise UploadTooLargeError(settings.pdf_max_upload_bytes)
+
+class _MultipartReceiver:
+    """Callbacks for python-multipart's streaming parser: files go straight to disk, fields to memory."""
+
+    def __init__(self, file_field: str, max_files: int, pdf_only: bool):
+        self.file_field = file_field
+        self.max_files = max_files
+        self.pdf_only = pdf_only
+        self.fields: Dict[str, str] = {}
+        self.files: List[SpooledFile] = []
+        self.file_parts = 0  # Parts of file_field begun so far, including rejected ones
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._part: Optional[Dict[str, Any]] = None
+
+    def callbacks(self) -> Dict[str, Any]:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": lambda data, start, end: self._append_header("_header_field", data[start:end]),
+            "on_header_value": lambda data, start, end: self._append_header("_header_value", data[start:end]),
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def _append_header(self, name: str, data: bytes):
+        setattr(self, name, getattr(self, name) + data)
+
+    def on_part_begin(self):
+        self._headers = {}
+        self._part = None
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field, self._header_value = b"", b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if filename is None:
+            self._part = {"kind": "field", "name": name, "data": bytearray()}
+            return
+        filename = os.path.basename(filename.decode("utf-8", "replace"))
+        if name != self.file_field:
+            self._part = {"kind": "skip"}
+            return
+        self.file_parts += 1
+        if len(self.files) >= self.max_files:
+            raise InvalidUploadError(f"Too many files. At most {self.max_files} can be uploaded at once.")
+        if not filename.lower().endswith(".pdf"):
+            if self.pdf_only:
+                raise InvalidUploadError("Invalid file type. Only PDF files are allowed.")
+            # Reported per file by the caller; its bytes are not kept
+            self.files.append(SpooledFile(filename, None, 0, None, "Invalid file type. Only PDF files are allowed."))
+            self._part = {"kind": "skip"}
+            return
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf", buffering=settings.upload_chunk_bytes)
+        self._part = {"kind": "file", "filename": filename, "handle": temp_file, "size": 0, "digest": hashlib.sha256()}
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        part = self._part
+        if part is None or part["kind"] == "skip":
+            return
+        chunk = data[start:end]
+        if part["kind"] == "field":
+            if len(part["data"]) + len(chunk) > MAX_FIELD_BYTES:
+                raise InvalidUploadError(f"Form field '{part['name']}' is too large.")
+            part["data"] += chunk
+            return
+        if part["size"] + len(chunk) > settings.pdf_max_upload_bytes:
+            raise UploadTooLargeError(settings.pdf_max_upload_bytes)
+        upload_bytes_in_flight.reserve(len(chunk))
+        part["size"] += len(chunk)
+        part["digest"].update(chunk)
+        part["handle"].write(chunk)
+
+    def on_part_end(self):
+        part, self._part = self._part, None
+        if part is None or part["kind"] == "skip":
+            return
+        if part["kind"] == "field":
+            self.fields[part["name"]] = part["data"].decode("utf-8", "replace")
+            return
+        part["handle"].close()
+        self.files.append(SpooledFile(part["filename"], part["handle"].name, part["size"], part["digest"].hexdigest()))
+        logger.debug("Spooled upload %s: %d bytes to %s", part["filename"], part["size"], part["handle"].name)
+
+    def abort(self):
+        """Release everything received so far, including a partly written file."""
+        part = self._part
+        if part is not None and part["kind"] == "file":
+            part["handle"].close()
+            upload_bytes_in_flight.release(part["size"])
+            try:
+                os.unlink(part["handle"].name)
+            except OSError:
+                pass
+        for spooled in self.files:
+            spooled.release()
+
+@asynccontextmanager
+async def receive_upload(request, file_field: str = "file", max_files: int = 1, pdf_only: bool = True,
+                         on_file: Optional[Callable[[int], Awaitable[None]]] = None):
+    """
+    Receive a multipart/form-data upload from the request body as it arrives.
+
+    File parts are written straight to temporary files and hashed as they stream in,
+    and the size and in-flight caps are checked on every chunk, so an oversized
+    upload or a full server stops reading the body at once instead of after it was
+    buffered. Memory use stays at one network chunk per upload. The files are
+    released (see SpooledFile) when the block exits.
+
+    Args:
+        request: Incoming request
+        file_field: Name of the form field carrying the file(s)
+        max_files: Most files accepted in file_field
+        pdf_only: Reject the request on a non-PDF file; otherwise the file is listed with an error
+        on_file: Awaited with the file's number (from 1) when each file part begins, before the
+            next network chunk is read; it may raise to stop the upload
+
+    Yields:
+        tuple: (fields, files) with the form fields as strings and the SpooledFiles in upload order
+
+    Raises:
+        InvalidUploadError: If the request is not an acceptable multipart upload
+        UploadTooLargeError: If a file exceeds PDF_MAX_UPLOAD_BYTES
+        UploadCapacityError: If the in-flight byte cap is reached
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise InvalidUploadError("Expected a multipart/form-data upload.")
+    check_content_length(request, max_files)
+    receiver = _MultipartReceiver(file_field, max_files, pdf_only)
+    parser = MultipartParser(options[b"boundary"], receiver.callbacks())
+    try:
+        notified = 0
+        async for chunk in request.stream():
+            parser.write(chunk)
+            while on_file is not None and notified < receiver.file_parts:
+                notified += 1
+                await on_file(notified)
+        parser.finalize()
+    except Exception:
+        receiver.abort()
+        raise
+    files = receiver.files
+    try:
+        yield receiver.fields, files
+    finally:
+        for spooled in files:
+            spooled.release()
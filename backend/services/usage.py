@@ -0,0 +1,299 @@
+import time
+import asyncio
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from langchain_core.callbacks import AsyncCallbackHandler
+from config import logger, settings
+from database.mongodb import get_database
+from services.metrics import record_llm_usage
+
+# USD per million (prompt, completion) tokens; models not listed use DEFAULT_PRICE
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "meta-llama/llama-3.1-8b-instruct": (0.02, 0.03),
+    "meta-llama/llama-3.3-70b-instruct": (0.12, 0.30),
+    "mistralai/mistral-7b-instruct": (0.03, 0.055),
+    "openai/gpt-4o-mini": (0.15, 0.60),
+    "openai/gpt-4o": (2.50, 10.00),
+    "google/gemini-2.0-flash-001": (0.10, 0.40),
+    "anthropic/claude-3.5-haiku": (0.80, 4.00),
+    "deepseek/deepseek-chat": (0.38, 0.89),
+}
+DEFAULT_PRICE = (1.00, 3.00)  # Deliberately high so unknown models are not under-counted
+
+# Session and upload the current LLM calls are billed to; set per request/upload with usage_scope()
+_usage_scope: contextvars.ContextVar[Dict[str, Optional[str]]] = contextvars.ContextVar(
+    "usage_scope", default={"session_id": None, "upload_id": None}
+)
+
+# Active collectors, innermost last: (upload ID or None for any, per-model increments) (see collect_usage)
+_usage_collectors: contextvars.ContextVar[Tuple[Tuple[Optional[str], Dict[str, Dict[str, float]]], ...]] = \
+    contextvars.ContextVar("usage_collectors", default=())
+
+# Running totals per scope in this process, for run summaries (bounded, least recently used dropped first)
+MAX_TRACKED_SCOPES = 10000
+_scope_totals: "OrderedDict[Tuple[str, str], Dict[str, float]]" = OrderedDict()
+
+# Stored total_tokens per scope for budget checks: (scope, key) -> [expires_at, total_tokens]. Usage
+# recorded by this process is added on top until the entry expires and is read again.
+_budget_totals: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+
+# Pending Mongo writes, kept referenced until they finish
+_pending_writes = set()
+
+class BudgetExceededError(Exception):
+    """Raised before an LLM call when the current session or upload has used up its token budget."""
+
+    def __init__(self, scope: str, key: str, used: int, budget: int):
+        self.scope = scope
+        self.key = key
+        self.used = used
+        self.budget = budget
+        super().__init__(f"Token budget exceeded for {scope} {key}: {used} of {budget} tokens used")
+
+@contextmanager
+def usage_scope(session_id: Optional[str] = None, upload_id: Optional[str] = None):
+    """
+    Attribute LLM usage inside the block to a session and/or upload.
+    Unset fields are inherited from the enclosing scope.
+    """
+    current = _usage_scope.get()
+    token = _usage_scope.set({
+        "session_id": session_id if session_id is not None else current["session_id"],
+        "upload_id": upload_id if upload_id is not None else current["upload_id"]
+    })
+    try:
+        yield
+    finally:
+        _usage_scope.reset(token)
+
+@contextmanager
+def collect_usage(upload_id: Optional[str] = None):
+    """
+    Collect the usage billed inside the block, per model, so it can also be billed to the
+    other callers of a shared run (bill_usage, bill_shared_usage). With upload_id, usage of
+    other uploads started inside the block (shadow runs) is not collected. Collectors nest.
+
+    Yields:
+        dict: model name -> accumulated increments, filled in as calls complete
+    """
+    collected: Dict[str, Dict[str, float]] = {}
+    token = _usage_collectors.set(_usage_collectors.get() + ((upload_id, collected),))
+    try:
+        yield collected
+    finally:
+        _usage_collectors.reset(token)
+
+def get_usage_scope() -> Dict[str, Optional[str]]:
+    """The session and upload the current context is billed to."""
+    return _usage_scope.get()
+
+def get_scope_totals(scope_type: str, key: str) -> Dict[str, float]:
+    """In-memory total_tokens and cost_usd of a session or upload since process start (zeros if untracked)."""
+    return dict(_scope_totals.get((scope_type, key)) or {"total_tokens": 0, "cost_usd": 0.0})
+
+def estimate_cost(model_name: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated cost in USD from the price table."""
+    prompt_price, completion_price = MODEL_PRICES.get(model_name, DEFAULT_PRICE)
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+def _scope_keys(scope: Dict[str, Optional[str]]):
+    if scope["session_id"]:
+        yield "session", scope["session_id"]
+    if scope["upload_id"]:
+        yield "upload", scope["upload_id"]
+
+def _budget_for(scope_type: str) -> int:
+    return settings.session_token_budget if scope_type == "session" else settings.upload_token_budget
+
+async def _stored_total_tokens(scope_type: str, key: str) -> float:
+    """
+    total_tokens of a session or upload across all workers, summed from its llm_usage rows.
+    Read at most every BUDGET_CACHE_SECONDS per scope; falls back to this process's totals
+    if MongoDB is unavailable.
+    """
+    now = time.monotonic()
+    entry = _budget_totals.get((scope_type, key))
+    if entry is not None and entry[0] > now:
+        _budget_totals.move_to_end((scope_type, key))
+        return entry[1]
+    try:
+        db = await get_database()
+        rows = await db["llm_usage"].aggregate([
+            {"$match": {"scope": scope_type, "key": key}},
+            {"$group": {"_id": None, "total_tokens": {"$sum": "$total_tokens"}}}
+        ]).to_list(length=1)
+        total = rows[0]["total_tokens"] if rows else 0
+    except Exception as e:
+        logger.warning("Could not read stored usage of %s %s, using this process's totals: %s", scope_type, key, e)
+        return get_scope_totals(scope_type, key)["total_tokens"]
+    _budget_totals[(scope_type, key)] = [now + settings.budget_cache_seconds, total]
+    _budget_totals.move_to_end((scope_type, key))
+    while len(_budget_totals) > MAX_TRACKED_SCOPES:
+        _budget_totals.popitem(last=False)
+    return total
+
+async def check_budget():
+    """
+    Raise BudgetExceededError if the current session or upload is over its token budget.
+
+    Totals come from the llm_usage collection, so a budget holds across workers and
+    restarts. Budgets are off when SESSION_TOKEN_BUDGET / UPLOAD_TOKEN_BUDGET are 0.
+    """
+    for scope_type, key in _scope_keys(_usage_scope.get()):
+        budget = _budget_for(scope_type)
+        if not budget:
+            continue
+        used = await _stored_total_tokens(scope_type, key)
+        if used >= budget:
+            raise BudgetExceededError(scope_type, key, int(used), budget)
+
+def record_usage(model_name: str, prompt_tokens: int, completion_tokens: int, cached_prompt_tokens: int = 0,
+                 estimated: bool = False):
+    """
+    Account one LLM response: metrics, running totals (and cached budget totals) and the llm_usage collection.
+
+    Args:
+        model_name: Model that served the call
+        prompt_tokens: Input tokens
+        completion_tokens: Output tokens
+        cached_prompt_tokens: Input tokens served from the provider's prompt cache
+        estimated: Counts come from our tokenizer because the provider reported none
+    """
+    record_llm_usage(model_name, prompt_tokens, completion_tokens, cached_prompt_tokens)
+    scope = _usage_scope.get()
+    cost = estimate_cost(model_name, prompt_tokens, completion_tokens)
+    for scope_type, key in _scope_keys(scope):
+        _add_to_totals(scope_type, key, prompt_tokens + completion_tokens, cost)
+
+    increments = {
+        "calls": 1,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cached_prompt_tokens": cached_prompt_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "estimated_calls": 1 if estimated else 0,
+        "cost_usd": cost
+    }
+    _collect(scope, model_name, increments)
+    _schedule_persist(model_name, [("model", "all")] + list(_scope_keys(scope)), increments)
+
+def _collect(scope: Dict[str, Optional[str]], model_name: str, increments: Dict[str, float]):
+    for upload_id, collected in _usage_collectors.get():
+        if upload_id is None or upload_id == scope["upload_id"]:
+            totals = collected.setdefault(model_name, {})
+            for field, value in increments.items():
+                totals[field] = totals.get(field, 0) + value
+
+def bill_usage(collected: Dict[str, Dict[str, float]], session_id: Optional[str]):
+    """
+    Bill usage gathered with collect_usage to a session: its budget totals and its
+    llm_usage aggregates. The per-model and upload aggregates were already counted.
+    """
+    if not session_id:
+        return
+    for model_name, increments in collected.items():
+        _add_to_totals("session", session_id, increments["total_tokens"], increments["cost_usd"])
+        _schedule_persist(model_name, [("session", session_id)], increments)
+
+def bill_shared_usage(collected: Dict[str, Dict[str, float]]):
+    """
+    Bill usage gathered with collect_usage to the current session and upload, for a caller
+    that joined a shared call instead of making it. The per-model aggregates were already
+    counted by the caller that made it.
+    """
+    scope = _usage_scope.get()
+    for model_name, increments in collected.items():
+        for scope_type, key in _scope_keys(scope):
+            _add_to_totals(scope_type, key, increments["total_tokens"], increments["cost_usd"])
+        _collect(scope, model_name, increments)
+        _schedule_persist(model_name, list(_scope_keys(scope)), increments)
+
+def _add_to_totals(scope_type: str, key: str, tokens: float, cost: float):
+    entry = _budget_totals.get((scope_type, key))
+    if entry is not None:
+        # Count our own usage right away rather than when the stored total is next read
+        entry[1] += tokens
+    totals = _scope_totals.pop((scope_type, key), None) or {"total_tokens": 0, "cost_usd": 0.0}
+    totals["total_tokens"] += tokens
+    totals["cost_usd"] += cost
+    _scope_totals[(scope_type, key)] = totals
+    if len(_scope_totals) > MAX_TRACKED_SCOPES:
+        _scope_totals.popitem(last=False)
+
+def _schedule_persist(model_name: str, keys, increments: Dict[str, Any]):
+    try:
+        task = asyncio.get_running_loop().create_task(_persist_usage(model_name, keys, increments))
+    except RuntimeError:
+        return  # No event loop (scripts, benchmarks): metrics and in-memory totals only
+    _pending_writes.add(task)
+    task.add_done_callback(_pending_writes.discard)
+
+async def _persist_usage(model_name: str, keys, increments: Dict[str, Any]):
+    """Add the increments to the per-model aggregates of each (scope, key)."""
+    try:
+        db = await get_database()
+        now = datetime.now().isoformat()
+        for scope_type, key in keys:
+            await db["llm_usage"].update_one(
+                {"scope": scope_type, "key": key, "model": model_name},
+                {"$inc": increments, "$set": {"updated_at": now}, "$setOnInsert": {"created_at": now}},
+                upsert=True
+            )
+    except Exception as e:
+        logger.warning("Failed to persist LLM usage for %s: %s", model_name, e)
+
+async def get_usage_summary(scope: Optional[str] = None, key: Optional[str] = None, limit: int = 100):
+    """
+    Aggregated usage from the llm_usage collection.
+
+    Args:
+        scope: "session", "upload" or "model" (all calls per model); all scopes if None
+        key: A session or upload ID to restrict to
+        limit: Maximum number of rows, most expensive first
+    """
+    db = await get_database()
+    query = {}
+    if scope:
+        query["scope"] = scope
+    if key:
+        query["key"] = key
+    rows = await db["llm_usage"].find(query, {"_id": 0}).sort("cost_usd", -1).limit(limit).to_list(length=limit)
+    totals = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cost_usd": 0.0}
+    for row in rows:
+        if scope or row["scope"] == "model":
+            for field in totals:
+                totals[field] += row.get(field, 0)
+    totals["cost_usd"] = round(totals["cost_usd"], 6)
+    return {"rows": rows, "totals": totals}
+
+class UsageCallbackHandler(AsyncCallbackHandler):
+    """
+    Records token usage from every completed response of one model (attached in
+    create_llm). Streams stopped early never reach on_llm_end; astream_json
+    accounts for those itself.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    async def on_llm_end(self, response, **kwargs):
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                if message is not None and getattr(message, "usage_metadata", None):
+                    usage = message.usage_metadata
+        if usage:
+            record_usage(
+                self.model_name,
+                usage.get("input_tokens", 0),
+                usage.get("output_tokens", 0),
+                (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+            )
+            return
+        token_usage = (response.llm_output or {}).get("token_usage")
+        if token_usage:
+            record_usage(self.model_name, token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0))
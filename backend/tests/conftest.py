@@ -0,0 +1,56 @@
+import os
+import sys
+from collections import OrderedDict
+from types import SimpleNamespace
+import pytest
+
+# Modules import each other flat from backend/ (e.g. "from services.usage import ..."), as when the app runs from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class FakeTranscriptCollection:
+    """In-memory chat_transcripts applying the upserts TranscriptWriter sends."""
+
+    def __init__(self):
+        self.documents = {}
+        self.bulk_writes = 0
+        self.finds = 0
+        self.failures = 0  # Number of upcoming bulk_writes that fail
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("MongoDB unavailable")
+        self.bulk_writes += 1
+        for operation in operations:
+            conversation_id, update = operation._filter["conversation_id"], operation._doc
+            document = self.documents.get(conversation_id)
+            if document is None:
+                document = self.documents[conversation_id] = {
+                    "conversation_id": conversation_id, "messages": [], **update["$setOnInsert"]
+                }
+            document.update(update["$set"])
+            document["messages"].extend(update.get("$push", {}).get("messages", {}).get("$each", []))
+
+    async def find_one(self, query, sort=None):
+        self.finds += 1
+        matches = [document for document in self.documents.values() if document["session_id"] == query["session_id"]]
+        return max(matches, key=lambda document: document["created_at"], default=None)
+
+@pytest.fixture
+def transcript_db(monkeypatch):
+    """A fresh transcript writer and conversation sessions, writing to a FakeTranscriptCollection."""
+    from config import settings
+    from services import conversation, transcripts
+    collection = FakeTranscriptCollection()
+
+    async def get_database():
+        return SimpleNamespace(chat_transcripts=collection)
+
+    writer = transcripts.TranscriptWriter()
+    monkeypatch.setattr(settings, "transcript_persistence", True)
+    monkeypatch.setattr(settings, "transcript_flush_interval_seconds", 60)
+    monkeypatch.setattr(transcripts, "get_database", get_database)
+    monkeypatch.setattr(transcripts, "transcript_writer", writer)
+    monkeypatch.setattr(conversation, "transcript_writer", writer)
+    monkeypatch.setattr(conversation, "_sessions", OrderedDict())
+    return SimpleNamespace(collection=collection, writer=writer)
@@ -0,0 +1,40 @@
+import gzip
+import pytest
+from starlette.requests import Request
+from services.catalog import accepted_codings, conditional_response, gzip_etag, make_etag
+
+BODY = b'[{"model": "TMP36"}]'
+
+def request(**headers):
+    return Request({"type": "http", "method": "GET", "path": "/api/v1/sensors",
+                    "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]})
+
+def test_accepted_codings_parses_q_values():
+    assert accepted_codings("gzip;q=0.5, br, identity; Q=0, deflate;q=x") == {
+        "gzip": 0.5, "br": 1.0, "identity": 0.0, "deflate": 0.0
+    }
+    assert accepted_codings("") == {}
+
+@pytest.mark.parametrize("accept_encoding, compressed", [
+    ("gzip", True),
+    ("br, gzip;q=0.8", True),
+    ("*", True),
+    ("gzip;q=0", False),
+    ("gzip;q=0, *", False),  # gzip's own q-value wins over "*"
+    ("br", False),
+    ("x-gzip-free", False),  # Not a substring match
+    ("", False),
+])
+def test_gzip_only_when_accepted(accept_encoding, compressed):
+    etag = make_etag(BODY)
+    response = conditional_response(request(accept_encoding=accept_encoding), BODY, etag, gzip.compress(BODY))
+    assert (response.headers.get("content-encoding") == "gzip") is compressed
+    assert response.headers["etag"] == (gzip_etag(etag) if compressed else etag)
+    assert response.headers["vary"] == "Accept-Encoding"
+
+def test_vary_on_uncompressed_and_not_modified_responses():
+    etag = make_etag(BODY)
+    assert conditional_response(request(), BODY, etag).headers["vary"] == "Accept-Encoding"
+    not_modified = conditional_response(request(if_none_match=etag), BODY, etag, gzip.compress(BODY))
+    assert not_modified.status_code == 304
+    assert not_modified.headers["vary"] == "Accept-Encoding"
@@ -0,0 +1,79 @@
+import asyncio
+from config import settings
+from services import conversation
+from services.conversation import add_to_history, get_history_text, load_session, reset_conversation, update_step
+
+def test_sessions_are_isolated_between_concurrent_requests(transcript_db):
+    async def turn(session_id, text):
+        await load_session(session_id)
+        await asyncio.sleep(0)  # Let the other request load its session in between
+        add_to_history("user", text)
+        await asyncio.sleep(0)
+        return get_history_text()
+
+    async def scenario():
+        results = await asyncio.gather(turn("a", "from a"), turn("b", "from b"))
+        await transcript_db.writer.close()
+        return results
+
+    assert asyncio.run(scenario()) == ["user: from a", "user: from b"]
+
+def test_evicted_session_is_rehydrated_from_its_transcript(transcript_db, monkeypatch):
+    monkeypatch.setattr(settings, "chat_max_sessions", 1)
+
+    async def scenario():
+        await load_session("a")
+        add_to_history("user", "hello")
+        add_to_history("assistant", "hi there")
+        update_step("step_2")
+        await load_session("b")  # Evicts "a"
+        assert "a" not in conversation._sessions
+        state = await load_session("a")
+        await transcript_db.writer.close()
+        return state
+
+    state = asyncio.run(scenario())
+    assert [message["content"] for message in state["chat_history"]] == ["hello", "hi there"]
+    assert state["step"] == "step_2"
+
+def test_concurrent_first_requests_share_one_transcript_read(transcript_db):
+    async def scenario():
+        await load_session("a")
+        add_to_history("user", "hello")
+        await transcript_db.writer.flush()
+        conversation._sessions.clear()  # As after a restart
+        transcript_db.collection.finds = 0
+        states = await asyncio.gather(*(load_session("a") for _ in range(3)))
+        await transcript_db.writer.close()
+        return states
+
+    states = asyncio.run(scenario())
+    assert transcript_db.collection.finds == 1
+    assert states[0] is states[1] is states[2]
+    assert states[0]["chat_history"] == [{"role": "user", "content": "hello"}]
+
+def test_reset_starts_a_new_stored_conversation(transcript_db):
+    async def scenario():
+        first = await load_session("a")
+        add_to_history("user", "old")
+        second = reset_conversation()
+        add_to_history("user", "new")
+        await transcript_db.writer.flush()
+        conversation._sessions.clear()
+        restored = await load_session("a")
+        await transcript_db.writer.close()
+        return first, second, restored
+
+    first, second, restored = asyncio.run(scenario())
+    assert first["conversation_id"] != second["conversation_id"]
+    assert restored["conversation_id"] == second["conversation_id"]
+    assert restored["chat_history"] == [{"role": "user", "content": "new"}]
+
+def test_unreadable_transcript_starts_a_new_conversation(transcript_db, monkeypatch):
+    async def unavailable(session_id):
+        raise ConnectionError("MongoDB unavailable")
+
+    monkeypatch.setattr(conversation, "load_latest_transcript", unavailable)
+    state = asyncio.run(load_session("a"))
+    assert state["chat_history"] == []
+    assert state["session_id"] == "a"
@@ -0,0 +1,57 @@
+import json
+from llm.json_stream import StreamingJSONParser, repair_json, parse_json_object
+
+def feed_all(parser, chunks):
+    return [parser.feed(chunk) for chunk in chunks]
+
+def test_completes_when_the_top_level_object_closes():
+    parser = StreamingJSONParser()
+    done = feed_all(parser, ['Here you go:\n```json\n{"model": "A', '1", "x": [1, {"y": "}"}', ']} trailing', " more"])
+    assert done == [False, False, True, True]
+    assert parser.preamble_chars == len('Here you go:\n```json\n')
+    assert parser.trailing_chars == len(" trailing") + len(" more")
+    assert parser.result() == {"model": "A1", "x": [1, {"y": "}"}]}
+    assert not parser.repaired
+
+def test_escape_split_across_chunks():
+    parser = StreamingJSONParser()
+    feed_all(parser, ['{"model": "A\\', '"1", "n": 2}'])
+    assert parser.complete
+    assert parser.result() == {"model": 'A"1', "n": 2}
+
+def test_truncated_output_is_repaired():
+    parser = StreamingJSONParser()
+    parser.feed('{"model": "TMP36", "specifications": {"electrical": {"power_supply": "2.7 to 5.5')
+    assert not parser.complete
+    assert parser.result() == {"model": "TMP36", "specifications": {"electrical": {"power_supply": "2.7 to 5.5"}}}
+    assert parser.repaired
+
+def test_truncated_after_a_key_keeps_the_complete_fields():
+    parser = StreamingJSONParser()
+    parser.feed('{"model": "TMP36", "manufacturer": "Analog", "sensor_type"')
+    result = parser.result()
+    assert result["model"] == "TMP36"
+    assert result["manufacturer"] == "Analog"
+
+def test_repair_common_llm_defects():
+    text = "{'model': 'X', sensor_type: None, waterproof: True, supply: 3.3V, 'pins': [1, 2,], // note\n}"
+    assert json.loads(repair_json(text)) == {
+        "model": "X", "sensor_type": None, "waterproof": True, "supply": "3.3V", "pins": [1, 2]
+    }
+
+def test_parse_json_object_ignores_surrounding_prose():
+    assert parse_json_object('Sure! {"a": 1} Hope this helps {"b": 2}') == {"a": 1}
+    assert parse_json_object("No JSON here") is None
+
+def test_repair_copies_valid_members_and_drops_their_trailing_comma():
+    text = '{"model": "X", "range": "0 to 5 V", "pins": [1, "a,b", true,], "notes": "null", "n": 2,\n}'
+    assert json.loads(repair_json(text)) == {
+        "model": "X", "range": "0 to 5 V", "pins": [1, "a,b", True], "notes": None, "n": 2
+    }
+
+def test_chunks_without_a_closing_brace_are_scanned_later():
+    parser = StreamingJSONParser()
+    done = feed_all(parser, ["Result: ", '{"a": "[', '{"', ', "b": [1, ', '2]', "}", " bye"])
+    assert done == [False, False, False, False, False, True, True]
+    assert parser.preamble_chars == len("Result: ")
+    assert parser.result() == {"a": "[{", "b": [1, 2]}
@@ -0,0 +1,58 @@
+from services.merge_engine import MergeEngine, score_value, BOOL_SCORE
+
+def test_bool_scores_are_positive():
+    assert score_value(True) == BOOL_SCORE
+    assert score_value(False, 0.5) == BOOL_SCORE * 0.5
+    assert score_value(None) == 0.0
+
+def test_bool_extra_fields_survive_the_merge():
+    engine = MergeEngine()
+    engine.add({"model": "TMP36", "extra_fields": {"waterproof": True, "rohs": False}}, pages=[1])
+    merged = engine.result()
+    assert merged["extra_fields"] == {"waterproof": True, "rohs": False}
+    provenance = {entry["field"]: entry for entry in merged["field_provenance"]}
+    assert provenance["extra_fields.waterproof"]["pages"] == [1]
+
+def test_agreeing_chunks_decide_a_boolean():
+    engine = MergeEngine()
+    engine.add({"extra_fields": {"waterproof": True}}, pages=[1])
+    engine.add({"extra_fields": {"waterproof": False}}, pages=[2])
+    engine.add({"extra_fields": {"waterproof": False}}, pages=[3])
+    merged = engine.result()
+    assert merged["extra_fields"]["waterproof"] is False
+    provenance = {entry["field"]: entry for entry in merged["field_provenance"]}
+    assert provenance["extra_fields.waterproof"]["pages"] == [2, 3]
+    assert provenance["extra_fields.waterproof"]["runner_ups"][0]["value"] is True
+
+def test_extra_fields_merge_by_specificity():
+    engine = MergeEngine()
+    engine.add({"extra_fields": {"interface": "digital", "package": "unknown"}}, pages=[1])
+    engine.add({"extra_fields": {"interface": "I2C up to 400 kHz", "package": "TO-92"}}, pages=[2])
+    merged = engine.result()
+    assert merged["extra_fields"] == {"interface": "I2C up to 400 kHz", "package": "TO-92"}
+
+def test_nested_extra_fields_and_placeholders():
+    engine = MergeEngine()
+    engine.add({"extra_fields": {"pinout": {"pin1": "VCC", "pin2": "n/a"}}}, pages=[4])
+    merged = engine.result()
+    assert merged["extra_fields"] == {"pinout": {"pin1": "VCC"}}
+
+def test_more_trusted_source_wins_between_equally_specific_values():
+    engine = MergeEngine()
+    engine.add({"specifications": {"electrical": {"power_supply": "3.0 to 5.0 V"}}}, pages=[1], source="llm")
+    engine.add({"specifications": {"electrical": {"power_supply": "2.7 to 5.5 V"}}}, pages=[2], source="table")
+    merged = engine.result()
+    assert merged["specifications"]["electrical"]["power_supply"] == "2.7 to 5.5 V"
+
+def test_result_keeps_the_original_shape():
+    engine = MergeEngine()
+    engine.add({"model": "TMP36", "specifications": {"electrical": {"power_supply": "2.7 to 5.5 V"}, "mechanical": {}}})
+    merged = engine.result(include_provenance=False)
+    assert merged == {
+        "sensor_type": None,
+        "manufacturer": None,
+        "model": "TMP36",
+        "specifications": {"electrical": {"power_supply": "2.7 to 5.5 V"}},
+        "extra_fields": {}
+    }
+    assert MergeEngine().result(include_provenance=False)["specifications"] == {}
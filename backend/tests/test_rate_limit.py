@@ -0,0 +1,101 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+from config import settings
+from services import rate_limit, token_bucket
+from services.token_bucket import TokenBucket
+from services.upload_intake import receive_upload
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    # Only the buckets' clock; the event loop keeps the real one
+    monkeypatch.setattr(token_bucket, "time", SimpleNamespace(monotonic=fake))
+    return fake
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_enabled", True)
+    monkeypatch.setattr(settings, "rate_limit_trust_forwarded_for", False)
+    monkeypatch.setattr(settings, "rate_limit_read_per_second", 0.5)
+    monkeypatch.setattr(settings, "rate_limit_read_burst", 2)
+    monkeypatch.setattr(settings, "rate_limit_batch_files_per_second", 0.2)
+    monkeypatch.setattr(settings, "rate_limit_batch_files_burst", 5)
+    monkeypatch.setattr(rate_limit, "rate_limit_backend", rate_limit.MemoryRateLimitBackend())
+
+def test_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(rate=2, capacity=4)
+    assert [bucket.try_acquire() for _ in range(4)] == [0, 0, 0, 0]
+    assert bucket.try_acquire() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.try_acquire() == 0
+    clock.now += 60
+    assert bucket.snapshot()["available"] == 4  # Never above capacity
+
+def test_wait_for_several_tokens(clock):
+    bucket = TokenBucket(rate=1, capacity=10)
+    assert bucket.try_acquire(8) == 0
+    assert bucket.try_acquire(5) == pytest.approx(3)
+    assert bucket.try_acquire(5) == pytest.approx(3)  # A refused request takes nothing
+    assert TokenBucket(rate=0, capacity=1).try_acquire(2) == float("inf")
+
+def test_middleware_answers_429_with_retry_after(clock, limits):
+    app = FastAPI()
+    app.middleware("http")(rate_limit.rate_limit_middleware)
+    app.get("/api/v1/sensors")(lambda: {"ok": True})
+    app.get("/health")(lambda: {"ok": True})
+    client = TestClient(app)
+    assert [client.get("/api/v1/sensors").status_code for _ in range(2)] == [200, 200]
+    response = client.get("/api/v1/sensors")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"  # One token at 0.5 per second
+    assert client.get("/health").status_code == 200  # Not limited
+    clock.now += 2
+    assert client.get("/api/v1/sensors").status_code == 200
+
+def test_batch_is_charged_per_file(clock, limits):
+    request = SimpleNamespace(headers={}, client=SimpleNamespace(host="10.0.0.1"),
+                              url=SimpleNamespace(path="/api/v1/pdf/upload/batch"))
+    assert asyncio.run(rate_limit.check_limit(request, "batch")) == 0  # The middleware's charge for the first file
+    assert [asyncio.run(rate_limit.check_file_limit(request, n)) for n in range(1, 6)] == [0, 0, 0, 0, 0]
+    assert asyncio.run(rate_limit.check_file_limit(request, 2)) == 5  # Bucket empty, one token at 0.2 per second
+    # Files beyond the burst are free, so a batch the limits allow at all can succeed once the bucket refills
+    assert asyncio.run(rate_limit.check_file_limit(request, 6)) == 0
+
+def test_batch_refused_while_its_body_is_received(clock, limits):
+    app = FastAPI()
+    app.middleware("http")(rate_limit.rate_limit_middleware)
+
+    @app.post("/api/v1/pdf/upload/batch")
+    async def batch(request: Request):
+        async def charge_file(file_number):
+            retry_after = await rate_limit.check_file_limit(request, file_number)
+            if retry_after:
+                raise HTTPException(status_code=429, headers={"Retry-After": str(retry_after)})
+        async with receive_upload(request, "files", max_files=10, on_file=charge_file) as (_, files):
+            return {"files": len(files)}
+
+    def upload(count):
+        files = [("files", (f"{n}.pdf", b"%PDF-1.4", "application/pdf")) for n in range(count)]
+        return client.post("/api/v1/pdf/upload/batch", files=files)
+
+    client = TestClient(app)
+    assert upload(4).json() == {"files": 4}
+    response = upload(3)  # The middleware takes the last token, the second file finds the bucket empty
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "5"
+    assert upload(1).status_code == 429  # Refused by the middleware before the body is read
+
+def test_classify_request():
+    assert rate_limit.classify_request("POST", "/api/v1/pdf/upload") == "upload"
+    assert rate_limit.classify_request("POST", "/api/v1/pdf/upload/batch") == "batch"
+    assert rate_limit.classify_request("OPTIONS", "/api/v1/chat") is None
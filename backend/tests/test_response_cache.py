@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+import pytest
+from config import settings
+from services import response_cache
+from services.response_cache import ChatResponseCache, normalize_prompt
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(response_cache, "time", SimpleNamespace(monotonic=lambda: fake.now))
+    return fake
+
+@pytest.fixture
+def cache(monkeypatch, clock):
+    monkeypatch.setattr(response_cache, "prompt_version", lambda: "v1")
+    monkeypatch.setattr(settings, "chat_cache_ttl_seconds", 60)
+    monkeypatch.setattr(settings, "chat_cache_max_entries", 3)
+    monkeypatch.setattr(settings, "chat_cache_similarity", 0)
+    return ChatResponseCache()
+
+def test_normalization_keeps_order_and_repeats():
+    assert normalize_prompt("I need a Temperature sensor, please!") == ("temperature", "sensor")
+    assert normalize_prompt("pressure above temperature") != normalize_prompt("temperature above pressure")
+    assert normalize_prompt("sensor sensor") != normalize_prompt("sensor")
+
+def test_equivalent_wording_hits(cache):
+    cache.put("model-a", "I need a temperature sensor", "Try the TMP36")
+    assert cache.get("model-a", "Temperature sensor please?") == "Try the TMP36"
+
+def test_different_order_or_model_does_not_collide(cache):
+    cache.put("model-a", "pressure above temperature", "A")
+    assert cache.get("model-a", "temperature above pressure") is None
+    assert cache.get("model-b", "pressure above temperature") is None
+
+def test_entries_expire_after_the_ttl(cache, clock):
+    cache.put("model-a", "humidity sensor", "Try the SHT31")
+    clock.now = 59
+    assert cache.get("model-a", "humidity sensor") == "Try the SHT31"
+    clock.now = 61
+    assert cache.get("model-a", "humidity sensor") is None
+    assert not cache._entries
+
+def test_least_recently_used_entry_is_dropped(cache):
+    for word in ("gas", "light", "sound"):
+        cache.put("model-a", f"{word} sensor", word)
+    cache.get("model-a", "gas sensor")
+    cache.put("model-a", "motion sensor", "motion")
+    assert cache.get("model-a", "light sensor") is None
+    assert cache.get("model-a", "gas sensor") == "gas"
+
+def test_similar_request_uses_jaccard_on_distinct_words(cache, monkeypatch):
+    monkeypatch.setattr(settings, "chat_cache_similarity", 0.6)
+    cache.put("model-a", "waterproof temperature sensor outdoor", "Try the DS18B20")
+    assert cache.get("model-a", "outdoor waterproof temperature sensor probe") == "Try the DS18B20"
+    assert cache.get("model-a", "co2 sensor") is None
+
+def test_requests_without_content_words_are_not_cached(cache):
+    cache.put("model-a", "Hi, can you recommend something?", "Sure")
+    assert not cache._entries
+    assert cache.get("model-a", "hello") is None
@@ -0,0 +1,67 @@
+import pytest
+from services.rule_extraction import RULES, UNCONFIRMED_FACTOR, confident_fields, extract_rule_fields
+
+def field(text, category, name):
+    return extract_rule_fields(text).get(category, {}).get(name)
+
+def rule_confidence(name):
+    return next(confidence for _, field_name, pattern, confidence in RULES
+                if field_name == name and pattern.startswith("(?P<value>"))
+
+@pytest.mark.parametrize("text, value", [
+    ("Operating temperature: -40 °C to +125 °C", "-40 °C to +125 °C"),
+    ("Operating temperature -40° to +85°C", "-40° to +85°C"),
+    ("Operating temperature range  -40 to 85 C", "-40 to 85 C"),
+    ("Operating temp. -40…+85 degC", "-40…+85 degC"),
+    ("Operating temperature: -20 to 70 degrees C", "-20 to 70 degrees C"),
+    ("Operating temperature -40 ~ 85 ℃", "-40 ~ 85 ℃"),
+])
+def test_operating_temperature_units(text, value):
+    assert field(text, "environmental", "operating_temp")["value"] == value
+
+@pytest.mark.parametrize("text", [
+    "Operating temperature -40 to 85 cycles",
+    "Operating temperature: see section 7",
+    "Storage: -40 to 85 °C",
+])
+def test_operating_temperature_non_matches(text):
+    assert field(text, "environmental", "operating_temp") is None
+
+def test_storage_temperature():
+    assert field("Storage temperature -55 to 150 C", "environmental", "storage_temp")["value"] == "-55 to 150 C"
+
+@pytest.mark.parametrize("text, value", [
+    ("Enclosure rating: IP67", "IP67"),
+    ("Ingress protection IPX7", "IPX7"),
+    ("Housing sealed to IP6K9K", "IP6K9K"),
+])
+def test_protection_rating_with_context(text, value):
+    match = field(text, "environmental", "protection_rating")
+    assert match == {"value": value, "confidence": rule_confidence("protection_rating")}
+
+@pytest.mark.parametrize("text", [
+    "Operating mode IP67",  # "rating" inside "operating" is not a context word
+    "Compatible with IP67 housings",  # Context words after the value do not count
+    "Enclosure\nIP67",  # Nor on an earlier line
+])
+def test_protection_rating_without_context_is_scaled(text):
+    expected = round(rule_confidence("protection_rating") * UNCONFIRMED_FACTOR, 3)
+    assert field(text, "environmental", "protection_rating")["confidence"] == expected
+
+@pytest.mark.parametrize("text", ["Default address IP 192.168.1.1", "IP addresses", "SHIP67"])
+def test_protection_rating_non_matches(text):
+    assert field(text, "environmental", "protection_rating") is None
+
+def test_dimensions_context_is_a_whole_word():
+    confirmed = field("Package outline 3.0 x 3.0 x 0.9 mm", "mechanical", "dimensions")
+    assert confirmed["value"] == "3.0 x 3.0 x 0.9 mm"
+    unconfirmed = field("Prepackaged reel of 2 x 5 mm parts", "mechanical", "dimensions")
+    assert unconfirmed["confidence"] == round(rule_confidence("dimensions") * UNCONFIRMED_FACTOR, 3)
+
+def test_labels_are_whole_words():
+    assert field("Weight: 12 g", "mechanical", "weight")["value"] == "12 g"
+    assert field("Lightweight design, 12 g", "mechanical", "weight") is None
+
+def test_confident_fields_filters_by_confidence():
+    found = extract_rule_fields("Supply voltage 2.7 V to 5.5 V\nOperating mode IP67")
+    assert confident_fields(found, min_confidence=0.8) == {"electrical": {"power_supply": "2.7 V to 5.5 V"}}
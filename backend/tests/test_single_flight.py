@@ -0,0 +1,145 @@
+import asyncio
+import pytest
+from services.single_flight import SingleFlight, hash_key
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        group = SingleFlight("test")
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(group.do("key", work) for _ in range(5)))
+        return results, calls, group
+
+    results, calls, group = asyncio.run(scenario())
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert (group.executed, group.shared) == (1, 4)
+    assert group.stats()["in_flight"] == 0
+
+def test_cancelled_follower_does_not_cancel_the_call():
+    async def scenario():
+        group = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return 42
+
+        leader = asyncio.ensure_future(group.do("key", work))
+        follower = asyncio.ensure_future(group.do("key", work))
+        await asyncio.sleep(0)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        release.set()
+        return await leader
+
+    assert asyncio.run(scenario()) == 42
+
+def test_cancelled_leader_leaves_the_result_to_followers():
+    async def scenario():
+        group = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "done"
+
+        leader = asyncio.ensure_future(group.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(group.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await follower, group
+
+    result, group = asyncio.run(scenario())
+    assert result == "done"
+    assert group.executed == 1
+
+def test_errors_reach_every_caller_and_the_key_is_freed():
+    async def scenario():
+        group = SingleFlight("test")
+
+        async def failing():
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(group.do("key", failing), group.do("key", failing), return_exceptions=True)
+        retried = await group.do("key", lambda: asyncio.sleep(0, result="ok"))
+        return results, retried
+
+    results, retried = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert retried == "ok"
+
+def test_hash_key_separates_parts():
+    assert hash_key("ab", "c") != hash_key("a", "bc")
+    assert hash_key(b"x", None) == hash_key("x", "None")
+
+def test_call_is_cancelled_when_its_last_caller_leaves():
+    async def scenario():
+        group = SingleFlight("test")
+        started = asyncio.Event()
+        cancelled = []
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        first = asyncio.ensure_future(group.do("key", work))
+        second = asyncio.ensure_future(group.do("key", work))
+        await started.wait()
+        first.cancel()
+        await asyncio.sleep(0)
+        assert not cancelled  # The second caller still waits
+        second.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+        await asyncio.sleep(0)
+        return cancelled, group
+
+    cancelled, group = asyncio.run(scenario())
+    assert cancelled == [True]
+    assert group.abandoned == 1
+    assert group.stats()["in_flight"] == 0
+    assert not group._waiters
+
+def test_shared_llm_call_copies_result_and_bills_every_caller(monkeypatch):
+    from llm import client
+    from services import usage
+
+    monkeypatch.setattr(usage, "_schedule_persist", lambda *args: None)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            usage.record_usage("test-model", 100, 20)
+            return {"specifications": {"voltage": "5 V"}}
+
+        async def caller(session_id):
+            with usage.usage_scope(session_id=session_id):
+                return await client.call_llm_shared("shared-key", work)
+
+        callers = [asyncio.ensure_future(caller(session_id)) for session_id in ("leader", "follower")]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*callers)
+
+    leader, follower = asyncio.run(scenario())
+    assert leader == follower
+    leader["specifications"]["voltage"] = "changed"
+    assert follower["specifications"]["voltage"] == "5 V"
+    assert usage.get_scope_totals("session", "leader")["total_tokens"] == 120
+    assert usage.get_scope_totals("session", "follower")["total_tokens"] == 120
@@ -0,0 +1,49 @@
+from services.table_extraction import (
+    assign_cells, match_header, parse_layout_tables, split_cells, table_extraction_from_rows
+)
+
+HEADER = "Parameter            Symbol   Min    Typ    Max    Unit"
+
+def row(line):
+    return assign_cells(split_cells(line), match_header(HEADER))
+
+def test_header_needs_two_value_columns():
+    assert set(match_header(HEADER)) == {"parameter", "symbol", "min", "typ", "max", "unit"}
+    assert match_header("Parameter    Value    Unit") is None
+
+def test_full_row_assigned_by_position():
+    assert row("Supply voltage       VDD      2.7    3.3    5.5    V") == {
+        "parameter": "Supply voltage", "symbol": "VDD", "min": "2.7", "typ": "3.3", "max": "5.5", "unit": "V"
+    }
+
+def test_empty_cells_and_drifting_columns():
+    # No typ value, and every cell a character or two left of its header
+    assert row("Supply voltage      VDD     2.7            5.5     V") == {
+        "parameter": "Supply voltage", "symbol": "VDD", "min": "2.7", "max": "5.5", "unit": "V"
+    }
+    assert row("Resolution                          0.1             C") == {"parameter": "Resolution", "typ": "0.1", "unit": "C"}
+
+def test_more_cells_than_columns_go_to_the_nearest_column():
+    assigned = row("Supply voltage       VDD      2.7    3.3    5.5    V    note 1")
+    assert assigned["unit"] == "V note 1"
+    assert assigned["max"] == "5.5"
+
+def test_wrapped_parameter_names_prefix_indented_rows():
+    text = "\n".join([
+        HEADER,
+        "Supply voltage       VDD      2.7    3.3    5.5    V",
+        "Supply current",
+        "  sleep mode                        1      2      uA",
+        "Package outline                     3             mm",
+    ])
+    rows = parse_layout_tables(text)
+    assert rows == [
+        {"parameter": "Supply voltage", "value": "2.7 to 5.5 V (typ 3.3 V)", "symbol": "VDD"},
+        {"parameter": "Supply current sleep mode", "value": "typ 1 uA, max 2 uA"},
+        {"parameter": "Package outline", "value": "3 mm"},
+    ]
+    mapped = table_extraction_from_rows(rows)
+    assert mapped["specifications"] == {"electrical": {
+        "power_supply": "2.7 to 5.5 V (typ 3.3 V)", "standby_current": "typ 1 uA, max 2 uA"
+    }}
+    assert mapped["extra_fields"] == {"package_outline": "3 mm"}
@@ -0,0 +1,95 @@
+import asyncio
+from config import settings
+from services.transcripts import load_latest_transcript
+
+STATE = {"step": "step_2", "last_user_input": "hi", "last_sensor": "TMP36"}
+
+def messages(document):
+    return [message["content"] for message in document["messages"]]
+
+def test_flush_writes_all_conversations_in_one_bulk_write(transcript_db):
+    writer, collection = transcript_db.writer, transcript_db.collection
+
+    async def scenario():
+        writer.append("c1", "s1", STATE, {"role": "user", "content": "one"})
+        writer.append("c2", "s2", STATE, {"role": "user", "content": "two"})
+        writer.append("c1", "s1", STATE, {"role": "assistant", "content": "three"})
+        written = await writer.flush()
+        await writer.close()
+        return written
+
+    assert asyncio.run(scenario()) == 3
+    assert collection.bulk_writes == 1
+    assert messages(collection.documents["c1"]) == ["one", "three"]
+    assert collection.documents["c1"]["session_id"] == "s1"
+    assert collection.documents["c1"]["last_sensor"] == "TMP36"
+    assert writer.written == 3
+
+def test_flush_starts_once_enough_messages_are_pending(transcript_db, monkeypatch):
+    monkeypatch.setattr(settings, "transcript_flush_max_messages", 2)
+    writer, collection = transcript_db.writer, transcript_db.collection
+
+    async def scenario():
+        writer.append("c1", "s1", STATE, {"role": "user", "content": "one"})
+        await asyncio.sleep(0.01)
+        assert collection.bulk_writes == 0
+        writer.append("c1", "s1", STATE, {"role": "assistant", "content": "two"})
+        await asyncio.sleep(0.01)
+        assert collection.bulk_writes == 1
+        await writer.close()
+
+    asyncio.run(scenario())
+
+def test_failed_flush_is_retried_in_order(transcript_db):
+    writer, collection = transcript_db.writer, transcript_db.collection
+    collection.failures = 1
+
+    async def scenario():
+        writer.append("c1", "s1", STATE, {"role": "user", "content": "one"})
+        assert await writer.flush() == 0
+        writer.append("c1", "s1", STATE, {"role": "assistant", "content": "two"})
+        assert await writer.flush() == 2
+        await writer.close()
+
+    asyncio.run(scenario())
+    assert writer.failed_flushes == 1
+    assert messages(collection.documents["c1"]) == ["one", "two"]
+
+def test_oldest_messages_dropped_beyond_max_pending(transcript_db, monkeypatch):
+    monkeypatch.setattr(settings, "transcript_max_pending", 2)
+    writer, collection = transcript_db.writer, transcript_db.collection
+
+    async def scenario():
+        for content in ["one", "two", "three"]:
+            writer.append("c1", "s1", STATE, {"role": "user", "content": content})
+        await writer.close()
+
+    asyncio.run(scenario())
+    assert writer.dropped == 1
+    assert messages(collection.documents["c1"]) == ["two", "three"]
+
+def test_close_drains_the_buffer(transcript_db):
+    writer, collection = transcript_db.writer, transcript_db.collection
+
+    async def scenario():
+        writer.start_conversation("c1", "s1", STATE)
+        writer.append("c1", "s1", STATE, {"role": "user", "content": "one"})
+        await writer.close()
+
+    asyncio.run(scenario())
+    assert messages(collection.documents["c1"]) == ["one"]
+    assert not writer.has_pending("s1")
+
+def test_loading_a_transcript_writes_buffered_turns_first(transcript_db):
+    writer = transcript_db.writer
+
+    async def scenario():
+        writer.append("c1", "s1", STATE, {"role": "user", "content": "one"})
+        stored = await load_latest_transcript("s1")
+        await writer.close()
+        return stored
+
+    stored = asyncio.run(scenario())
+    assert stored["conversation_id"] == "c1"
+    assert stored["messages"] == [{"role": "user", "content": "one"}]
+    assert stored["step"] == "step_2"